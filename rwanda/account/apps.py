@@ -1,5 +1,13 @@
+import os
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AccountConfig(AppConfig):
     name = 'rwanda.account'
+
+    def ready(self):
+        import rwanda.account.signals
+
+        os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
@@ -1,17 +1,15 @@
 from django.conf import settings
-from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
 
-from rwanda.administration.utils import param_currency, param_base_price, send_mail
+from rwanda.administration.renderer import renderer
+from rwanda.administration.utils import send_mail, send_mails
 from rwanda.purchases.models import ServicePurchase, ServicePurchaseUpdateRequest, Litigation
 from rwanda.services.models import Service
 from rwanda.users.models import User
 
 
 def process_mail(subject, template, data, email):
-    data['base_url'] = settings.BASE_URL
-    html_content = render_to_string(template, data)
-    return send_mail(email, str(subject), html_content)
+    return send_mail(email, str(subject), renderer.render(template, data))
 
 
 def send_verification_mail(user: User):
@@ -25,9 +23,7 @@ def send_verification_mail(user: User):
 
 
 def on_service_accepted_or_rejected(service: Service):
-    data = {"currency": param_currency(),
-            "base_price": param_base_price(),
-            "service": service,
+    data = {"service": service,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/services/' + str(service.id)}
 
     return process_mail(_("Service accepted") if service.accepted else _("Service rejected"),
@@ -37,8 +33,7 @@ def on_service_accepted_or_rejected(service: Service):
 
 
 def on_service_purchase_initiated(service_purchase: ServicePurchase):
-    data = {"currency": param_currency(),
-            "purchase": service_purchase,
+    data = {"purchase": service_purchase,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/purchases/' + str(service_purchase.id)}
 
     process_mail(_("Purchase"),
@@ -54,8 +49,7 @@ def on_service_purchase_initiated(service_purchase: ServicePurchase):
 
 
 def on_service_purchase_accepted_or_refused(service_purchase: ServicePurchase):
-    data = {"currency": param_currency(),
-            "purchase": service_purchase,
+    data = {"purchase": service_purchase,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/purchases/' + str(service_purchase.id)}
 
     return process_mail(_("Purchase accepted") if service_purchase.accepted else _("Purchase refused"),
@@ -65,8 +59,7 @@ def on_service_purchase_accepted_or_refused(service_purchase: ServicePurchase):
 
 
 def on_service_purchase_delivered(service_purchase: ServicePurchase):
-    data = {"currency": param_currency(),
-            "purchase": service_purchase,
+    data = {"purchase": service_purchase,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/purchases/' + str(service_purchase.id)}
 
     return process_mail(_("Purchase delivered"),
@@ -76,8 +69,7 @@ def on_service_purchase_delivered(service_purchase: ServicePurchase):
 
 
 def on_service_purchase_approved(service_purchase: ServicePurchase):
-    data = {"currency": param_currency(),
-            "purchase": service_purchase,
+    data = {"purchase": service_purchase,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(service_purchase.id)}
 
     return process_mail(_("Order approved"),
@@ -87,8 +79,7 @@ def on_service_purchase_approved(service_purchase: ServicePurchase):
 
 
 def on_service_purchase_canceled(service_purchase: ServicePurchase):
-    data = {"currency": param_currency(),
-            "purchase": service_purchase,
+    data = {"purchase": service_purchase,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(service_purchase.id)}
 
     return process_mail(_("Order canceled"),
@@ -98,19 +89,23 @@ def on_service_purchase_canceled(service_purchase: ServicePurchase):
 
 
 def send_service_purchase_deadline_reminder(service_purchase: ServicePurchase):
-    data = {"currency": param_currency(),
-            "purchase": service_purchase,
-            "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(service_purchase.id)}
+    return send_service_purchase_deadline_reminders([service_purchase])
 
-    return process_mail(_("Deadline reminder"),
-                        "mails/services/purchases/deadline_reminder.html",
-                        data,
-                        service_purchase.seller.user.email)
+
+def send_service_purchase_deadline_reminders(service_purchases):
+    htmls = renderer.render_many("mails/services/purchases/deadline_reminder.html", [
+        {"purchase": service_purchase,
+         "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(service_purchase.id)}
+        for service_purchase in service_purchases
+    ])
+
+    subject = str(_("Deadline reminder"))
+    return send_mails([(service_purchase.seller.user.email, subject, html)
+                       for service_purchase, html in zip(service_purchases, htmls)])
 
 
 def on_service_purchase_update_request_initiated(service_purchase_update_request: ServicePurchaseUpdateRequest):
-    data = {"currency": param_currency(),
-            "update_request": service_purchase_update_request,
+    data = {"update_request": service_purchase_update_request,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(
                 service_purchase_update_request.service_purchase.id)}
 
@@ -122,8 +117,7 @@ def on_service_purchase_update_request_initiated(service_purchase_update_request
 
 def on_service_purchase_update_request_accepted_or_refused(
         service_purchase_update_request: ServicePurchaseUpdateRequest):
-    data = {"currency": param_currency(),
-            "update_request": service_purchase_update_request,
+    data = {"update_request": service_purchase_update_request,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(
                 service_purchase_update_request.service_purchase.id)}
 
@@ -135,8 +129,7 @@ def on_service_purchase_update_request_accepted_or_refused(
 
 
 def on_service_purchase_update_request_delivered(service_purchase_update_request: ServicePurchaseUpdateRequest):
-    data = {"currency": param_currency(),
-            "update_request": service_purchase_update_request,
+    data = {"update_request": service_purchase_update_request,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(
                 service_purchase_update_request.service_purchase.id)}
 
@@ -147,8 +140,7 @@ def on_service_purchase_update_request_delivered(service_purchase_update_request
 
 
 def on_litigation_opened(litigation: Litigation):
-    data = {"currency": param_currency(),
-            "litigation": litigation,
+    data = {"litigation": litigation,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/purchases/' + str(litigation.service_purchase.id)}
 
     process_mail(_("Litigation opened"),
@@ -164,8 +156,7 @@ def on_litigation_opened(litigation: Litigation):
 
 
 def on_litigation_handled(litigation: Litigation):
-    data = {"currency": param_currency(),
-            "litigation": litigation,
+    data = {"litigation": litigation,
             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/purchases/' + str(litigation.service_purchase.id)}
 
     process_mail(litigation.decision_display,
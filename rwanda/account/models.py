@@ -50,8 +50,16 @@ class Refund(models.Model):
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE, null=True, blank=True)
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
     refund_way = models.ForeignKey(RefundWay, on_delete=models.CASCADE, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['account', 'created_at', 'id']),
+            models.Index(fields=['status', 'claimed_at']),
+        ]
+
     def __str__(self):
         return self.amount
 
@@ -108,3 +116,51 @@ class Refund(models.Model):
 
     def set_as_refused(self):
         self.status = self.STATUS_REFUSED
+
+
+class Blob(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    hash = models.CharField(max_length=64)
+    extension = models.CharField(max_length=255, blank=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    held_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('hash', 'extension')
+        indexes = [
+            models.Index(fields=['refcount', 'held_until']),
+        ]
+
+    def __str__(self):
+        return self.hash + self.extension
+
+
+class Upload(models.Model):
+    TARGET_DELIVERABLE = 'DELIVERABLE'
+    TARGET_CHAT_MESSAGE = 'CHAT_MESSAGE'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    target = models.CharField(max_length=255)
+    target_id = models.UUIDField()
+    name = models.CharField(max_length=255)
+    length = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    hash = models.CharField(max_length=64, null=True, blank=True)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def completed(self):
+        return self.completed_at is not None
+
+    @property
+    def part_name(self):
+        return "uploads/{}.part".format(self.id)
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rwanda.account.uploads import release_blob, acquire_blob, blob_for_file
+from rwanda.purchases.bundles import remove_bundles
+from rwanda.purchases.models import DeliverableFile, ChatMessage
+from rwanda.services.models import Service, ServiceMedia
+from rwanda.users.models import User
+
+BLOB_FIELDS = {
+    DeliverableFile: ('file', 'blob_id'),
+    ChatMessage: ('file', 'blob_id'),
+    Service: ('file', 'blob_id'),
+    ServiceMedia: ('file', 'blob_id'),
+    User: ('image', 'image_blob_id'),
+}
+
+
+@receiver(pre_save, sender=DeliverableFile)
+@receiver(pre_save, sender=ChatMessage)
+@receiver(pre_save, sender=Service)
+@receiver(pre_save, sender=ServiceMedia)
+@receiver(pre_save, sender=User)
+def track_blob(sender, instance, raw, update_fields, **kwargs):
+    instance._blob_change = None
+
+    file_field, blob_field = BLOB_FIELDS[sender]
+    if raw or file_field not in instance.__dict__ or update_fields is not None and file_field not in update_fields:
+        return
+
+    file = getattr(instance, file_field)
+    file_name = file.name if file else None
+
+    old_file_name, old_blob_id = None, None
+    if not instance._state.adding:
+        old_file_name, old_blob_id = sender.objects \
+                                         .filter(pk=instance.pk) \
+                                         .values_list(file_field, blob_field) \
+                                         .first() or (None, None)
+        if old_file_name == file_name:
+            return
+
+    blob_id = blob_for_file(file_name)
+    setattr(instance, blob_field, blob_id)
+    if blob_id != old_blob_id:
+        instance._blob_change = (old_blob_id, blob_id)
+
+
+@receiver(post_save, sender=DeliverableFile)
+@receiver(post_save, sender=ChatMessage)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=ServiceMedia)
+@receiver(post_save, sender=User)
+def reference_blob(sender, instance, **kwargs):
+    change = getattr(instance, '_blob_change', None)
+    if change is None:
+        return
+
+    old_blob_id, blob_id = change
+    acquire_blob(blob_id)
+    release_blob(old_blob_id)
+    instance._blob_change = None
+
+
+@receiver(post_delete, sender=DeliverableFile)
+@receiver(post_delete, sender=ChatMessage)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=ServiceMedia)
+@receiver(post_delete, sender=User)
+def release_file_blob(sender, instance, **kwargs):
+    release_blob(getattr(instance, BLOB_FIELDS[sender][1]))
+
+
+@receiver(post_save, sender=DeliverableFile)
+@receiver(post_delete, sender=DeliverableFile)
+def remove_deliverable_bundles(sender, instance, **kwargs):
+    deliverable_id = instance.deliverable_id
+    transaction.on_commit(lambda: remove_bundles(deliverable_id))
@@ -5,8 +5,10 @@ from rwanda.account.mails import send_verification_mail, on_service_purchase_ini
     on_service_purchase_canceled, on_service_purchase_update_request_initiated, \
     on_service_purchase_update_request_accepted_or_refused, on_service_purchase_update_request_delivered, \
     on_litigation_opened, on_litigation_handled, on_service_accepted_or_rejected
+from rwanda.account.uploads import expire_uploads, collect_blobs
 from rwanda.purchases.models import ServicePurchase, ServicePurchaseUpdateRequest, Litigation
 from rwanda.services.models import Service
+from rwanda.thumbnails import generate_thumbnails
 from rwanda.users.models import User
 
 
@@ -71,3 +73,18 @@ def on_litigation_opened_task(litigation_uuid):
 @shared_task
 def on_litigation_handled_task(litigation_uuid):
     return on_litigation_handled(Litigation.objects.get(pk=litigation_uuid))
+
+
+@shared_task
+def expire_uploads_task():
+    return expire_uploads()
+
+
+@shared_task
+def collect_blobs_task():
+    return collect_blobs()
+
+
+@shared_task
+def generate_thumbnails_task(file_name):
+    return generate_thumbnails(file_name)
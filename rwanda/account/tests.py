@@ -0,0 +1,228 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from rwanda.account.models import Upload, Blob, Deposit, Refund, RefundWay
+from rwanda.account.uploads import create_upload, write_upload, media_path, UploadOffsetConflict, collect_blob
+from rwanda.exports import export_response
+from rwanda.purchases.models import Deliverable, DeliverableFile
+from rwanda.testing import create_account, create_service, create_service_purchase, DatatableQueriesMixin
+
+
+class InterruptedStream:
+    def __init__(self, data, fail_after):
+        self.stream = io.BytesIO(data)
+        self.fail_after = fail_after
+
+    def read(self, size=-1):
+        if self.stream.tell() >= self.fail_after:
+            raise OSError("Connection reset by peer")
+
+        return self.stream.read(min(size, self.fail_after - self.stream.tell()))
+
+
+@override_settings(UPLOADS_CHUNK_SIZE=4)
+class UploadTestCase(TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(BASE_DIR=self.base_dir,
+                                                   FILE_UPLOAD_TEMP_DIR=os.path.join(self.base_dir, 'media', 'tmp'))
+        self.settings_override.enable()
+
+        seller = create_account("seller")
+        service_purchase = create_service_purchase(create_account("buyer"), create_service(seller))
+        self.account = seller
+        self.deliverable = Deliverable.objects.create(title="Logo", version=Deliverable.VERSION_FINAL,
+                                                      description="Logo", service_purchase=service_purchase)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def create_upload(self, data):
+        return create_upload(self.account, Upload.TARGET_DELIVERABLE, self.deliverable.id, "logo.svg", len(data))
+
+    def assertDelivered(self, deliverable_file, data):
+        self.assertIsInstance(deliverable_file, DeliverableFile)
+        with open(media_path(deliverable_file.file.name), 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_interrupted_upload_resumes_from_the_last_offset(self):
+        data = b"0123456789abcdef"
+        upload = self.create_upload(data)
+
+        with self.assertRaises(OSError):
+            write_upload(upload.id, 0, InterruptedStream(data, 8))
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 8)
+        self.assertFalse(upload.completed)
+
+        upload, deliverable_file = write_upload(upload.id, upload.offset, io.BytesIO(data[upload.offset:]))
+
+        self.assertTrue(upload.completed)
+        self.assertEqual(upload.offset, len(data))
+        self.assertDelivered(deliverable_file, data)
+        self.assertFalse(os.path.exists(media_path(upload.part_name)))
+
+    def test_write_at_a_stale_offset_is_rejected(self):
+        data = b"0123456789"
+        upload = self.create_upload(data)
+        write_upload(upload.id, 0, io.BytesIO(data[:6]))
+
+        with self.assertRaises(UploadOffsetConflict) as context:
+            write_upload(upload.id, 2, io.BytesIO(data[2:]))
+
+        self.assertEqual(context.exception.offset, 6)
+
+    def test_completion_retried_after_a_failure(self):
+        data = b"0123456789"
+        upload = self.create_upload(data)
+
+        with mock.patch.object(DeliverableFile.objects, 'create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                write_upload(upload.id, 0, io.BytesIO(data))
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, len(data))
+        self.assertFalse(upload.completed)
+        self.assertFalse(os.path.exists(media_path(upload.part_name)))
+
+        upload, deliverable_file = write_upload(upload.id, upload.offset, io.BytesIO(b""))
+
+        self.assertTrue(upload.completed)
+        self.assertDelivered(deliverable_file, data)
+        self.assertEqual(Blob.objects.get().refcount, 1)
+
+    def test_collected_blob_files_are_removed_after_the_row(self):
+        upload, deliverable_file = write_upload(self.create_upload(b"0123456789").id, 0, io.BytesIO(b"0123456789"))
+        blob = Blob.objects.get()
+        Blob.objects.filter(pk=blob.pk).update(held_until=None)
+        deliverable_file.delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(collect_blob(blob.id))
+
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(media_path(blob.file.name)))
+
+    def test_referenced_blob_is_kept_when_its_refcount_drifted(self):
+        upload, deliverable_file = write_upload(self.create_upload(b"0123456789").id, 0, io.BytesIO(b"0123456789"))
+        blob = Blob.objects.get()
+        Blob.objects.filter(pk=blob.pk).update(refcount=0, held_until=None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(collect_blob(blob.id))
+
+        self.assertTrue(Blob.objects.filter(pk=blob.pk).exists())
+        self.assertDelivered(deliverable_file, b"0123456789")
+
+    def test_patch_resumes_from_head_offset(self):
+        data = b"0123456789"
+        upload = self.create_upload(data)
+        self.client.force_login(self.account.user)
+        url = "/account/uploads/{}".format(upload.id)
+
+        response = self.client.patch(url, data[:4], content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0', HTTP_TUS_RESUMABLE='1.0.0')
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.head(url, HTTP_TUS_RESUMABLE='1.0.0')
+        self.assertEqual(response['Upload-Offset'], '4')
+
+        response = self.client.patch(url, data[4:], content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET=response['Upload-Offset'], HTTP_TUS_RESUMABLE='1.0.0')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], str(len(data)))
+        self.assertDelivered(DeliverableFile.objects.get(deliverable=self.deliverable), data)
+
+    @override_settings(UPLOADS_PATCH_MAX_SIZE=4)
+    def test_patch_larger_than_the_resumable_unit_is_rejected(self):
+        data = b"0123456789"
+        upload = self.create_upload(data)
+        self.client.force_login(self.account.user)
+
+        response = self.client.patch("/account/uploads/{}".format(upload.id), data,
+                                     content_type='application/offset+octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0', HTTP_TUS_RESUMABLE='1.0.0')
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   PARAMETERS_LOCAL_TTL=60)
+class DatatableQueriesTestCase(DatatableQueriesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.account = create_account("account")
+        self.seller = create_account("seller")
+        self.refund_way = RefundWay.objects.create(name="Orange Money", country_code="CI")
+        self.client.force_login(self.account.user)
+
+    def create_deposit(self):
+        Deposit.objects.create(amount=1000, account=self.account)
+
+    def create_refund(self):
+        Refund.objects.create(amount=1000, account=self.account, refund_way=self.refund_way, phone_number="0102030405")
+
+    def create_service(self):
+        create_service(self.account)
+
+    def create_purchase(self):
+        create_service_purchase(self.account, create_service(self.seller))
+
+    def create_order(self):
+        create_service_purchase(self.seller, create_service(self.account))
+
+    # Budgets: session, user, account, count and page, plus the service options prefetch for purchases.
+    def test_deposits_queries(self):
+        self.assertConstantQueries("/account/deposits.json", self.create_deposit, 5)
+
+    def test_refunds_queries(self):
+        self.assertConstantQueries("/account/refunds.json", self.create_refund, 5)
+
+    def test_services_queries(self):
+        self.assertConstantQueries("/account/services.json", self.create_service, 5)
+
+    def test_purchases_queries(self):
+        self.assertConstantQueries("/account/purchases.json", self.create_purchase, 6)
+
+    def test_orders_queries(self):
+        self.assertConstantQueries("/account/orders.json", self.create_order, 6)
+
+
+class XlsxExportTestCase(SimpleTestCase):
+    def setUp(self):
+        self.paths = []
+        mkstemp = tempfile.mkstemp
+
+        def record_mkstemp(*args, **kwargs):
+            fd, path = mkstemp(*args, **kwargs)
+            self.paths.append(path)
+            return fd, path
+
+        patcher = mock.patch('rwanda.exports.tempfile.mkstemp', side_effect=record_mkstemp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_temporary_file_is_removed_once_opened(self):
+        response = export_response('xlsx', 'deposits', ['Amount'], iter([[1000], [2000]]))
+
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+        response.close()
+        self.assertFalse(os.path.exists(self.paths[0]))
+
+    def test_temporary_file_is_removed_when_the_build_fails(self):
+        def rows():
+            yield [1000]
+            raise RuntimeError("Connection lost")
+
+        with self.assertRaises(RuntimeError):
+            export_response('xlsx', 'deposits', ['Amount'], rows())
+
+        self.assertFalse(os.path.exists(self.paths[0]))
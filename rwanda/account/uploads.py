@@ -0,0 +1,273 @@
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import F, Q, ProtectedError
+from django.utils import timezone
+
+from rwanda.account.models import Blob, Upload
+from rwanda.purchases.models import DeliverableFile, ChatMessage
+from rwanda.thumbnails import thumbnail_name
+
+logger = logging.getLogger('rwanda.uploads')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def media_path(*paths):
+    return os.path.join(settings.BASE_DIR, "media", *paths)
+
+
+def file_extension(name):
+    extension = os.path.splitext(name or '')[1].lower()
+    return extension if len(extension) <= 16 else ''
+
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+
+    return sha256
+
+
+def store_upload(f: UploadedFile):
+    os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+
+    if hasattr(f, 'temporary_file_path'):
+        f.file.flush()
+        sha256 = hash_file(f.temporary_file_path())
+
+        fd, tmp_path = tempfile.mkstemp(dir=settings.FILE_UPLOAD_TEMP_DIR)
+        os.close(fd)
+        try:
+            os.replace(f.temporary_file_path(), tmp_path)
+        except OSError:
+            with open(tmp_path, 'wb') as destination:
+                f.seek(0)
+                shutil.copyfileobj(f, destination, HASH_CHUNK_SIZE)
+    else:
+        sha256 = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=settings.FILE_UPLOAD_TEMP_DIR)
+        with os.fdopen(fd, 'wb') as destination:
+            for chunk in f.chunks():
+                sha256.update(chunk)
+                destination.write(chunk)
+
+    return commit_blob(tmp_path, sha256.hexdigest(), f.size, file_extension(f.name))
+
+
+def blob_held_until():
+    return timezone.now() + timedelta(seconds=settings.BLOBS_HOLD_TIMEOUT)
+
+
+def commit_blob(tmp_path, hash, size, extension):
+    relative_path = "/".join(["blobs", hash[:2], hash[2:4], hash + extension])
+    path = media_path(relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # A stored blob is only held until a row points at it, see the account signals taking the references.
+    try:
+        with transaction.atomic():
+            blob, created = Blob.objects.select_for_update().get_or_create(
+                hash=hash,
+                extension=extension,
+                defaults={"file": relative_path, "size": size})
+
+            if created or not os.path.exists(path):
+                os.replace(tmp_path, path)
+
+            blob.held_until = blob_held_until()
+            blob.save(update_fields=['held_until'])
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return blob
+
+
+def blob_for_file(file_name):
+    if not file_name:
+        return None
+
+    return Blob.objects.filter(file=file_name).values_list('id', flat=True).first()
+
+
+def acquire_blob(blob_id):
+    if blob_id is None:
+        return
+
+    Blob.objects.filter(pk=blob_id).update(refcount=F('refcount') + 1)
+
+
+def release_blob(blob_id):
+    if blob_id is None:
+        return
+
+    Blob.objects.filter(pk=blob_id, refcount__gt=0).update(refcount=F('refcount') - 1)
+    transaction.on_commit(lambda: collect_blob(blob_id))
+
+
+def collect_blob(blob_id):
+    try:
+        with transaction.atomic():
+            blob = Blob.objects \
+                .select_for_update() \
+                .filter(Q(held_until__isnull=True) | Q(held_until__lt=timezone.now()), pk=blob_id, refcount=0) \
+                .first()
+            if blob is None:
+                return False
+
+            # The row goes first: files are only removed once its deletion is committed.
+            blob.delete()
+            transaction.on_commit(lambda: remove_blob_files(blob.file.name))
+    except ProtectedError:
+        logger.warning("Blob {} is still referenced with a zero refcount".format(blob_id))
+        return False
+
+    return True
+
+
+def collect_blobs():
+    ids = Blob.objects \
+        .filter(refcount=0, held_until__lt=timezone.now()) \
+        .values_list('id', flat=True)
+
+    return len([blob_id for blob_id in list(ids) if collect_blob(blob_id)])
+
+
+def remove_blob_files(file_name):
+    # commit_blob may have stored the same content again since the row was deleted.
+    if Blob.objects.filter(file=file_name).exists():
+        return
+
+    remove_files([media_path(file_name)] +
+                 [media_path(thumbnail_name(file_name, size)) for size in settings.THUMBNAIL_SIZES])
+
+
+def remove_files(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class UploadOffsetConflict(Exception):
+    def __init__(self, offset):
+        super().__init__("Upload offset mismatch, expected {}.".format(offset))
+        self.offset = offset
+
+
+def upload_expires_at():
+    return timezone.now() + timedelta(seconds=settings.UPLOADS_EXPIRATION)
+
+
+def create_upload(account, target, target_id, name, length):
+    upload = Upload.objects.create(account=account, target=target, target_id=target_id, name=name,
+                                   length=length, expires_at=upload_expires_at())
+
+    path = media_path(upload.part_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+    return upload
+
+
+def write_upload(upload_id, offset, stream):
+    # Channels reads the whole request body before the view runs, so a dropped connection keeps nothing
+    # of its PATCH: each PATCH, at most UPLOADS_PATCH_MAX_SIZE, is the unit an upload resumes from.
+    upload = Upload.objects.get(pk=upload_id)
+    if upload.completed or offset != upload.offset:
+        raise UploadOffsetConflict(upload.offset)
+
+    if upload.offset == upload.length:
+        return upload, complete_upload(upload)
+
+    path = media_path(upload.part_name)
+
+    with open(path, 'r+b') as part:
+        fcntl.flock(part, fcntl.LOCK_EX)
+
+        upload.refresh_from_db()
+        if upload.completed or offset != upload.offset:
+            raise UploadOffsetConflict(upload.offset)
+
+        part.seek(offset)
+        part.truncate()
+
+        remaining = upload.length - offset
+        try:
+            while remaining > 0:
+                chunk = stream.read(min(settings.UPLOADS_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                part.write(chunk)
+                remaining -= len(chunk)
+        finally:
+            part.flush()
+            os.fsync(part.fileno())
+
+            upload.offset = upload.length - remaining
+            upload.expires_at = upload_expires_at()
+            upload.save(update_fields=['offset', 'expires_at'])
+
+    if upload.offset < upload.length:
+        return upload, None
+
+    return upload, complete_upload(upload)
+
+
+def complete_upload(upload: Upload):
+    path = media_path(upload.part_name)
+    extension = file_extension(upload.name)
+
+    # The part file is moved into the blob store before the target row exists: remember its hash so a
+    # completion retried after a failure finds the blob instead of the part file.
+    if upload.hash is None:
+        upload.hash = hash_file(path).hexdigest()
+        upload.save(update_fields=['hash'])
+
+    blob = Blob.objects.filter(hash=upload.hash, extension=extension).first()
+    if blob is None or os.path.exists(path):
+        blob = commit_blob(path, upload.hash, upload.length, extension)
+
+    with transaction.atomic():
+        upload = Upload.objects.select_for_update().get(pk=upload.pk)
+        if upload.completed:
+            raise UploadOffsetConflict(upload.offset)
+
+        if upload.target == Upload.TARGET_DELIVERABLE:
+            instance = DeliverableFile.objects.create(deliverable_id=upload.target_id, name=upload.name,
+                                                      file=blob.file.name, blob=blob, size=upload.length)
+        else:
+            instance = ChatMessage.objects.create(service_purchase_id=upload.target_id, account=upload.account,
+                                                  is_file=True, file_name=upload.name, file_size=upload.length,
+                                                  file=blob.file.name, blob=blob)
+
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=['completed_at'])
+
+    return instance
+
+
+def discard_upload(upload: Upload):
+    path = media_path(upload.part_name)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
+
+
+def expire_uploads():
+    count = 0
+    for upload in Upload.objects.filter(expires_at__lt=timezone.now()).iterator():
+        discard_upload(upload)
+        count += 1
+
+    return count
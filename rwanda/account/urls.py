@@ -4,12 +4,16 @@ from django.views.decorators.csrf import csrf_exempt
 from rwanda.account.views import PurchasesDatatableView, OrdersDatatableView, PurchaseDeliverablesDatatableView, \
     DeliverableUploadView, DepositsDatatableView, RefundsDatatableView, ServicesDatatableView, \
     ServiceOptionsDatatableView, ChatMessageUploadView, ServiceUploadView, \
-    DeliverableFilesDatatableView, OrderDeliverablesDatatableView, ServicePreSaveUploadView, AvatarUploadView
+    DeliverableFilesDatatableView, OrderDeliverablesDatatableView, ServicePreSaveUploadView, AvatarUploadView, \
+    UploadCreateView, UploadView, DeliverableBundleView
+from rwanda.account.models import Upload
 
 urlpatterns = [
     path('avatar/upload', csrf_exempt(AvatarUploadView.as_view())),
 
     path('deposits.json', DepositsDatatableView.as_view()),
+    path('deposits.csv', DepositsDatatableView.as_view(export='csv')),
+    path('deposits.xlsx', DepositsDatatableView.as_view(export='xlsx')),
     path('refunds.json', RefundsDatatableView.as_view()),
 
     path('services.json', ServicesDatatableView.as_view()),
@@ -18,13 +22,20 @@ urlpatterns = [
     path('services/pre-save/upload', csrf_exempt(ServicePreSaveUploadView.as_view())),
 
     path('orders.json', OrdersDatatableView.as_view()),
+    path('orders.csv', OrdersDatatableView.as_view(export='csv')),
+    path('orders.xlsx', OrdersDatatableView.as_view(export='xlsx')),
     path('orders/<uuid:pk>/deliverables.json', OrderDeliverablesDatatableView.as_view()),
 
     path('purchases.json', PurchasesDatatableView.as_view()),
     path('purchases/<uuid:pk>/deliverables.json', PurchaseDeliverablesDatatableView.as_view()),
 
     path('deliverables/<uuid:pk>/files.json', DeliverableFilesDatatableView.as_view()),
+    path('deliverables/<uuid:pk>/bundle.zip', DeliverableBundleView.as_view()),
     path('deliverables/<uuid:pk>/upload', csrf_exempt(DeliverableUploadView.as_view())),
+    path('deliverables/<uuid:pk>/uploads', csrf_exempt(UploadCreateView.as_view(target=Upload.TARGET_DELIVERABLE))),
 
     path('chat-messages/<uuid:pk>/upload', csrf_exempt(ChatMessageUploadView.as_view())),
+    path('chat-messages/<uuid:pk>/uploads', csrf_exempt(UploadCreateView.as_view(target=Upload.TARGET_CHAT_MESSAGE))),
+
+    path('uploads/<uuid:pk>', csrf_exempt(UploadView.as_view())),
 ]
@@ -1,28 +1,34 @@
 import os
-import uuid
+from base64 import b64decode
+from urllib.parse import quote
 
 from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.core.files.uploadedfile import UploadedFile
-from django.db.models import Count
-from django.http import JsonResponse
+from django.db.models import Count, Q
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, Http404
 from django.template.defaultfilters import date
 from django.template.defaultfilters import date as date_filter, time as time_filter
+from django.utils.http import http_date
 from django.views import View
-from django_datatables_view.base_datatable_view import BaseDatatableView
 
-from rwanda.account.models import Deposit, Refund
+from rwanda.account.models import Deposit, Refund, Upload
 from rwanda.account.serializers import ServiceSerializer, PurchaseSerializer, OrderSerializer, \
     DeliverableSerializer, DeliverableFileSerializer, ServiceOptionSerializer
-from rwanda.account.utils import create_folder_if_not_exits
+from rwanda.account.uploads import store_upload, media_path, create_upload, write_upload, \
+    discard_upload, UploadOffsetConflict
 from rwanda.administration.utils import param_currency
+from rwanda.datatables import KeysetDatatableView
+from rwanda.downloads import serve_file
 from rwanda.graphql.purchase.subscriptions import ChatMessageSubscription
+from rwanda.purchases.bundles import deliverable_bundle_files, bundle_name, stream_bundle, queue_bundle
 from rwanda.purchases.models import ServicePurchase, Deliverable, DeliverableFile, ChatMessage
 from rwanda.services.models import Service, ServiceOption
+from rwanda.thumbnails import queue_thumbnails
 from rwanda.users.models import User
 
 
-class DepositsDatatableView(BaseDatatableView):
+class DepositsDatatableView(KeysetDatatableView):
     currency = None
     columns = [
         'amount',
@@ -47,8 +53,9 @@ class DepositsDatatableView(BaseDatatableView):
         return Deposit.objects.filter(account__user=self.request.user)
 
 
-class RefundsDatatableView(BaseDatatableView):
+class RefundsDatatableView(KeysetDatatableView):
     currency = None
+    projection = ('refund_way__name',)
     columns = [
         'amount',
         'status',
@@ -87,10 +94,12 @@ class RefundsDatatableView(BaseDatatableView):
             return super(RefundsDatatableView, self).render_column(row, column)
 
     def get_initial_queryset(self):
-        return Refund.objects.prefetch_related("refund_way").filter(account__user=self.request.user)
+        return Refund.objects.filter(account__user=self.request.user)
 
 
-class ServicesDatatableView(BaseDatatableView):
+class ServicesDatatableView(KeysetDatatableView):
+    projection = ('service_category__label',)
+    serializer = ServiceSerializer
     columns = [
         'title',
         'service_category__label',
@@ -125,15 +134,16 @@ class ServicesDatatableView(BaseDatatableView):
             return '<span style="height: 5px" class="label label-lg font-weight-bold label-inline label-square label-light-{}">{}</span>' \
                 .format(class_name, row.published_display)
         elif column == "data":
-            return ServiceSerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(ServicesDatatableView, self).render_column(row, column)
 
     def get_initial_queryset(self):
-        return Service.objects.prefetch_related('service_category').filter(account__user=self.request.user)
+        return Service.objects.filter(account__user=self.request.user)
 
 
-class PurchasesDatatableView(BaseDatatableView):
+class PurchasesDatatableView(KeysetDatatableView):
+    projection = ('service__title',)
     serializer = PurchaseSerializer
     currency = None
     columns = [
@@ -184,26 +194,29 @@ class PurchasesDatatableView(BaseDatatableView):
         elif column == "deadline_at":
             return date_filter(row.deadline_at)
         elif column in ["data", 'number']:
-            return self.serializer(row).data
+            return self.serialized_row(row)
         else:
             return super(PurchasesDatatableView, self).render_column(row, column)
 
+    def export_column(self, row, column):
+        if column == "number":
+            return row.number
+
+        return super(PurchasesDatatableView, self).export_column(row, column)
+
     def get_initial_queryset(self):
-        return ServicePurchase.objects \
-            .prefetch_related("service") \
-            .filter(account__user=self.request.user)
+        return ServicePurchase.objects.filter(account__user=self.request.user)
 
 
 class OrdersDatatableView(PurchasesDatatableView):
     serializer = OrderSerializer
 
     def get_initial_queryset(self):
-        return ServicePurchase.objects \
-            .prefetch_related("service") \
-            .filter(service__account__user=self.request.user)
+        return ServicePurchase.objects.filter(service__account__user=self.request.user)
 
 
-class OrderDeliverablesDatatableView(BaseDatatableView):
+class OrderDeliverablesDatatableView(KeysetDatatableView):
+    serializer = DeliverableSerializer
     columns = [
         'title',
         'version',
@@ -238,7 +251,7 @@ class OrderDeliverablesDatatableView(BaseDatatableView):
             return '<span style="height: 5px" class="label label-lg font-weight-bold label-inline label-square label-light-{}">{}</span>' \
                 .format(class_name, row.published_display)
         elif column == "data":
-            data = DeliverableSerializer(row).data
+            data = self.serialized_row(row)
             data['files_count'] = row.annotate_files_count
             return data
         else:
@@ -255,7 +268,8 @@ class PurchaseDeliverablesDatatableView(OrderDeliverablesDatatableView):
             .filter(service_purchase=self.kwargs['pk'], published=True)
 
 
-class DeliverableFilesDatatableView(BaseDatatableView):
+class DeliverableFilesDatatableView(KeysetDatatableView):
+    serializer = DeliverableFileSerializer
     columns = [
         'name',
         'size',
@@ -271,35 +285,62 @@ class DeliverableFilesDatatableView(BaseDatatableView):
         elif column == "size":
             return row.size_display
         elif column == "data":
-            data = DeliverableFileSerializer(row).data
-            data['file_url'] = self.request.scheme + "://" + self.request.META['HTTP_HOST'] + row.file.url
+            data = self.serialized_row(row)
+            data['file_url'] = row.file_url
             return data
         else:
             return super(DeliverableFilesDatatableView, self).render_column(row, column)
 
     def get_initial_queryset(self):
-        return DeliverableFile.objects.filter(deliverable=self.kwargs['pk'])
+        account = self.request.user.account
+        return DeliverableFile.objects \
+            .filter(Q(deliverable__service_purchase__service__account=account) |
+                    Q(deliverable__service_purchase__account=account, deliverable__published=True),
+                    deliverable=self.kwargs['pk'])
+
+
+class DeliverableBundleView(View):
+    def get(self, request, *args, **kwargs):
+        account = request.user.account
+        deliverable = Deliverable.objects \
+            .filter(Q(service_purchase__service__account=account) |
+                    Q(service_purchase__account=account, published=True),
+                    pk=kwargs['pk']) \
+            .first()
+        if deliverable is None:
+            raise Http404
+
+        files = deliverable_bundle_files(deliverable)
+        if not files:
+            raise Http404
+
+        name = bundle_name(deliverable, files)
+        file_name = deliverable.title + ".zip"
+        if os.path.exists(media_path(name)):
+            return serve_file(name, file_name, attachment=True)
+
+        queue_bundle(deliverable, files)
+
+        response = StreamingHttpResponse(stream_bundle(files), content_type='application/zip')
+        response['Content-Disposition'] = "attachment; filename*=UTF-8''{}".format(quote(file_name))
+        response['Cache-Control'] = 'private, no-store'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 class ServiceUploadView(View):
     def post(self, request, *args, **kwargs):
         f: UploadedFile = request.FILES['file']
         if f is not None:
-            file_name = uuid.uuid4().urn[9:] + '.' + f.name.split('.')[-1]
-
-            folder = "services"
-            create_folder_if_not_exits(folder)
-
-            file_path = os.path.join(settings.BASE_DIR, "media", folder, file_name)
-
-            with open(file_path, 'wb+') as destination:
-                for chunk in f.chunks():
-                    destination.write(chunk)
+            blob = store_upload(f)
 
             service = Service.objects.get(pk=self.kwargs['pk'])
-            service.file = folder + "/" + file_name
+            service.file = blob.file.name
+            service.blob = blob
             service.save()
 
+            queue_thumbnails(blob.file.name)
+
         return JsonResponse({"response_code": 200}, safe=False)
 
 
@@ -307,21 +348,15 @@ class AvatarUploadView(View):
     def post(self, request, *args, **kwargs):
         f: UploadedFile = request.FILES['file']
         if f is not None:
-            file_name = uuid.uuid4().urn[9:] + '.' + f.name.split('.')[-1]
-
-            folder = "accounts"
-            create_folder_if_not_exits(folder)
-
-            file_path = os.path.join(settings.BASE_DIR, "media", folder, file_name)
-
-            with open(file_path, 'wb+') as destination:
-                for chunk in f.chunks():
-                    destination.write(chunk)
+            blob = store_upload(f)
 
             user: User = request.user
-            user.image = folder + "/" + file_name
+            user.image = blob.file.name
+            user.image_blob = blob
             user.save()
 
+            queue_thumbnails(blob.file.name)
+
         return JsonResponse({"response_code": 200}, safe=False)
 
 
@@ -329,39 +364,23 @@ class ServicePreSaveUploadView(View):
     def post(self, request, *args, **kwargs):
         f: UploadedFile = request.FILES['file']
         if f is not None:
-            file_name = uuid.uuid4().urn[9:] + '.' + f.name.split('.')[-1]
-
-            folder = "services"
-            create_folder_if_not_exits(folder)
-
-            file_path = os.path.join(settings.BASE_DIR, "media", folder, file_name)
+            blob = store_upload(f)
+            queue_thumbnails(blob.file.name)
 
-            with open(file_path, 'wb+') as destination:
-                for chunk in f.chunks():
-                    destination.write(chunk)
-
-            return JsonResponse({"response_code": 200, "file": folder + "/" + file_name}, safe=False)
+            return JsonResponse({"response_code": 200, "file": blob.file.name}, safe=False)
 
 
 class DeliverableUploadView(View):
     def post(self, request, *args, **kwargs):
         f: UploadedFile = request.FILES['file']
         if f is not None:
-            file_name = uuid.uuid4().urn[9:] + '.' + f.name.split('.')[-1]
-
-            folder = "deliverables"
-            create_folder_if_not_exits(folder)
-
-            file_path = os.path.join(settings.BASE_DIR, "media", folder, file_name)
-
-            with open(file_path, 'wb+') as destination:
-                for chunk in f.chunks():
-                    destination.write(chunk)
+            blob = store_upload(f)
 
             deliverable_file = DeliverableFile()
             deliverable_file.deliverable_id = kwargs['pk']
             deliverable_file.name = f.name
-            deliverable_file.file = folder + "/" + file_name
+            deliverable_file.file = blob.file.name
+            deliverable_file.blob = blob
             deliverable_file.size = f.size
             deliverable_file.save()
 
@@ -372,16 +391,7 @@ class ChatMessageUploadView(View):
     def post(self, request, *args, **kwargs):
         f: UploadedFile = request.FILES['file']
         if f is not None:
-            file_name = uuid.uuid4().urn[9:] + '.' + f.name.split('.')[-1]
-
-            folder = "chat_files"
-            create_folder_if_not_exits(folder)
-
-            file_path = os.path.join(settings.BASE_DIR, "media", folder, file_name)
-
-            with open(file_path, 'wb+') as destination:
-                for chunk in f.chunks():
-                    destination.write(chunk)
+            blob = store_upload(f)
 
             chat_message = ChatMessage()
             chat_message.service_purchase_id = kwargs['pk']
@@ -389,16 +399,128 @@ class ChatMessageUploadView(View):
             chat_message.is_file = True
             chat_message.file_name = f.name
             chat_message.file_size = f.size
-            chat_message.file = folder + "/" + file_name
+            chat_message.file = blob.file.name
+            chat_message.blob = blob
             chat_message.save()
 
             ChatMessageSubscription.broadcast(group=ChatMessageSubscription.name.format(kwargs['pk']),
-                                              payload=str(chat_message.id))
+                                              payload=chat_message.broadcast_payload())
 
         return JsonResponse({"response_code": 200}, safe=False)
 
 
-class ServiceOptionsDatatableView(BaseDatatableView):
+class UploadCreateView(View):
+    target = None
+
+    def post(self, request, *args, **kwargs):
+        try:
+            length = int(request.headers.get('Upload-Length'))
+        except (TypeError, ValueError):
+            return upload_response(status=400)
+
+        if length <= 0:
+            return upload_response(status=400)
+
+        if length > settings.UPLOADS_MAX_LENGTH:
+            return upload_response(status=413)
+
+        account = request.user.account
+        if self.target == Upload.TARGET_DELIVERABLE:
+            allowed = Deliverable.objects \
+                .filter(pk=kwargs['pk'], service_purchase__service__account=account) \
+                .exists()
+        else:
+            allowed = ServicePurchase.objects \
+                .filter(Q(account=account) | Q(service__account=account), pk=kwargs['pk']) \
+                .exists()
+
+        if not allowed:
+            return upload_response(status=403)
+
+        metadata = upload_metadata(request.headers.get('Upload-Metadata', ''))
+        upload = create_upload(account, self.target, kwargs['pk'], metadata.get('filename') or 'file', length)
+
+        response = upload_response(upload, status=201)
+        response['Location'] = request.build_absolute_uri("/account/uploads/{}".format(upload.id))
+        return response
+
+
+class UploadView(View):
+    def head(self, request, *args, **kwargs):
+        upload = Upload.objects.filter(pk=kwargs['pk'], account=request.user.account).first()
+        if upload is None:
+            return upload_response(status=404)
+
+        return upload_response(upload)
+
+    def patch(self, request, *args, **kwargs):
+        upload = Upload.objects.filter(pk=kwargs['pk'], account=request.user.account).first()
+        if upload is None:
+            return upload_response(status=404)
+
+        if request.content_type != 'application/offset+octet-stream':
+            return upload_response(status=415)
+
+        try:
+            offset = int(request.headers.get('Upload-Offset'))
+            length = int(request.headers.get('Content-Length') or 0)
+        except (TypeError, ValueError):
+            return upload_response(status=400)
+
+        if length > settings.UPLOADS_PATCH_MAX_SIZE:
+            return upload_response(upload, status=413)
+
+        try:
+            upload, instance = write_upload(upload.id, offset, request)
+        except UploadOffsetConflict:
+            upload.refresh_from_db()
+            return upload_response(upload, status=409)
+
+        if isinstance(instance, ChatMessage):
+            ChatMessageSubscription.broadcast(group=ChatMessageSubscription.name.format(instance.service_purchase_id),
+                                              payload=instance.broadcast_payload())
+
+        return upload_response(upload, status=204)
+
+    def delete(self, request, *args, **kwargs):
+        upload = Upload.objects.filter(pk=kwargs['pk'], account=request.user.account).first()
+        if upload is None:
+            return upload_response(status=404)
+
+        discard_upload(upload)
+
+        return upload_response(status=204)
+
+
+def upload_metadata(header):
+    metadata = {}
+    for pair in header.split(','):
+        parts = pair.strip().split(' ', 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = b64decode(parts[1]).decode() if len(parts) > 1 else ''
+        except ValueError:
+            continue
+
+    return metadata
+
+
+def upload_response(upload: Upload = None, status=200):
+    response = HttpResponse(status=status)
+    response['Tus-Resumable'] = '1.0.0'
+    response['Cache-Control'] = 'no-store'
+    if upload is not None:
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.length
+        if not upload.completed:
+            response['Upload-Expires'] = http_date(upload.expires_at.timestamp())
+
+    return response
+
+
+class ServiceOptionsDatatableView(KeysetDatatableView):
+    serializer = ServiceOptionSerializer
     currency = None
     columns = [
         'label',
@@ -429,7 +551,7 @@ class ServiceOptionsDatatableView(BaseDatatableView):
             return '<span style="height: 5px" class="label label-lg font-weight-bold label-square label-inline label-light-{}">{}</span>' \
                 .format(class_name, row.published_display)
         elif column == "data":
-            return ServiceOptionSerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(ServiceOptionsDatatableView, self).render_column(row, column)
 
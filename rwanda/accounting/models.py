@@ -1,25 +1,72 @@
 import uuid
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
 from rwanda.purchases.models import ServicePurchase
 from rwanda.users.models import Account
 
 
+class FundManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().annotate(shards_balance=Coalesce(Sum('shards__balance'), 0))
+
+
 class Fund(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     label = models.CharField(max_length=255, unique=True)
-    balance = models.PositiveBigIntegerField(default=0)
+    compacted_balance = models.BigIntegerField(default=0, db_column='balance')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FundManager()
+
     MAIN = "MAIN"
     COMMISSIONS = "COMMISSIONS"
     ACCOUNTS = "ACCOUNTS"
 
+    ids = {}
+
     def __str__(self):
         return self.label
 
+    @property
+    def balance(self):
+        shards_balance = getattr(self, 'shards_balance', None)
+        if shards_balance is None:
+            shards_balance = self.shards.aggregate(balance=Coalesce(Sum('balance'), 0))['balance']
+
+        return self.compacted_balance + shards_balance
+
+    @classmethod
+    def get_id(cls, label):
+        if label not in cls.ids:
+            cls.ids[label] = cls._base_manager.values_list('id', flat=True).get(label=label)
+
+        return cls.ids[label]
+
+    @transaction.atomic
+    def compact(self):
+        shards = list(FundShard.objects.select_for_update().filter(fund_id=self.pk).exclude(balance=0))
+        if not shards:
+            return
+
+        Fund._base_manager.filter(pk=self.pk) \
+            .update(compacted_balance=F('compacted_balance') + sum(shard.balance for shard in shards))
+        FundShard.objects.filter(pk__in=[shard.pk for shard in shards]).update(balance=0)
+
+
+class FundShard(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    fund = models.ForeignKey(Fund, related_name="shards", on_delete=models.CASCADE)
+    index = models.PositiveIntegerField()
+    balance = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('fund', 'index')
+
 
 class Operation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
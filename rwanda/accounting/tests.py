@@ -0,0 +1,91 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rwanda.accounting.models import Fund, Operation
+from rwanda.accounting.utils import post_transaction, UnbalancedTransaction
+from rwanda.graphql.purchase.operations import init_service_purchase, debit_account_entry, credit_main_entry, \
+    credit_commission_entry
+from rwanda.testing import create_account, create_service, create_service_purchase, create_funds
+
+
+class FundIdsTestCase(TestCase):
+    def setUp(self):
+        create_funds()
+        self.service_purchase = create_service_purchase(create_account("buyer", balance=10000),
+                                                        create_service(create_account("seller")))
+
+    def tearDown(self):
+        Fund.ids = {}
+
+    def test_fund_id_is_cached_after_first_use(self):
+        with self.assertNumQueries(1):
+            fund_id = Fund.get_id(Fund.MAIN)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(Fund.get_id(Fund.MAIN), fund_id)
+
+        self.assertEqual(fund_id, Fund.objects.get(label=Fund.MAIN).pk)
+
+    def test_entries_are_built_without_fund_lookups(self):
+        ids = [Fund.get_id(label) for label in (Fund.ACCOUNTS, Fund.MAIN, Fund.COMMISSIONS)]
+
+        with self.assertNumQueries(0):
+            entries = [
+                debit_account_entry(self.service_purchase.account, 1000, "DEBIT"),
+                credit_main_entry(self.service_purchase, 900, "CREDIT"),
+                credit_commission_entry(self.service_purchase, 100, "CREDIT"),
+            ]
+
+        self.assertEqual([entry.fund_id for entry in entries], ids)
+
+    def test_operations_are_posted_by_fund_id(self):
+        for label in (Fund.MAIN, Fund.ACCOUNTS, Fund.COMMISSIONS):
+            Fund.get_id(label)
+        fund_table = connection.ops.quote_name(Fund._meta.db_table)
+
+        with CaptureQueriesContext(connection) as context:
+            init_service_purchase(self.service_purchase)
+
+        self.assertFalse([query for query in context.captured_queries if fund_table in query['sql']])
+
+
+class PostTransactionTestCase(TestCase):
+    def setUp(self):
+        create_funds()
+        for label in (Fund.MAIN, Fund.ACCOUNTS, Fund.COMMISSIONS):
+            Fund.get_id(label)
+
+        self.buyer = create_account("buyer", balance=10000)
+        self.service_purchase = create_service_purchase(self.buyer, create_service(create_account("seller")))
+
+    def tearDown(self):
+        Fund.ids = {}
+
+    def assertFundBalance(self, label, balance):
+        self.assertEqual(Fund.objects.get(label=label).balance, balance)
+
+    def test_transaction_is_posted_in_one_insert_and_one_update(self):
+        # SAVEPOINT, operations insert, balances update, RELEASE SAVEPOINT.
+        with self.assertNumQueries(4):
+            init_service_purchase(self.service_purchase)
+
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.balance, 9000)
+        self.assertEqual(Operation.objects.filter(service_purchase=self.service_purchase).count(), 2)
+        self.assertEqual(Operation.objects.filter(account=self.buyer).count(), 1)
+        self.assertFundBalance(Fund.ACCOUNTS, -1000)
+        self.assertFundBalance(Fund.MAIN, 900)
+        self.assertFundBalance(Fund.COMMISSIONS, 100)
+
+    def test_unbalanced_transaction_is_rejected(self):
+        entries = [
+            Operation(type=Operation.TYPE_CREDIT, amount=1000, fund_id=Fund.get_id(Fund.MAIN)),
+            Operation(type=Operation.TYPE_DEBIT, amount=900, fund_id=Fund.get_id(Fund.ACCOUNTS)),
+        ]
+
+        with self.assertRaises(UnbalancedTransaction) as context:
+            post_transaction(entries)
+
+        self.assertEqual((context.exception.credits, context.exception.debits), (1000, 900))
+        self.assertFalse(Operation.objects.exists())
@@ -0,0 +1,70 @@
+import random
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from rwanda.accounting.models import Operation, FundShard
+from rwanda.users.models import Account
+
+
+class UnbalancedTransaction(ValueError):
+    def __init__(self, credits, debits):
+        super().__init__(f"Unbalanced transaction: {credits} credited, {debits} debited.")
+        self.credits = credits
+        self.debits = debits
+
+
+@transaction.atomic
+def post_transaction(entries, balanced=True):
+    if not entries:
+        return []
+
+    if balanced:
+        credits = sum(entry.amount for entry in entries if entry.credit)
+        debits = sum(entry.amount for entry in entries if entry.debit)
+        if credits != debits:
+            raise UnbalancedTransaction(credits, debits)
+
+    Operation.objects.bulk_create(entries)
+
+    funds = defaultdict(int)
+    accounts = defaultdict(int)
+    for entry in entries:
+        amount = entry.amount if entry.credit else -entry.amount
+        funds[entry.fund_id] += amount
+        if entry.account_id is not None:
+            accounts[entry.account_id] += amount
+
+    apply_balances(funds, accounts)
+
+    return entries
+
+
+def apply_balances(funds, accounts):
+    qn = connection.ops.quote_name
+    account_table = qn(Account._meta.db_table)
+    shard_table = qn(FundShard._meta.db_table)
+
+    sql = ""
+    params = []
+
+    if accounts:
+        sql += f"WITH accounts AS (" \
+               f"UPDATE {account_table} SET balance = {account_table}.balance + deltas.amount " \
+               f"FROM (VALUES {', '.join(['(%s::uuid, %s::bigint)'] * len(accounts))}) AS deltas (id, amount) " \
+               f"WHERE {account_table}.id = deltas.id) "
+        for account_id, amount in accounts.items():
+            params += [str(account_id), amount]
+
+    now = timezone.now()
+    sql += f"INSERT INTO {shard_table} (id, fund_id, {qn('index')}, balance, created_at) " \
+           f"VALUES {', '.join(['(%s::uuid, %s::uuid, %s, %s::bigint, %s)'] * len(funds))} " \
+           f"ON CONFLICT (fund_id, {qn('index')}) DO UPDATE SET balance = {shard_table}.balance + EXCLUDED.balance"
+    for fund_id, amount in funds.items():
+        params += [str(uuid.uuid4()), str(fund_id), random.randrange(settings.FUND_SHARDS), amount, now]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
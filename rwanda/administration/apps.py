@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AdministrationConfig(AppConfig):
     name = 'rwanda.administration'
+
+    def ready(self):
+        import rwanda.administration.signals
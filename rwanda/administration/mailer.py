@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from rwanda.administration.models import Mail
+
+logger = logging.getLogger('rwanda.mails')
+
+
+class MailjetMailer:
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=settings.MAILS_POOL_SIZE))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=settings.MAILS_POOL_SIZE))
+        self.session.auth = (settings.MAILJET_KEY, settings.MAILJET_SECRET)
+        self.counters = {"batches": 0, "sent": 0, "failed": 0, "seconds": 0.0}
+        self.lock = threading.Lock()
+
+    def send(self, mails):
+        data = {
+            'Messages': [
+                {
+                    "From": {
+                        "Email": settings.DEFAULT_FROM_EMAIL,
+                        "Name": settings.BRAND
+                    },
+                    "To": [
+                        {
+                            "Email": mail.to_email,
+                        }
+                    ],
+                    "Subject": mail.subject,
+                    "HTMLPart": mail.html,
+                    "CustomID": str(mail.id),
+                }
+                for mail in mails
+            ]
+        }
+
+        response = self.session.post(settings.MAILJET_SEND_URL, json=data, timeout=settings.MAILS_TIMEOUT)
+        try:
+            messages = response.json().get('Messages')
+        except ValueError:
+            messages = None
+
+        if not messages:
+            response.raise_for_status()
+            raise requests.HTTPError("Unexpected Mailjet response: " + response.text, response=response)
+
+        results = {}
+        for index, message in enumerate(messages):
+            mail_id = message.get('CustomID') or str(mails[index].id)
+            if message.get('Status') == 'success':
+                results[mail_id] = (True, str(message['To'][0].get('MessageUUID', '')) if message.get('To') else None)
+            else:
+                results[mail_id] = (False, "; ".join(error.get('ErrorMessage', '') for error in message.get('Errors', [])))
+
+        return results
+
+    def flush(self):
+        Mail.objects \
+            .filter(status=Mail.STATUS_SENDING,
+                    claimed_at__lt=timezone.now() - timedelta(seconds=settings.MAILS_CLAIM_TIMEOUT)) \
+            .update(status=Mail.STATUS_PENDING)
+
+        count = 0
+        while True:
+            with transaction.atomic():
+                mails = list(Mail.objects
+                             .select_for_update(skip_locked=True)
+                             .filter(status=Mail.STATUS_PENDING)
+                             .order_by('created_at')[:settings.MAILS_BATCH_SIZE])
+                Mail.objects \
+                    .filter(pk__in=[mail.pk for mail in mails]) \
+                    .update(status=Mail.STATUS_SENDING, claimed_at=timezone.now())
+
+            if not mails:
+                return count
+
+            started_at = time.monotonic()
+            try:
+                results = self.send(mails)
+            except Exception as e:
+                logger.warning("Mailjet batch of {} failed: {}".format(len(mails), e))
+                results = None
+                for mail in mails:
+                    mail.attempts += 1
+                    mail.error = str(e)
+                    mail.status = Mail.STATUS_FAILED if mail.attempts >= settings.MAILS_MAX_ATTEMPTS \
+                        else Mail.STATUS_PENDING
+            seconds = time.monotonic() - started_at
+
+            now = timezone.now()
+            sent = 0
+            if results is not None:
+                for mail in mails:
+                    mail.attempts += 1
+                    succeed, detail = results.get(str(mail.id), (False, "Missing from Mailjet response"))
+                    if succeed:
+                        mail.status = Mail.STATUS_SENT
+                        mail.message_id = detail
+                        mail.sent_at = now
+                        mail.error = None
+                        sent += 1
+                    else:
+                        mail.status = Mail.STATUS_FAILED
+                        mail.error = detail
+
+            Mail.objects.bulk_update(mails, ['status', 'attempts', 'message_id', 'error', 'sent_at'])
+
+            with self.lock:
+                self.counters["batches"] += 1
+                self.counters["sent"] += sent
+                self.counters["failed"] += len([mail for mail in mails if mail.status == Mail.STATUS_FAILED])
+                self.counters["seconds"] += seconds
+
+            logger.info("Mailjet batch: {} sent of {} in {:.3f}s".format(sent, len(mails), seconds))
+
+            count += sent
+            if results is None:
+                return count
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+
+        metrics["mails_per_second"] = metrics["sent"] / metrics["seconds"] if metrics["seconds"] else 0
+        return metrics
+
+
+mailer = MailjetMailer()
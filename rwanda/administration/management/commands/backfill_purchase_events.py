@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rwanda.purchases.models import ServicePurchase, PurchaseEvent
+
+
+class Command(BaseCommand):
+    help = 'Backfill purchase timeline events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        service_purchases = ServicePurchase.objects \
+            .select_related('litigation') \
+            .prefetch_related('servicepurchaseupdaterequest_set', 'deliverable_set', 'purchaseevent_set') \
+            .order_by('id')
+
+        count = 0
+        last_id = None
+        while True:
+            batch = service_purchases
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            batch = list(batch[:options['batch_size']])
+            if not batch:
+                break
+
+            events = []
+            for service_purchase in batch:
+                events += missing_events(service_purchase)
+
+            with transaction.atomic():
+                PurchaseEvent.objects.bulk_create(events)
+
+            count += len(events)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'{count} purchase events backfilled !'))
+
+
+def event_key(event: PurchaseEvent):
+    if event.kind == PurchaseEvent.KIND_DELIVERABLE_PUBLISHED:
+        return event.kind, event.deliverable_id
+
+    if event.kind in (PurchaseEvent.KIND_UPDATE_INITIATED, PurchaseEvent.KIND_UPDATE_ACCEPTED,
+                      PurchaseEvent.KIND_UPDATE_REFUSED, PurchaseEvent.KIND_UPDATE_DELIVERED):
+        return event.kind, event.happened_at
+
+    return event.kind,
+
+
+def missing_events(service_purchase: ServicePurchase):
+    existing = {event_key(event) for event in service_purchase.purchaseevent_set.all()}
+
+    return [event for event in service_purchase_events(service_purchase) if event_key(event) not in existing]
+
+
+def service_purchase_events(service_purchase: ServicePurchase):
+    kinds = [PurchaseEvent.KIND_INITIATED]
+    if service_purchase.has_been_accepted:
+        kinds.append(PurchaseEvent.KIND_ACCEPTED)
+    if service_purchase.has_been_refused:
+        kinds.append(PurchaseEvent.KIND_REFUSED)
+    if service_purchase.has_been_delivered:
+        kinds.append(PurchaseEvent.KIND_DELIVERED)
+    if service_purchase.has_been_in_dispute:
+        kinds.append(PurchaseEvent.KIND_IN_DISPUTE)
+    if service_purchase.has_been_approved:
+        kinds.append(PurchaseEvent.KIND_APPROVED)
+    if service_purchase.has_been_canceled:
+        kinds.append(PurchaseEvent.KIND_CANCELED)
+
+    events = [service_purchase.build_event(kind) for kind in kinds]
+
+    for update_request in service_purchase.servicepurchaseupdaterequest_set.all():
+        kinds = [PurchaseEvent.KIND_UPDATE_INITIATED]
+        if update_request.has_been_accepted:
+            kinds.append(PurchaseEvent.KIND_UPDATE_ACCEPTED)
+        if update_request.has_been_refused:
+            kinds.append(PurchaseEvent.KIND_UPDATE_REFUSED)
+        if update_request.has_been_delivered:
+            kinds.append(PurchaseEvent.KIND_UPDATE_DELIVERED)
+
+        events += [update_request.build_event(kind) for kind in kinds]
+
+    for deliverable in service_purchase.deliverable_set.all():
+        if not deliverable.published:
+            continue
+
+        events.append(PurchaseEvent(service_purchase=service_purchase,
+                                    deliverable=deliverable,
+                                    kind=PurchaseEvent.KIND_DELIVERABLE_PUBLISHED,
+                                    happened_at=deliverable.created_at))
+
+    return events
@@ -0,0 +1,37 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from rwanda.services.models import Service, ServiceMedia
+from rwanda.thumbnails import generate_thumbnails, is_image
+from rwanda.users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate missing thumbnails for service medias and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        file_names = set()
+        file_names.update(Service.objects.exclude(file='').exclude(file=None)
+                          .values_list('file', flat=True).iterator())
+        file_names.update(ServiceMedia.objects.exclude(file='').exclude(file=None)
+                          .values_list('file', flat=True).iterator())
+        file_names.update(User.objects.exclude(image='').exclude(image=None)
+                          .values_list('image', flat=True).iterator())
+        file_names = sorted(file_name for file_name in file_names if is_image(file_name))
+
+        count = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(generate_thumbnails, file_name): file_name for file_name in file_names}
+            for future in as_completed(futures):
+                try:
+                    if future.result():
+                        count += 1
+                except Exception as e:
+                    self.stderr.write(f'{futures[future]}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'{count} of {len(file_names)} images processed !'))
@@ -0,0 +1,36 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rwanda.account.utils import natural_size
+from rwanda.purchases.bundles import deliverable_bundle_files, stream_bundle
+from rwanda.purchases.models import Deliverable
+
+
+class Command(BaseCommand):
+    help = 'Benchmark deliverable bundle streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deliverable')
+
+    def handle(self, *args, **options):
+        deliverable = Deliverable.objects.filter(pk=options['deliverable']).first()
+        if deliverable is None:
+            raise CommandError('Deliverable not found.')
+
+        files = deliverable_bundle_files(deliverable)
+        files_size = sum(f.size for f in files)
+
+        tracemalloc.start()
+        started_at = time.perf_counter()
+        bundle_size = 0
+        for chunk in stream_bundle(files):
+            bundle_size += len(chunk)
+        elapsed = time.perf_counter() - started_at
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(f'{len(files)} files, {natural_size(files_size)} -> {natural_size(bundle_size)} bundle')
+        self.stdout.write(f'{elapsed:.2f} s, {natural_size(bundle_size / max(elapsed, 0.001))}/s')
+        self.stdout.write(self.style.SUCCESS(f'Peak memory while streaming: {natural_size(peak)}'))
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+
+from rwanda.administration.renderer import renderer
+from rwanda.administration.utils import param_currency
+from rwanda.purchases.models import ServicePurchase
+
+
+class Command(BaseCommand):
+    help = 'Benchmark deadline reminder mail rendering'
+
+    template = "mails/services/purchases/deadline_reminder.html"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        purchases = list(ServicePurchase.objects
+                         .select_related('service__account__user')
+                         .prefetch_related('service_options')[:100])
+        if not purchases:
+            raise CommandError('At least one service purchase is required.')
+
+        purchases = [purchases[i % len(purchases)] for i in range(options['count'])]
+
+        started_at = time.perf_counter()
+        for purchase in purchases:
+            render_to_string(self.template, {
+                "base_url": settings.BASE_URL,
+                "currency": param_currency(),
+                "purchase": purchase,
+                "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(purchase.id),
+            })
+        per_mail = (time.perf_counter() - started_at) / len(purchases)
+        self.stdout.write(f'render_to_string: {per_mail * 1000000:.1f} µs per mail')
+
+        renderer.render(self.template, {"purchase": purchases[0], "url": ""})
+
+        started_at = time.perf_counter()
+        renderer.render_many(self.template, [
+            {"purchase": purchase,
+             "url": settings.FRONTEND_ACCOUNT_BASE_URL + '/#/account/orders/' + str(purchase.id)}
+            for purchase in purchases
+        ])
+        bulk_per_mail = (time.perf_counter() - started_at) / len(purchases)
+        self.stdout.write(f'renderer.render_many: {bulk_per_mail * 1000000:.1f} µs per mail')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(purchases)} reminders rendered, '
+                                             f'{per_mail / bulk_per_mail:.1f}x faster in bulk !'))
@@ -0,0 +1,49 @@
+import io
+import time
+from copy import deepcopy
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from rwanda.graphql.mutations import form_data_converter, model_snapshot
+from rwanda.graphql.purchase.mutations import AcceptServicePurchase
+from rwanda.purchases.models import ServicePurchase
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the update mutations form data preparation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        purchases = list(ServicePurchase.objects.all()[:100])
+        if not purchases:
+            raise CommandError('At least one service purchase is required.')
+
+        purchases = [purchases[i % len(purchases)] for i in range(options['count'])]
+        form_fields = AcceptServicePurchase._meta.form_fields
+
+        started_at = time.perf_counter()
+        for purchase in purchases:
+            deepcopy(purchase)
+
+            class Serializer(serializers.ModelSerializer):
+                class Meta:
+                    model = ServicePurchase
+                    fields = "__all__"
+
+            JSONParser().parse(io.BytesIO(JSONRenderer().render(Serializer(purchase).data)))
+        before = (time.perf_counter() - started_at) / len(purchases)
+        self.stdout.write(f'serializer round trip + deepcopy: {before * 1000000:.1f} µs per mutation')
+
+        started_at = time.perf_counter()
+        for purchase in purchases:
+            model_snapshot(purchase)
+            form_data_converter(ServicePurchase, form_fields)(purchase)
+        after = (time.perf_counter() - started_at) / len(purchases)
+        self.stdout.write(f'form data converter + snapshot: {after * 1000000:.1f} µs per mutation')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(purchases)} update preparations, {before / after:.1f}x faster !'))
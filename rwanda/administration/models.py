@@ -19,3 +19,37 @@ class Parameter(models.Model):
     CINETPAY_PASSWORD = "CINETPAY_PASSWORD"
     DEPOSIT_FEE = "DEPOSIT_FEE"
     REMINDER_SERVICE_PURCHASE_DEADLINE_LTE = "REMINDER_SERVICE_PURCHASE_DEADLINE_LTE"
+
+    TYPES = {
+        BASE_PRICE: int,
+        COMMISSION: float,
+        HOME_PAGE_MAX_SIZE: int,
+        DEPOSIT_FEE: float,
+        REMINDER_SERVICE_PURCHASE_DEADLINE_LTE: int,
+    }
+
+
+class Mail(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    to_email = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    html = models.TextField()
+    STATUS_PENDING = "PENDING"
+    STATUS_SENDING = "SENDING"
+    STATUS_SENT = "SENT"
+    STATUS_FAILED = "FAILED"
+    status = models.CharField(max_length=255, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    message_id = models.CharField(max_length=255, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return self.subject
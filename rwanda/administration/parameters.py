@@ -0,0 +1,72 @@
+import time
+
+import redis
+from django.conf import settings
+
+from rwanda.administration.models import Parameter
+
+
+class ParameterRegistry:
+    version_key = "parameters:version"
+    values_key = "parameters:values:{}"
+    values_expire = 24 * 60 * 60
+
+    def __init__(self):
+        self.values = None
+        self.version = None
+        self.checked_at = 0
+        self.client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+    def get(self, label):
+        return self.load()[label]
+
+    def load(self):
+        now = time.monotonic()
+        if self.values is not None and now - self.checked_at < settings.PARAMETERS_LOCAL_TTL:
+            return self.values
+
+        try:
+            version = self.client.get(self.version_key) or "0"
+            if self.values is None or version != self.version:
+                self.values = self.cast(self.load_shared(version))
+                self.version = version
+        except redis.RedisError:
+            self.values = self.cast(self.fetch())
+            self.version = None
+
+        self.checked_at = now
+        return self.values
+
+    def load_shared(self, version):
+        key = self.values_key.format(version)
+
+        values = self.client.hgetall(key)
+        if not values:
+            values = self.fetch()
+            if values:
+                pipeline = self.client.pipeline()
+                pipeline.hset(key, mapping=values)
+                pipeline.expire(key, self.values_expire)
+                pipeline.execute()
+
+        return values
+
+    def invalidate(self):
+        self.values = None
+        self.version = None
+
+        try:
+            self.client.incr(self.version_key)
+        except redis.RedisError:
+            pass
+
+    @staticmethod
+    def fetch():
+        return dict(Parameter.objects.values_list("label", "value"))
+
+    @staticmethod
+    def cast(values):
+        return {label: Parameter.TYPES.get(label, str)(value) for label, value in values.items()}
+
+
+parameters = ParameterRegistry()
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.template import Context, Engine, engines
+
+from rwanda.administration.utils import param_currency, param_base_price
+
+
+class MailRenderer:
+    loaders = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+    def __init__(self):
+        self.engine = None
+        self.templates = {}
+
+    def get_engine(self):
+        if self.engine is None:
+            engine = engines['django'].engine
+            self.engine = Engine(dirs=engine.dirs,
+                                 loaders=self.loaders,
+                                 libraries=engine.libraries,
+                                 string_if_invalid=engine.string_if_invalid,
+                                 file_charset=engine.file_charset)
+        return self.engine
+
+    def get_template(self, template_name):
+        template = self.templates.get(template_name)
+        if template is None:
+            template = self.templates[template_name] = self.get_engine().get_template(template_name)
+        return template
+
+    @staticmethod
+    def shared_context():
+        return {
+            "base_url": settings.BASE_URL,
+            "currency": param_currency(),
+            "base_price": param_base_price(),
+        }
+
+    def render(self, template_name, data, shared=None):
+        return self.render_many(template_name, [data], shared)[0]
+
+    def render_many(self, template_name, items, shared=None):
+        template = self.get_template(template_name)
+        context = Context(shared if shared is not None else self.shared_context())
+
+        htmls = []
+        for data in items:
+            with context.push(data):
+                htmls.append(template.render(context))
+
+        return htmls
+
+
+renderer = MailRenderer()
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rwanda.administration.models import Parameter
+from rwanda.administration.parameters import parameters
+
+
+@receiver(post_save, sender=Parameter)
+@receiver(post_delete, sender=Parameter)
+def on_parameter_changed(sender, **kwargs):
+    transaction.on_commit(parameters.invalidate)
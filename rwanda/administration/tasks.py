@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from rwanda.administration.mailer import mailer
+
+
+@shared_task
+def flush_mails_task():
+    return mailer.flush()
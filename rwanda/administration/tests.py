@@ -0,0 +1,143 @@
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rwanda.account.models import Refund, RefundWay
+from rwanda.administration.mailer import MailjetMailer
+from rwanda.administration.models import Mail
+from rwanda.payments.models import Payment
+from rwanda.purchases.models import Litigation
+from rwanda.testing import create_account, create_admin, create_service, create_service_purchase, \
+    DatatableQueriesMixin
+
+
+class StandInSession:
+    def __init__(self, outcomes=None, error=None):
+        self.outcomes = outcomes or {}
+        self.error = error
+        self.batches = []
+
+    def post(self, url, json=None, **kwargs):
+        self.batches.append(json['Messages'])
+        if self.error is not None:
+            raise self.error
+
+        messages = []
+        for message in json['Messages']:
+            email = message['To'][0]['Email']
+            if self.outcomes.get(email, True):
+                messages.append({"Status": "success", "CustomID": message['CustomID'],
+                                 "To": [{"Email": email, "MessageUUID": "uuid-" + email}]})
+            else:
+                messages.append({"Status": "error", "CustomID": message['CustomID'],
+                                 "Errors": [{"ErrorMessage": "Invalid recipient"}]})
+
+        response = mock.Mock(status_code=200, text="")
+        response.json.return_value = {"Messages": messages}
+        return response
+
+
+@override_settings(MAILS_BATCH_SIZE=2, MAILS_MAX_ATTEMPTS=2)
+class MailjetMailerTestCase(TestCase):
+    def setUp(self):
+        self.mailer = MailjetMailer()
+
+    def create_mail(self, to_email, **kwargs):
+        return Mail.objects.create(to_email=to_email, subject="Subject", html="<p>Mail</p>", **kwargs)
+
+    def test_flush_sends_pending_mails_in_batches(self):
+        mails = [self.create_mail("user{}@rwanda.app".format(i)) for i in range(3)]
+        self.mailer.session = StandInSession()
+
+        self.assertEqual(self.mailer.flush(), 3)
+
+        self.assertEqual([len(batch) for batch in self.mailer.session.batches], [2, 1])
+        for mail in mails:
+            mail.refresh_from_db()
+            self.assertEqual(mail.status, Mail.STATUS_SENT)
+            self.assertEqual(mail.message_id, "uuid-" + mail.to_email)
+            self.assertEqual(mail.attempts, 1)
+            self.assertIsNotNone(mail.sent_at)
+
+    def test_rejected_message_is_marked_failed(self):
+        sent = self.create_mail("user@rwanda.app")
+        rejected = self.create_mail("invalid@rwanda.app")
+        self.mailer.session = StandInSession(outcomes={"invalid@rwanda.app": False})
+
+        self.assertEqual(self.mailer.flush(), 1)
+
+        sent.refresh_from_db()
+        rejected.refresh_from_db()
+        self.assertEqual(sent.status, Mail.STATUS_SENT)
+        self.assertEqual(rejected.status, Mail.STATUS_FAILED)
+        self.assertEqual(rejected.error, "Invalid recipient")
+
+    def test_send_error_returns_mails_to_the_queue(self):
+        mail = self.create_mail("user@rwanda.app")
+        self.mailer.session = StandInSession(error=requests.ConnectionError("Connection refused"))
+
+        self.assertEqual(self.mailer.flush(), 0)
+
+        mail.refresh_from_db()
+        self.assertEqual(mail.status, Mail.STATUS_PENDING)
+        self.assertEqual(mail.attempts, 1)
+        self.assertEqual(mail.error, "Connection refused")
+
+        self.mailer.flush()
+
+        mail.refresh_from_db()
+        self.assertEqual(mail.status, Mail.STATUS_FAILED)
+        self.assertEqual(mail.attempts, 2)
+
+    def test_unexpected_error_returns_mails_to_the_queue(self):
+        mail = self.create_mail("user@rwanda.app")
+        self.mailer.session = StandInSession(error=KeyError("Messages"))
+
+        self.mailer.flush()
+
+        mail.refresh_from_db()
+        self.assertEqual(mail.status, Mail.STATUS_PENDING)
+        self.assertEqual(mail.attempts, 1)
+
+    def test_stale_claims_are_sent_again(self):
+        stale = self.create_mail("stale@rwanda.app", status=Mail.STATUS_SENDING,
+                                 claimed_at=timezone.now() - timedelta(days=1))
+        claimed = self.create_mail("claimed@rwanda.app", status=Mail.STATUS_SENDING, claimed_at=timezone.now())
+        self.mailer.session = StandInSession()
+
+        self.assertEqual(self.mailer.flush(), 1)
+
+        stale.refresh_from_db()
+        claimed.refresh_from_db()
+        self.assertEqual(stale.status, Mail.STATUS_SENT)
+        self.assertEqual(claimed.status, Mail.STATUS_SENDING)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   PARAMETERS_LOCAL_TTL=60)
+class DatatableQueriesTestCase(DatatableQueriesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.account = create_account("account")
+        self.service = create_service(create_account("seller"))
+        self.refund_way = RefundWay.objects.create(name="Orange Money", country_code="CI")
+        self.client.force_login(create_admin("admin").user)
+
+    def create_refund(self):
+        payment = Payment.objects.create(amount=1000, account=self.account, type=Payment.TYPE_OUTGOING)
+        Refund.objects.create(amount=1000, account=self.account, refund_way=self.refund_way,
+                              phone_number="0102030405", payment=payment)
+
+    def create_dispute(self):
+        Litigation.objects.create(title="Late", content="Late", account=self.account,
+                                  service_purchase=create_service_purchase(self.account, self.service))
+
+    # Budgets: session, user, admin, count and page.
+    def test_refunds_queries(self):
+        self.assertConstantQueries("/administration/refunds.json", self.create_refund, 5)
+
+    def test_disputes_queries(self):
+        self.assertConstantQueries("/administration/disputes.json", self.create_dispute, 5)
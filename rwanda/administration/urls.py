@@ -7,6 +7,8 @@ from rwanda.administration.views import DisputesDatatableView, ServiceCategories
 
 urlpatterns = [
     path('refunds.json', RefundsDatatableView.as_view()),
+    path('refunds.csv', RefundsDatatableView.as_view(export='csv')),
+    path('refunds.xlsx', RefundsDatatableView.as_view(export='xlsx')),
     path('refund-ways.json', RefundWaysDatatableView.as_view()),
     path('disputes.json', DisputesDatatableView.as_view()),
     path('parameters.json', ParametersDatatableView.as_view()),
@@ -16,4 +18,6 @@ urlpatterns = [
     path('services/<uuid:pk>/options.json', ServiceOptionsDatatableView.as_view()),
     path('account/<uuid:pk>/services.json', AccountServicesDatatableView.as_view()),
     path('account/<uuid:pk>/operations.json', AccountOperationsDatatableView.as_view()),
+    path('account/<uuid:pk>/operations.csv', AccountOperationsDatatableView.as_view(export='csv')),
+    path('account/<uuid:pk>/operations.xlsx', AccountOperationsDatatableView.as_view(export='xlsx')),
 ]
@@ -1,55 +1,46 @@
-from django.conf import settings
-from mailjet_rest import Client
+from django.db import transaction
 
-from rwanda.administration.models import Parameter
+from rwanda.administration.models import Parameter, Mail
+from rwanda.administration.parameters import parameters
+from rwanda.administration.tasks import flush_mails_task
 
 
 def param_base_price():
-    return int(Parameter.objects.filter(label=Parameter.BASE_PRICE).first().value)
+    return parameters.get(Parameter.BASE_PRICE)
 
 
 def param_reminder_service_purchase_deadline_lte():
-    return int(Parameter.objects.filter(label=Parameter.REMINDER_SERVICE_PURCHASE_DEADLINE_LTE).first().value)
+    return parameters.get(Parameter.REMINDER_SERVICE_PURCHASE_DEADLINE_LTE)
 
 
 def param_deposit_fee():
-    return float(Parameter.objects.filter(label=Parameter.DEPOSIT_FEE).first().value)
+    return parameters.get(Parameter.DEPOSIT_FEE)
 
 
 def param_currency():
-    return Parameter.objects.filter(label=Parameter.CURRENCY).first().value
+    return parameters.get(Parameter.CURRENCY)
 
 
 def param_commission():
-    return float(Parameter.objects.filter(label=Parameter.COMMISSION).first().value)
+    return parameters.get(Parameter.COMMISSION)
 
 
 def param_home_max_page_size():
-    return int(Parameter.objects.filter(label=Parameter.HOME_PAGE_MAX_SIZE).first().value)
+    return parameters.get(Parameter.HOME_PAGE_MAX_SIZE)
 
 
 def param_cinetpay_password():
-    return Parameter.objects.filter(label=Parameter.CINETPAY_PASSWORD).first().value
+    return parameters.get(Parameter.CINETPAY_PASSWORD)
 
 
 def send_mail(to_email, subject, html):
-    mailjet = Client(auth=(settings.MAILJET_KEY, settings.MAILJET_SECRET), version='v3.1')
-    data = {
-        'Messages': [
-            {
-                "From": {
-                    "Email": settings.DEFAULT_FROM_EMAIL,
-                    "Name": settings.BRAND
-                },
-                "To": [
-                    {
-                        "Email": to_email,
-                    }
-                ],
-                "Subject": subject,
-                "HTMLPart": html,
-            }
-        ]
-    }
-    result = mailjet.send.create(data=data)
-    return result.status_code == 200
+    Mail.objects.create(to_email=to_email, subject=subject, html=html)
+    transaction.on_commit(lambda: flush_mails_task.delay())
+    return True
+
+
+def send_mails(messages):
+    Mail.objects.bulk_create([Mail(to_email=to_email, subject=subject, html=html)
+                              for to_email, subject, html in messages])
+    transaction.on_commit(lambda: flush_mails_task.delay())
+    return True
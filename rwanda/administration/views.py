@@ -1,7 +1,6 @@
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.db.models import Q
 from django.template.defaultfilters import date as date_filter, time as time_filter
-from django_datatables_view.base_datatable_view import BaseDatatableView
 
 from rwanda.account.models import Refund, RefundWay
 from rwanda.account.serializers import RefundSerializer, RefundWaySerializer, ParameterSerializer, UserSerializer
@@ -11,12 +10,15 @@ from rwanda.accounting.models import Operation
 from rwanda.administration.models import Parameter
 from rwanda.administration.serializers import LitigationSerializer, ServiceCategorySerializer
 from rwanda.administration.utils import param_currency
+from rwanda.datatables import KeysetDatatableView
 from rwanda.purchases.models import Litigation
 from rwanda.services.models import Service, ServiceCategory
 from rwanda.users.models import User
 
 
-class DisputesDatatableView(BaseDatatableView):
+class DisputesDatatableView(KeysetDatatableView):
+    projection = ('account__user__first_name', 'account__user__last_name', 'account__user__email')
+    serializer = LitigationSerializer
     columns = [
         'title',
         'status',
@@ -49,15 +51,16 @@ class DisputesDatatableView(BaseDatatableView):
         elif column == "account":
             return str(row.account)
         elif column == "data":
-            return LitigationSerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(DisputesDatatableView, self).render_column(row, column)
 
     def get_initial_queryset(self):
-        return Litigation.objects.prefetch_related("account", "account__user")
+        return Litigation.objects.all()
 
 
 class ServicesDatatableView(AccountServicesDatatableView):
+    projection = ('service_category__label', 'account__user__first_name', 'account__user__last_name', 'account__user__email')
     columns = [
         'title',
         'service_category__label',
@@ -84,16 +87,16 @@ class ServicesDatatableView(AccountServicesDatatableView):
             return super(ServicesDatatableView, self).render_column(row, column)
 
     def get_initial_queryset(self):
-        return Service.objects.prefetch_related('service_category', 'account__user').all()
+        return Service.objects.all()
 
 
 class AccountServicesDatatableView(ServicesDatatableView):
     def get_initial_queryset(self):
-        return Service.objects.prefetch_related('service_category', 'account__user').filter(
-            account__user_id=self.kwargs['pk'])
+        return Service.objects.filter(account__user_id=self.kwargs['pk'])
 
 
-class ServiceCategoriesDatatableView(BaseDatatableView):
+class ServiceCategoriesDatatableView(KeysetDatatableView):
+    serializer = ServiceCategorySerializer
     columns = [
         'label',
         'published',
@@ -115,7 +118,7 @@ class ServiceCategoriesDatatableView(BaseDatatableView):
             return '<span style="height: 5px" class="label label-lg font-weight-bold label-inline label-square label-light-{}">{}</span>' \
                 .format(class_name, row.published_display)
         elif column == "data":
-            return ServiceCategorySerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(ServiceCategoriesDatatableView, self).render_column(row, column)
 
@@ -124,6 +127,8 @@ class ServiceCategoriesDatatableView(BaseDatatableView):
 
 
 class RefundsDatatableView(AccountRefundsDatatableView):
+    projection = ('refund_way__name', 'payment__status', 'account__user__first_name', 'account__user__last_name', 'account__user__email')
+    serializer = RefundSerializer
     columns = [
         'amount',
         'status',
@@ -152,15 +157,16 @@ class RefundsDatatableView(AccountRefundsDatatableView):
                 return '<span style="height: 5px" class="label label-lg font-weight-bold label-inline label-square label-light-{}">{}</span>' \
                     .format(class_name, row.payment.status_display)
         elif column == "data":
-            return RefundSerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(RefundsDatatableView, self).render_column(row, column)
 
     def get_initial_queryset(self):
-        return Refund.objects.prefetch_related("refund_way", "account")
+        return Refund.objects.all()
 
 
-class RefundWaysDatatableView(BaseDatatableView):
+class RefundWaysDatatableView(KeysetDatatableView):
+    serializer = RefundWaySerializer
     columns = [
         'name',
         'country_code',
@@ -182,7 +188,7 @@ class RefundWaysDatatableView(BaseDatatableView):
         elif column == "created_at":
             return date_filter(row.created_at) + ' ' + time_filter(row.created_at)
         elif column == "data":
-            return RefundWaySerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(RefundWaysDatatableView, self).render_column(row, column)
 
@@ -190,7 +196,8 @@ class RefundWaysDatatableView(BaseDatatableView):
         return RefundWay.objects.all()
 
 
-class ParametersDatatableView(BaseDatatableView):
+class ParametersDatatableView(KeysetDatatableView):
+    serializer = ParameterSerializer
     columns = [
         'label',
         'value',
@@ -204,7 +211,7 @@ class ParametersDatatableView(BaseDatatableView):
         if column == "created_at":
             return date_filter(row.created_at) + '<br>' + time_filter(row.created_at)
         elif column == "data":
-            return ParameterSerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(ParametersDatatableView, self).render_column(row, column)
 
@@ -212,7 +219,8 @@ class ParametersDatatableView(BaseDatatableView):
         return Parameter.objects.exclude(label__in=[Parameter.CINETPAY_PASSWORD])
 
 
-class AccountDatatableView(BaseDatatableView):
+class AccountDatatableView(KeysetDatatableView):
+    serializer = UserSerializer
     columns = [
         'first_name',
         'last_name',
@@ -237,7 +245,7 @@ class AccountDatatableView(BaseDatatableView):
         elif column == "created_at":
             return date_filter(row.created_at) + '<br>' + time_filter(row.created_at)
         elif column == "data":
-            return UserSerializer(row).data
+            return self.serialized_row(row)
         else:
             return super(AccountDatatableView, self).render_column(row, column)
 
@@ -245,7 +253,7 @@ class AccountDatatableView(BaseDatatableView):
         return User.objects.filter(~Q(account__isnull=True))
 
 
-class AccountOperationsDatatableView(BaseDatatableView):
+class AccountOperationsDatatableView(KeysetDatatableView):
     currency = None
     columns = [
         'type',
@@ -23,20 +23,93 @@ app.autodiscover_tasks()
 def setup_periodic_tasks(sender, **kwargs):
     sender.add_periodic_task(crontab(hour=8, minute=30),
                              service_purchases_deadline_reminder_task.s())
+    sender.add_periodic_task(crontab(minute='*/5'),
+                             compact_funds_task.s())
+    sender.add_periodic_task(crontab(minute='*'),
+                             sender.signature('rwanda.payments.tasks.process_payment_notifications_task'))
+    sender.add_periodic_task(crontab(minute='*/30'),
+                             sender.signature('rwanda.payments.tasks.reconcile_payments_task'))
+    sender.add_periodic_task(crontab(minute='*/5'),
+                             sender.signature('rwanda.payments.tasks.release_stale_refunds_task'))
+    sender.add_periodic_task(crontab(minute='*'),
+                             sender.signature('rwanda.administration.tasks.flush_mails_task'))
+    sender.add_periodic_task(crontab(minute='*/15'),
+                             sender.signature('rwanda.purchases.tasks.cancel_overdue_service_purchases_task'))
+    sender.add_periodic_task(crontab(minute=0),
+                             sender.signature('rwanda.account.tasks.expire_uploads_task'))
+    sender.add_periodic_task(crontab(minute=30),
+                             sender.signature('rwanda.account.tasks.collect_blobs_task'))
 
 
 @app.task
 def service_purchases_deadline_reminder_task():
     from rwanda.purchases.models import ServicePurchase
+    from django.conf import settings
+    from django.db.models import Q
     from django.utils import timezone
     from datetime import timedelta
-    from rwanda.account.mails import send_service_purchase_deadline_reminder
     from rwanda.administration.utils import param_reminder_service_purchase_deadline_lte
 
+    now = timezone.now()
     days = param_reminder_service_purchase_deadline_lte()
-    for purchase in ServicePurchase.objects.filter(status=ServicePurchase.STATUS_ACCEPTED,
-                                                   deadline_at__lte=timezone.now() + timedelta(days)):
-        send_service_purchase_deadline_reminder(purchase)
+    reminded_before = now - timedelta(seconds=settings.REMINDERS_INTERVAL)
+    ids = ServicePurchase.objects \
+        .filter(Q(last_reminded_at__isnull=True) | Q(last_reminded_at__lt=reminded_before),
+                status=ServicePurchase.STATUS_ACCEPTED,
+                deadline_at__lte=now + timedelta(days)) \
+        .values_list('id', flat=True) \
+        .iterator(chunk_size=settings.REMINDERS_CHUNK_SIZE)
+
+    count = 0
+    batch = []
+    for id in ids:
+        batch.append(str(id))
+        if len(batch) == settings.REMINDERS_BATCH_SIZE:
+            service_purchases_deadline_reminder_batch_task.delay(batch)
+            count += len(batch)
+            batch = []
+
+    if batch:
+        service_purchases_deadline_reminder_batch_task.delay(batch)
+        count += len(batch)
+
+    return count
+
+
+@app.task
+def service_purchases_deadline_reminder_batch_task(service_purchase_uuids):
+    from rwanda.purchases.models import ServicePurchase
+    from django.conf import settings
+    from django.db import transaction
+    from django.db.models import Q
+    from django.utils import timezone
+    from datetime import timedelta
+    from rwanda.account.mails import send_service_purchase_deadline_reminders
+
+    now = timezone.now()
+    reminded_before = now - timedelta(seconds=settings.REMINDERS_INTERVAL)
+    with transaction.atomic():
+        purchases = list(ServicePurchase.objects
+                         .select_for_update(skip_locked=True, of=('self',))
+                         .filter(Q(last_reminded_at__isnull=True) | Q(last_reminded_at__lt=reminded_before),
+                                 pk__in=service_purchase_uuids,
+                                 status=ServicePurchase.STATUS_ACCEPTED)
+                         .select_related('service__account__user')
+                         .prefetch_related('service_options'))
+        if purchases:
+            ServicePurchase.objects.filter(pk__in=[purchase.pk for purchase in purchases]) \
+                .update(last_reminded_at=now)
+            send_service_purchase_deadline_reminders(purchases)
+
+    return len(purchases)
+
+
+@app.task
+def compact_funds_task():
+    from rwanda.accounting.models import Fund
+
+    for fund in Fund.objects.all():
+        fund.compact()
     return True
 
 
@@ -0,0 +1,256 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q, Model
+from django.utils.html import strip_tags
+from django_datatables_view.base_datatable_view import BaseDatatableView
+
+from rwanda.exports import export_response
+
+PAGING_PARAMS = {'draw', 'sEcho', 'start', 'iDisplayStart', 'length', 'iDisplayLength', '_'}
+ORDER_PARAMS = ('order[', 'iSortCol_', 'sSortDir_', 'iSortingCols')
+
+
+def is_search_param(key):
+    return key in ('search[value]', 'sSearch') or key.startswith('sSearch_') or key.endswith('[search][value]')
+
+
+def estimated_count(model):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                       [connection.ops.quote_name(model._meta.db_table)])
+        row = cursor.fetchone()
+
+    return row[0] if row is not None else -1
+
+
+def is_nullable(model, path):
+    for name in path.split('__'):
+        try:
+            field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return True
+        if field.null:
+            return True
+        model = field.related_model
+
+    return False
+
+
+def seek_filter(keys, values):
+    if any(value is None for value in values):
+        return None
+
+    q = Q()
+    for i, (field, descending, nullable) in enumerate(keys):
+        condition = Q(**{'{}__{}'.format(field, 'lt' if descending else 'gt'): values[i]})
+        # PostgreSQL sorts NULLs last in ascending order, so they all come after a non NULL cursor value.
+        if nullable and not descending:
+            condition |= Q(**{'{}__isnull'.format(field): True})
+        for j in range(i):
+            condition &= Q(**{keys[j][0]: values[j]})
+        q |= condition
+
+    return q
+
+
+class KeysetDatatableView(BaseDatatableView):
+    default_ordering = ('-created_at', '-id')
+    projection = ()
+    serializer = None
+    export = None
+    export_name = None
+    export_raw_columns = ('amount', 'price', 'created_at', 'deadline_at')
+
+    def get(self, request, *args, **kwargs):
+        """Exports run the whole filtered queryset. XLSX exports are built in full before streaming."""
+        if self.export is None:
+            return super().get(request, *args, **kwargs)
+
+        self.initialize(*args, **kwargs)
+        self.pre_camel_case_notation = 'iSortingCols' in self._querydict
+        self.columns_data = self.extract_datatables_column_data()
+        self._columns = self.get_columns()
+
+        qs = self.ordering(self.filter_queryset(self.project(self.get_initial_queryset())))
+        columns = [column for column in self._columns if column != 'data']
+        rows = ([self.export_column(row, column) for column in columns]
+                for row in qs.iterator(chunk_size=settings.DATATABLES_EXPORT_CHUNK_SIZE))
+
+        return export_response(self.export, self.export_name or self.request.path.rsplit('/', 1)[-1].split('.')[0],
+                               [column.replace('__', ' ').replace('_', ' ').capitalize() for column in columns],
+                               rows)
+
+    def export_column(self, row, column):
+        if column in self.export_raw_columns:
+            return self.row_value(row, column)
+
+        value = self.render_column(row, column)
+        if value is None:
+            return None
+
+        return strip_tags(str(value).replace('<br>', ' ')).strip()
+
+    def get_context_data(self, *args, **kwargs):
+        try:
+            self.initialize(*args, **kwargs)
+            self.pre_camel_case_notation = 'iSortingCols' in self._querydict
+
+            self.columns_data = self.extract_datatables_column_data()
+            self.is_data_list = True
+            if self.columns_data:
+                try:
+                    int(self.columns_data[0]['data'])
+                except ValueError:
+                    self.is_data_list = False
+
+            self._columns = self.get_columns()
+
+            qs = self.project(self.get_initial_queryset())
+            total_records = self.total_count(qs)
+
+            filtered_qs = self.filter_queryset(qs)
+            if self.searching:
+                total_display_records = self.cached_count('filtered', filtered_qs)
+            else:
+                total_display_records = total_records
+
+            qs = self.paging(self.ordering(filtered_qs))
+            data = self.prepare_results(qs)
+
+            if self.pre_camel_case_notation:
+                return {
+                    'sEcho': int(self._querydict.get('sEcho', 0)),
+                    'iTotalRecords': total_records,
+                    'iTotalDisplayRecords': total_display_records,
+                    'aaData': data,
+                }
+
+            return {
+                'draw': int(self._querydict.get('draw', 0)),
+                'recordsTotal': total_records,
+                'recordsFiltered': total_display_records,
+                'data': data,
+            }
+        except Exception as e:
+            return self.handle_exception(e)
+
+    def project(self, qs):
+        if self.serializer is not None and qs.model._meta.many_to_many:
+            qs = qs.prefetch_related(*[field.name for field in qs.model._meta.many_to_many])
+
+        if not self.projection:
+            return qs
+
+        related = sorted({path.rsplit('__', 1)[0] for path in self.projection})
+        fields = [field.name for field in qs.model._meta.concrete_fields]
+
+        return qs.select_related(*related).only(*fields, *self.projection)
+
+    def prepare_results(self, qs):
+        rows = list(qs)
+
+        self.serialized_rows = {}
+        if self.serializer is not None and rows:
+            self.serialized_rows = dict(zip([row.pk for row in rows], self.serializer(rows, many=True).data))
+
+        return super().prepare_results(rows)
+
+    def serialized_row(self, row):
+        return self.serialized_rows[row.pk]
+
+    @property
+    def searching(self):
+        for key, value in self._querydict.items():
+            if value and is_search_param(key):
+                return True
+
+        return False
+
+    def cache_key(self, *parts, ordered=True, searched=True):
+        params = sorted((key, value) for key, value in self._querydict.items()
+                        if key not in PAGING_PARAMS
+                        and (ordered or not key.startswith(ORDER_PARAMS))
+                        and (searched or not is_search_param(key)))
+        signature = hashlib.sha1(repr((self.request.path, params)).encode()).hexdigest()
+        user_id = self.request.user.pk if self.request.user.is_authenticated else None
+
+        return ":".join(['datatables', str(user_id), signature] + [str(part) for part in parts])
+
+    def cached_count(self, kind, qs):
+        key = self.cache_key(kind, ordered=False, searched=kind != 'total')
+        count = cache.get(key)
+        if count is None:
+            count = qs.count()
+            cache.set(key, count, settings.DATATABLES_COUNT_CACHE_TIMEOUT)
+
+        return count
+
+    def total_count(self, qs):
+        if not qs.query.where and not qs.query.distinct:
+            count = estimated_count(qs.model)
+            if count >= settings.DATATABLES_APPROXIMATE_COUNT_THRESHOLD:
+                return count
+
+        return self.cached_count('total', qs)
+
+    def ordering(self, qs):
+        qs = super().ordering(qs)
+
+        order_by = list(qs.query.order_by) or [field for field in self.default_ordering
+                                              if self.model_has_field(qs.model, field.lstrip('-'))]
+        if not all(isinstance(field, str) for field in order_by):
+            self.keys = None
+            return qs
+
+        self.keys = [(field.lstrip('-'), field.startswith('-'), is_nullable(qs.model, field.lstrip('-')))
+                     for field in order_by]
+        if not any(field in ('id', 'pk') for field, _, _ in self.keys):
+            descending = self.keys[-1][1] if self.keys else False
+            self.keys.append(('id', descending, False))
+            order_by.append('-id' if descending else 'id')
+
+        return qs.order_by(*order_by)
+
+    def paging(self, qs):
+        if self.pre_camel_case_notation:
+            limit = min(int(self._querydict.get('iDisplayLength', 10)), self.max_display_length)
+            start = int(self._querydict.get('iDisplayStart', 0))
+        else:
+            limit = min(int(self._querydict.get('length', 10)), self.max_display_length)
+            start = int(self._querydict.get('start', 0))
+
+        if limit == -1:
+            return qs
+
+        seek = None
+        if start > 0 and self.keys is not None:
+            values = cache.get(self.cache_key('cursor', start))
+            if values is not None:
+                seek = seek_filter(self.keys, values)
+
+        rows = list(qs.filter(seek)[:limit] if seek is not None else qs[start:start + limit])
+
+        if len(rows) == limit and self.keys is not None:
+            cache.set(self.cache_key('cursor', start + limit),
+                      [self.row_value(rows[-1], field) for field, _, _ in self.keys],
+                      settings.DATATABLES_CURSOR_CACHE_TIMEOUT)
+
+        return rows
+
+    @staticmethod
+    def model_has_field(model, name):
+        return any(field.name == name for field in model._meta.get_fields())
+
+    @staticmethod
+    def row_value(row, field):
+        value = row
+        for attribute in field.split('__'):
+            if value is None:
+                return None
+            value = getattr(value, attribute)
+
+        return value.pk if isinstance(value, Model) else value
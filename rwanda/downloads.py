@@ -0,0 +1,81 @@
+import mimetypes
+import os
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, FileResponse, Http404
+from django.views import View
+
+from rwanda.thumbnails import thumbnail_size, thumbnail
+
+signer = signing.TimestampSigner(salt='rwanda.downloads')
+
+
+def download_url(kind, pk, signed=True, size=None):
+    params = {}
+    if signed:
+        params['token'] = signer.sign("{}:{}".format(kind, pk)).split(":", 2)[2]
+
+    if size is not None:
+        params['size'] = thumbnail_size(size)
+
+    url = "{}/downloads/{}/{}".format(settings.BASE_URL, kind, pk)
+    if params:
+        url += "?" + urlencode(params)
+
+    return url
+
+
+def valid_download_token(kind, pk, token):
+    if not token:
+        return False
+
+    try:
+        signer.unsign("{}:{}:{}".format(kind, pk, token), max_age=settings.DOWNLOADS_URL_MAX_AGE)
+    except signing.BadSignature:
+        return False
+
+    return True
+
+
+def serve_file(file_name, name=None, attachment=False):
+    name = name or os.path.basename(file_name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    if settings.DOWNLOADS_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_URL + quote(file_name)
+    else:
+        response = FileResponse(default_storage.open(file_name, 'rb'), content_type=content_type)
+
+    response['Content-Disposition'] = "{}; filename*=UTF-8''{}" \
+        .format('attachment' if attachment else 'inline', quote(name))
+    response['Cache-Control'] = 'private, max-age={}'.format(settings.DOWNLOADS_URL_MAX_AGE)
+
+    return response
+
+
+class DownloadView(View):
+    kind = None
+    model = None
+    attachment = False
+
+    def get(self, request, *args, **kwargs):
+        obj = self.model.objects.filter(pk=kwargs['pk']).first()
+        if obj is None or not obj.download_file:
+            raise Http404
+
+        user = request.user if request.user.is_authenticated else None
+        if not valid_download_token(self.kind, kwargs['pk'], request.GET.get('token')) \
+                and not obj.can_be_downloaded_by(user):
+            raise Http404
+
+        size = request.GET.get('size')
+        if size and size.isdigit() and getattr(obj, 'has_thumbnails', False):
+            name = thumbnail(obj.download_file.name, int(size))
+            if name is not None:
+                return serve_file(name)
+
+        return serve_file(obj.download_file.name, obj.download_name, self.attachment)
@@ -0,0 +1,87 @@
+import csv
+import os
+import tempfile
+from datetime import datetime
+from urllib.parse import quote
+
+import xlsxwriter
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def local_datetime(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+
+    return value.replace(tzinfo=None)
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return local_datetime(value).isoformat(sep=' ', timespec='seconds')
+
+    return '' if value is None else value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([csv_value(value) for value in row])
+
+
+def build_xlsx(header, rows):
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'strings_to_urls': False})
+        worksheet = workbook.add_worksheet()
+        bold = workbook.add_format({'bold': True})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+
+        worksheet.write_row(0, 0, header, bold)
+        for index, row in enumerate(rows, start=1):
+            for column, value in enumerate(row):
+                if isinstance(value, datetime):
+                    worksheet.write_datetime(index, column, local_datetime(value), date_format)
+                elif value is not None:
+                    worksheet.write(index, column, value)
+        workbook.close()
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path
+
+
+def export_response(export, name, header, rows):
+    """CSV is streamed as rows are read. XLSX needs the whole workbook, so it is written to a temporary
+    file before the response starts and holds the worker for the full build."""
+    file_name = "{}-{}.{}".format(name, timezone.localtime().strftime('%Y%m%d%H%M%S'), export)
+
+    if export == 'xlsx':
+        path = build_xlsx(header, rows)
+        try:
+            file = open(path, 'rb')
+        finally:
+            os.remove(path)
+        response = FileResponse(file, content_type=CONTENT_TYPES[export])
+    else:
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type=CONTENT_TYPES[export])
+
+    response['Content-Disposition'] = "attachment; filename*=UTF-8''{}".format(quote(file_name))
+    response['Cache-Control'] = 'private, no-store'
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
@@ -364,12 +364,12 @@ class CreateLitigation(AccountDjangoModelMutation):
             return cls(
                 errors=[ErrorType(field="service_purchase", messages=[_("You cannot perform this action.")])])
 
-        service_purchase.set_in_dispute()
-        service_purchase.save()
-
         form.instance.account = account
         form.save()
 
+        service_purchase.set_in_dispute()
+        service_purchase.save()
+
         ServicePurchaseSubscription.broadcast(group=ServicePurchaseSubscription.name.format(str(service_purchase.id)))
 
         on_litigation_opened_task.delay(str(form.instance.id))
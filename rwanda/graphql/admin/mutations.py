@@ -22,8 +22,8 @@ from rwanda.graphql.purchase.operations import cancel_service_purchase, \
 from rwanda.graphql.purchase.subscriptions import ServicePurchaseSubscription
 from rwanda.graphql.types import ServiceCategoryType, ServiceType, AdminType, LitigationType, AuthType, RefundWayType, \
     ParameterType, UserType, RefundType
-from rwanda.payments.models import Payment
-from rwanda.payments.utils import get_auth_token, get_available_balance, transfer_money, add_contact
+from rwanda.payments.tasks import process_refunds_task
+from rwanda.payments.utils import process_refunds
 from rwanda.purchases.models import ServicePurchase, Litigation
 from rwanda.services.models import Service, ServiceCategory
 from rwanda.users.models import User, Admin
@@ -422,37 +422,36 @@ class ProcessRefund(graphene.Mutation):
     error = graphene.String()
 
     @admin_required
-    @transaction.atomic
     def mutate(self, info, id):
-        refund = Refund.objects.get(pk=id)
+        error = process_refunds([id])[str(id)]
+        if error is not None:
+            return ProcessRefund(error=error)
 
-        token = get_auth_token()
-        if token is None:
-            return ProcessRefund(error=_('Authentication error. Please check CINETPAY password parameter.'))
+        return ProcessRefund(
+            result=_('Refund has been initiated at CINETPAY side. Please wait for the their confirmation.'))
 
-        balance = get_available_balance(token)
-        if token is None:
-            return ProcessRefund(error=_('Internal error. Please try again later.'))
 
-        if balance < refund.amount:
-            return ProcessRefund(error=_('Insufficient balance to process the refund.'))
+class ProcessRefunds(graphene.Mutation):
+    class Arguments:
+        ids = graphene.List(graphene.UUID, required=True)
+        background = graphene.Boolean(default_value=False)
 
-        if not add_contact(token, refund):
-            return ProcessRefund(error=_('Internal error. Please try again later.'))
+    result = graphene.String()
+    errors = graphene.List(ErrorType)
 
-        payment = Payment(amount=refund.amount, account=refund.account, type=Payment.TYPE_OUTGOING)
-        payment.save()
+    @admin_required
+    def mutate(self, info, ids, background):
+        if background:
+            process_refunds_task.delay([str(id) for id in ids])
 
-        succeed, message = transfer_money(token, refund, payment)
-        if not succeed:
-            return ProcessRefund(error=message)
+            return ProcessRefunds(result=_('Refunds will be processed in background.'), errors=[])
 
-        refund.payment = payment
-        refund.set_as_in_progress()
-        refund.save()
+        errors = [ErrorType(field=id, messages=[error])
+                  for id, error in process_refunds(ids).items() if error is not None]
 
-        return ProcessRefund(
-            result=_('Refund has been initiated at CINETPAY side. Please wait for the their confirmation.'))
+        return ProcessRefunds(
+            result=_('Refunds have been initiated at CINETPAY side. Please wait for the their confirmation.'),
+            errors=errors)
 
 
 class UpdateParameter(AdminDjangoModelMutation):
@@ -526,6 +525,7 @@ class AdminMutations(graphene.ObjectType):
     handle_litigation = HandleLitigation.Field()
 
     process_refund = ProcessRefund.Field()
+    process_refunds = ProcessRefunds.Field()
     refuse_refund = RefuseRefund.Field()
 
     create_refund_way = CreateRefundWay.Field()
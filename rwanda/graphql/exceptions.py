@@ -1,3 +1,6 @@
+from graphql import GraphQLError
+
+
 class JWTException(Exception):
     message = None
 
@@ -19,3 +22,8 @@ class AnonymousAccountRequiredException(JWTException):
 
 class AnonymousAdminRequiredException(JWTException):
     message = "ANONYMOUS_ADMIN_REQUIRED"
+
+
+class InvalidCursorException(GraphQLError):
+    def __init__(self):
+        super().__init__("INVALID_CURSOR")
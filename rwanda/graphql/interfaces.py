@@ -15,6 +15,7 @@ class UserInterface(graphene.Interface):
     full_name = graphene.String()
     phone_number = graphene.String()
     image_url = graphene.String()
+    thumbnail_url = graphene.String(size=graphene.Int(required=True))
 
     @staticmethod
     def resolve_username(cls, info):
@@ -61,6 +62,11 @@ class UserInterface(graphene.Interface):
         cls: Account
         return cls.user.image_url
 
+    @staticmethod
+    def resolve_thumbnail_url(cls, info, size):
+        cls: Account
+        return cls.user.thumbnail_url(size)
+
     @staticmethod
     def resolve_is_active(cls, info):
         cls: Account
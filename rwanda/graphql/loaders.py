@@ -0,0 +1,77 @@
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.db.models import Count, Sum
+from promise import Promise
+from promise.dataloader import DataLoader
+
+from rwanda.account.models import Deposit, Refund
+from rwanda.accounting.models import Operation
+from rwanda.purchases.models import ServicePurchase
+from rwanda.services.models import Service
+
+
+class AccountAggregateLoader(DataLoader):
+    model = None
+    account_field = "account_id"
+    aggregate = None
+    filters = {}
+
+    def batch_load_fn(self, keys):
+        rows = self.model.objects \
+            .filter(**{self.account_field + "__in": keys}, **self.filters) \
+            .values(self.account_field) \
+            .annotate(value=self.aggregate) \
+            .order_by()
+
+        values = {row[self.account_field]: row["value"] for row in rows}
+
+        return Promise.resolve([values.get(key) or 0 for key in keys])
+
+
+class ServicesCountLoader(AccountAggregateLoader):
+    model = Service
+    aggregate = Count("id")
+
+
+class PurchasesCountLoader(AccountAggregateLoader):
+    model = ServicePurchase
+    aggregate = Count("id")
+
+
+class OrdersCountLoader(AccountAggregateLoader):
+    model = ServicePurchase
+    account_field = "service__account_id"
+    aggregate = Count("id")
+
+
+class DepositsSumLoader(AccountAggregateLoader):
+    model = Deposit
+    aggregate = Sum("amount")
+
+
+class RefundsSumLoader(AccountAggregateLoader):
+    model = Refund
+    aggregate = Sum("amount")
+
+
+class EarningsSumLoader(AccountAggregateLoader):
+    model = Operation
+    aggregate = Sum("amount")
+    filters = {"description": Operation.DESC_CREDIT_FOR_PURCHASE_APPROVED}
+
+
+class Loaders:
+    def __init__(self):
+        self.services_count = ServicesCountLoader()
+        self.purchases_count = PurchasesCountLoader()
+        self.orders_count = OrdersCountLoader()
+        self.deposits_sum = DepositsSumLoader()
+        self.refunds_sum = RefundsSumLoader()
+        self.earnings_sum = EarningsSumLoader()
+
+
+def load_account_aggregate(info, name, account):
+    loaders = getattr(info.context, "loaders", None)
+    if loaders is None:
+        return intcomma(getattr(account, name))
+
+    return getattr(loaders, name).load(account.id).then(intcomma)
@@ -1,10 +1,10 @@
-import io
 import re
 from collections import OrderedDict
-from copy import deepcopy
+from copy import copy, deepcopy
 
 import graphene
 import inflect
+from django.db.models import FileField
 from django.forms import ModelForm, formset_factory
 from graphene import Field, InputField, InputObjectType
 from graphene.types.base import BaseType
@@ -15,9 +15,6 @@ from graphene.utils.thenables import maybe_thenable
 from graphene_django.forms.mutation import DjangoModelDjangoFormMutationOptions
 from graphene_django.registry import get_global_registry
 from graphene_django.types import ErrorType
-from rest_framework import serializers
-from rest_framework.parsers import JSONParser
-from rest_framework.renderers import JSONRenderer
 
 from rwanda.graphql.converters import convert_form_field
 
@@ -273,14 +270,9 @@ class DjangoModelMutation(Mutation):
                 except Exception:
                     return cls.respond(input, errors=not_found_error(cls._meta.model.__name__, pk)), None
 
-            old_obj = deepcopy(instance)
+            old_obj = model_snapshot(instance)
 
-            class Serializer(serializers.ModelSerializer):
-                class Meta:
-                    model = cls._meta.model
-                    fields = "__all__"
-
-            data = JSONParser().parse(io.BytesIO(JSONRenderer().render(Serializer(instance).data)))
+            data = form_data_converter(cls._meta.model, cls._meta.form_fields)(instance)
             data.update(input)
             kwargs["instance"] = instance
             kwargs["data"] = data
@@ -430,7 +422,7 @@ class DjangoModelDeleteMutation(GrapheneMutation):
         errors = []
         try:
             instance = cls._meta.model._default_manager.get(pk=id)
-            old_obj = deepcopy(instance)
+            old_obj = model_snapshot(instance)
         except Exception:
             return not_found_error(cls._meta.model.__name__, id), old_obj
 
@@ -459,6 +451,54 @@ class DjangoModelDeleteMutation(GrapheneMutation):
         return cls(errors=errors)
 
 
+form_data_converters = {}
+
+
+def form_data_converter(model, field_names):
+    key = (model, tuple(field_names))
+    if key in form_data_converters:
+        return form_data_converters[key]
+
+    field_names = set(field_names)
+    values = []
+    files = []
+    many = []
+    for field in model._meta.get_fields():
+        if field.name not in field_names or not field.concrete:
+            continue
+
+        if field.many_to_many:
+            many.append(field.name)
+        elif isinstance(field, FileField):
+            files.append(field.name)
+        else:
+            values.append((field.name, field.attname))
+
+    def converter(instance):
+        data = {name: getattr(instance, attname) for name, attname in values}
+
+        for name in files:
+            data[name] = getattr(instance, name).name or None
+
+        for name in many:
+            data[name] = list(getattr(instance, name).values_list('pk', flat=True)) if instance.pk else []
+
+        return data
+
+    form_data_converters[key] = converter
+    return converter
+
+
+def model_snapshot(instance):
+    snapshot = copy(instance)
+    for field in instance._meta.concrete_fields:
+        value = getattr(instance, field.attname)
+        if isinstance(value, (dict, list)):
+            setattr(snapshot, field.attname, deepcopy(value))
+
+    return snapshot
+
+
 def not_found_error(model_name, id):
     return ErrorType.from_errors({"id": ["{} instance not found for id {}".format(model_name, id)]})
 
@@ -0,0 +1,70 @@
+import binascii
+import uuid
+from base64 import urlsafe_b64decode
+
+import graphene
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rwanda.graphql.exceptions import InvalidCursorException
+
+
+def keyset_arguments():
+    return {
+        "first": graphene.Int(),
+        "last": graphene.Int(),
+        "before": graphene.String(),
+        "after": graphene.String(),
+    }
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        created_at = parse_datetime(created_at)
+        id = uuid.UUID(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorException
+
+    if created_at is None:
+        raise InvalidCursorException
+
+    return created_at, id
+
+
+def keyset_paginate(queryset, first=None, last=None, before=None, after=None):
+    previous_created_at = None
+
+    if after is not None:
+        created_at, id = decode_cursor(after)
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=id))
+        previous_created_at = created_at
+
+    if before is not None:
+        created_at, id = decode_cursor(before)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=id))
+
+    queryset = queryset.order_by('created_at', 'id')
+
+    if first is not None:
+        queryset = list(queryset[:max(first, 0)])
+
+    if last is None:
+        return queryset, previous_created_at
+
+    last = max(last, 0)
+    if isinstance(queryset, list):
+        page = queryset[max(len(queryset) - last, 0):] if last else []
+        if len(page) < len(queryset):
+            previous_created_at = queryset[len(queryset) - len(page) - 1].created_at
+        return page, previous_created_at
+
+    if not last:
+        return [], previous_created_at
+
+    page = list(queryset.reverse()[:last + 1])
+    page.reverse()
+    if len(page) > last:
+        previous_created_at = page.pop(0).created_at
+
+    return page, previous_created_at
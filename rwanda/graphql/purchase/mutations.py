@@ -20,6 +20,24 @@ from rwanda.purchases.models import ServicePurchase, Deliverable, ChatMessage, C
 from rwanda.users.models import Account
 
 
+def lock_service_purchase(service_purchase: ServicePurchase):
+    # The overdue sweeper cancels purchases under the same row lock: transitions start from the locked status.
+    locked = ServicePurchase.objects.select_for_update().only('status', 'canceled_at').get(pk=service_purchase.pk)
+    service_purchase.status = locked.status
+    service_purchase.canceled_at = locked.canceled_at
+
+
+class ServicePurchaseTransitionMutation(AccountDjangoModelMutation):
+    class Meta:
+        abstract = True
+
+    @classmethod
+    @transaction.atomic
+    def perform_mutate(cls, info, form, old_obj, input):
+        lock_service_purchase(form.instance)
+        return super().perform_mutate(info, form, old_obj, input)
+
+
 class InitiateServicePurchase(AccountDjangoModelMutation):
     class Meta:
         model_type = ServicePurchaseType
@@ -64,7 +82,7 @@ class InitiateServicePurchase(AccountDjangoModelMutation):
         return cls(servicePurchase=form.instance, errors=[])
 
 
-class AcceptServicePurchase(AccountDjangoModelMutation):
+class AcceptServicePurchase(ServicePurchaseTransitionMutation):
     class Meta:
         model_type = ServicePurchaseType
         only_fields = ("",)
@@ -86,12 +104,13 @@ class AcceptServicePurchase(AccountDjangoModelMutation):
 
     @classmethod
     def post_save(cls, info, old_obj, form, obj, input):
-        ServicePurchaseSubscription.broadcast(group=ServicePurchaseSubscription.name.format(str(obj.id)))
+        transaction.on_commit(lambda: ServicePurchaseSubscription.broadcast(
+            group=ServicePurchaseSubscription.name.format(str(obj.id))))
 
-        on_service_purchase_accepted_or_refused_task.delay(str(obj.id))
+        transaction.on_commit(lambda: on_service_purchase_accepted_or_refused_task.delay(str(obj.id)))
 
 
-class RefuseServicePurchase(AccountDjangoModelMutation):
+class RefuseServicePurchase(ServicePurchaseTransitionMutation):
     class Meta:
         model_type = ServicePurchaseType
         for_update = True
@@ -114,12 +133,13 @@ class RefuseServicePurchase(AccountDjangoModelMutation):
 
     @classmethod
     def post_save(cls, info, old_obj, form, obj, input):
-        ServicePurchaseSubscription.broadcast(group=ServicePurchaseSubscription.name.format(str(obj.id)))
+        transaction.on_commit(lambda: ServicePurchaseSubscription.broadcast(
+            group=ServicePurchaseSubscription.name.format(str(obj.id))))
 
-        on_service_purchase_accepted_or_refused_task.delay(str(obj.id))
+        transaction.on_commit(lambda: on_service_purchase_accepted_or_refused_task.delay(str(obj.id)))
 
 
-class DeliverServicePurchase(AccountDjangoModelMutation):
+class DeliverServicePurchase(ServicePurchaseTransitionMutation):
     class Meta:
         model_type = ServicePurchaseType
         only_fields = ("",)
@@ -141,9 +161,10 @@ class DeliverServicePurchase(AccountDjangoModelMutation):
 
     @classmethod
     def post_save(cls, info, old_obj, form, obj, input):
-        ServicePurchaseSubscription.broadcast(group=ServicePurchaseSubscription.name.format(str(obj.id)))
+        transaction.on_commit(lambda: ServicePurchaseSubscription.broadcast(
+            group=ServicePurchaseSubscription.name.format(str(obj.id))))
 
-        on_service_purchase_delivered_task.delay(str(obj.id))
+        transaction.on_commit(lambda: on_service_purchase_delivered_task.delay(str(obj.id)))
 
 
 class ApproveServicePurchase(AccountDjangoModelMutation):
@@ -224,9 +245,10 @@ class CreateDeliverable(AccountDjangoModelMutation):
 
         if instance.final and instance.published:
             instance.service_purchase.has_final_deliverable = True
-            instance.service_purchase.save()
+            instance.service_purchase.save(update_fields=['has_final_deliverable'])
 
         instance.save()
+        instance.add_published_event()
 
         return cls(deliverable=instance, errors=[])
 
@@ -248,7 +270,7 @@ class UpdateDeliverable(AccountDjangoModelMutation):
         if instance.final and instance.published:
             if not instance.service_purchase.has_final_deliverable:
                 instance.service_purchase.has_final_deliverable = True
-                instance.service_purchase.save()
+                instance.service_purchase.save(update_fields=['has_final_deliverable'])
         else:
             has_final_deliverable = Deliverable.objects \
                 .filter(version=Deliverable.VERSION_FINAL,
@@ -258,9 +280,10 @@ class UpdateDeliverable(AccountDjangoModelMutation):
                 .exists()
             if instance.service_purchase.has_final_deliverable is not has_final_deliverable:
                 instance.service_purchase.has_final_deliverable = has_final_deliverable
-                instance.service_purchase.save()
+                instance.service_purchase.save(update_fields=['has_final_deliverable'])
 
         instance.save()
+        instance.add_published_event()
 
         return cls(deliverable=instance, errors=[])
 
@@ -285,7 +308,7 @@ class DeleteDeliverable(AccountDjangoModelDeleteMutation):
             .exists()
         if obj.service_purchase.has_final_deliverable is not has_final_deliverable:
             obj.service_purchase.has_final_deliverable = has_final_deliverable
-            obj.service_purchase.save()
+            obj.service_purchase.save(update_fields=['has_final_deliverable'])
 
         obj.delete()
 
@@ -315,7 +338,7 @@ class CreateChatMessage(AccountDjangoModelMutation):
     def post_save(cls, info, old_obj, form, obj, input):
         obj: ChatMessage
         ChatMessageSubscription.broadcast(group=ChatMessageSubscription.name.format(obj.service_purchase_id),
-                                          payload=str(obj.id))
+                                          payload=obj.broadcast_payload())
 
 
 class MarkUnmarkChatMessage(graphene.Mutation):
@@ -379,8 +402,10 @@ class AcceptServicePurchaseUpdateRequest(AccountDjangoModelMutation):
     def pre_save(cls, info, old_obj, form, input):
         update_request: ServicePurchaseUpdateRequest = form.instance
         service_purchase: ServicePurchase = update_request.service_purchase
+        lock_service_purchase(service_purchase)
 
-        if update_request.cannot_be_accepted or service_purchase.is_not_seller(info.context.user.account):
+        if update_request.cannot_be_accepted or not service_purchase.update_initiated \
+                or service_purchase.is_not_seller(info.context.user.account):
             return cls(errors=[ErrorType(field="id", messages=[_("You cannot perform this action.")])])
 
         service_purchase.set_as_update_accepted()
@@ -410,8 +435,10 @@ class RefuseServicePurchaseUpdateRequest(AccountDjangoModelMutation):
     def pre_save(cls, info, old_obj, form, input):
         update_request: ServicePurchaseUpdateRequest = form.instance
         service_purchase: ServicePurchase = update_request.service_purchase
+        lock_service_purchase(service_purchase)
 
-        if update_request.cannot_be_refused or service_purchase.is_not_seller(info.context.user.account):
+        if update_request.cannot_be_refused or not service_purchase.update_initiated \
+                or service_purchase.is_not_seller(info.context.user.account):
             return cls(errors=[ErrorType(field="id", messages=[_("You cannot perform this action.")])])
 
         service_purchase.set_as_update_refused()
@@ -439,8 +466,10 @@ class DeliverServicePurchaseUpdateRequest(AccountDjangoModelMutation):
     def pre_save(cls, info, old_obj, form, input):
         update_request: ServicePurchaseUpdateRequest = form.instance
         service_purchase: ServicePurchase = update_request.service_purchase
+        lock_service_purchase(service_purchase)
 
-        if update_request.cannot_be_delivered or service_purchase.is_not_seller(info.context.user.account):
+        if update_request.cannot_be_delivered or not service_purchase.update_accepted \
+                or service_purchase.is_not_seller(info.context.user.account):
             return cls(errors=[ErrorType(field="id", messages=[_("You cannot perform this action.")])])
 
         service_purchase.set_as_update_delivered()
@@ -1,82 +1,87 @@
-from django.db import transaction
-from django.db.models import F
-
 from rwanda.accounting.models import Operation, Fund
+from rwanda.accounting.utils import post_transaction
 from rwanda.purchases.models import ServicePurchase
 from rwanda.users.models import Account
 
 
-@transaction.atomic
-def credit_account(account: Account, amount, desc):
-    Operation(type=Operation.TYPE_CREDIT, account=account, amount=amount,
-              description=desc,
-              fund=Fund.objects.get(label=Fund.ACCOUNTS)).save()
-    Fund.objects.filter(label=Fund.ACCOUNTS).update(balance=F('balance') + amount)
-    Account.objects.filter(pk=account.pk).update(balance=F('balance') + amount)
+def credit_account_entry(account: Account, amount, desc):
+    return Operation(type=Operation.TYPE_CREDIT, account=account, amount=amount,
+                     description=desc,
+                     fund_id=Fund.get_id(Fund.ACCOUNTS))
 
 
-@transaction.atomic
-def debit_account(account, amount, desc):
-    Operation(type=Operation.TYPE_DEBIT, account=account, amount=amount,
-              description=desc,
-              fund=Fund.objects.get(label=Fund.ACCOUNTS)).save()
-    Fund.objects.filter(label=Fund.ACCOUNTS).update(balance=F('balance') - amount)
-    Account.objects.filter(pk=account.pk).update(balance=F('balance') - amount)
+def debit_account_entry(account: Account, amount, desc):
+    return Operation(type=Operation.TYPE_DEBIT, account=account, amount=amount,
+                     description=desc,
+                     fund_id=Fund.get_id(Fund.ACCOUNTS))
 
 
-@transaction.atomic
-def credit_main(service_purchase, amount, desc):
-    Operation(type=Operation.TYPE_CREDIT, service_purchase=service_purchase, amount=amount,
-              description=desc,
-              fund=Fund.objects.get(label=Fund.MAIN)).save()
-    Fund.objects.filter(label=Fund.MAIN).update(balance=F('balance') + amount)
+def credit_main_entry(service_purchase, amount, desc):
+    return Operation(type=Operation.TYPE_CREDIT, service_purchase=service_purchase, amount=amount,
+                     description=desc,
+                     fund_id=Fund.get_id(Fund.MAIN))
 
 
-@transaction.atomic
-def debit_main(service_purchase, amount, desc):
-    Operation(type=Operation.TYPE_DEBIT, service_purchase=service_purchase, amount=amount,
-              description=desc,
-              fund=Fund.objects.get(label=Fund.MAIN)).save()
-    Fund.objects.filter(label=Fund.MAIN).update(balance=F('balance') - amount)
+def debit_main_entry(service_purchase, amount, desc):
+    return Operation(type=Operation.TYPE_DEBIT, service_purchase=service_purchase, amount=amount,
+                     description=desc,
+                     fund_id=Fund.get_id(Fund.MAIN))
 
 
-@transaction.atomic
-def credit_commission(service_purchase, amount, desc):
-    Operation(type=Operation.TYPE_CREDIT, service_purchase=service_purchase, amount=amount,
-              description=desc,
-              fund=Fund.objects.get(label=Fund.COMMISSIONS)).save()
-    Fund.objects.filter(label=Fund.COMMISSIONS).update(balance=F('balance') + amount)
+def credit_commission_entry(service_purchase, amount, desc):
+    return Operation(type=Operation.TYPE_CREDIT, service_purchase=service_purchase, amount=amount,
+                     description=desc,
+                     fund_id=Fund.get_id(Fund.COMMISSIONS))
 
 
-@transaction.atomic
-def debit_commission(service_purchase, amount, desc):
-    Operation(type=Operation.TYPE_DEBIT, service_purchase=service_purchase, amount=amount,
-              description=desc,
-              fund=Fund.objects.get(label=Fund.COMMISSIONS)).save()
-    Fund.objects.filter(label=Fund.COMMISSIONS).update(balance=F('balance') - amount)
+def debit_commission_entry(service_purchase, amount, desc):
+    return Operation(type=Operation.TYPE_DEBIT, service_purchase=service_purchase, amount=amount,
+                     description=desc,
+                     fund_id=Fund.get_id(Fund.COMMISSIONS))
 
 
-@transaction.atomic
-def init_service_purchase(service_purchase: ServicePurchase):
-    debit_account(service_purchase.account, service_purchase.price, Operation.DESC_DEBIT_FOR_PURCHASE_INIT)
-
-    credit_main(service_purchase, service_purchase.price_without_commission, Operation.DESC_CREDIT_FOR_PURCHASE_INIT)
+def credit_account(account: Account, amount, desc):
+    return post_transaction([credit_account_entry(account, amount, desc)], balanced=False)
 
-    credit_commission(service_purchase, service_purchase.commission, Operation.DESC_CREDIT_FOR_PURCHASE_INIT)
 
+def debit_account(account: Account, amount, desc):
+    return post_transaction([debit_account_entry(account, amount, desc)], balanced=False)
 
-@transaction.atomic
-def approve_service_purchase(service_purchase: ServicePurchase):
-    debit_main(service_purchase, service_purchase.price_without_commission, Operation.DESC_DEBIT_FOR_PURCHASE_APPROVED)
 
-    credit_account(service_purchase.service.account, service_purchase.price_without_commission,
-                   Operation.DESC_CREDIT_FOR_PURCHASE_APPROVED)
+def init_service_purchase(service_purchase: ServicePurchase):
+    return post_transaction([
+        debit_account_entry(service_purchase.account, service_purchase.price,
+                            Operation.DESC_DEBIT_FOR_PURCHASE_INIT),
+        credit_main_entry(service_purchase, service_purchase.price_without_commission,
+                          Operation.DESC_CREDIT_FOR_PURCHASE_INIT),
+        credit_commission_entry(service_purchase, service_purchase.commission,
+                                Operation.DESC_CREDIT_FOR_PURCHASE_INIT),
+    ])
 
 
-@transaction.atomic
-def cancel_service_purchase(service_purchase: ServicePurchase):
-    debit_main(service_purchase, service_purchase.price_without_commission, Operation.DESC_DEBIT_FOR_PURCHASE_CANCELED)
+def approve_service_purchase(service_purchase: ServicePurchase):
+    return post_transaction([
+        debit_main_entry(service_purchase, service_purchase.price_without_commission,
+                         Operation.DESC_DEBIT_FOR_PURCHASE_APPROVED),
+        credit_account_entry(service_purchase.service.account, service_purchase.price_without_commission,
+                             Operation.DESC_CREDIT_FOR_PURCHASE_APPROVED),
+    ])
 
-    debit_commission(service_purchase, service_purchase.commission, Operation.DESC_DEBIT_FOR_PURCHASE_CANCELED)
 
-    credit_account(service_purchase.account, service_purchase.price, Operation.DESC_CREDIT_FOR_PURCHASE_CANCELED)
+def cancel_service_purchase(service_purchase: ServicePurchase):
+    return cancel_service_purchases([service_purchase])
+
+
+def cancel_service_purchases(service_purchases):
+    entries = []
+    for service_purchase in service_purchases:
+        entries += [
+            debit_main_entry(service_purchase, service_purchase.price_without_commission,
+                             Operation.DESC_DEBIT_FOR_PURCHASE_CANCELED),
+            debit_commission_entry(service_purchase, service_purchase.commission,
+                                   Operation.DESC_DEBIT_FOR_PURCHASE_CANCELED),
+            credit_account_entry(service_purchase.account, service_purchase.price,
+                                 Operation.DESC_CREDIT_FOR_PURCHASE_CANCELED),
+        ]
+
+    return post_transaction(entries)
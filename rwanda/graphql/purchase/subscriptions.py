@@ -1,5 +1,6 @@
 import channels_graphql_ws
 import graphene
+from django.utils.dateparse import parse_datetime
 
 from rwanda.graphql.types import ServicePurchaseChatMessageType, ServicePurchaseType
 from rwanda.purchases.models import ChatMessage, ServicePurchase
@@ -17,16 +18,12 @@ class ChatMessageSubscription(channels_graphql_ws.Subscription):
         return [ChatMessageSubscription.name.format(str(service_purchase))]
 
     @staticmethod
-    def publish(chat_message_id, info, service_purchase):
-        def get_chat_message_type(account, chat_message_id):
-            chat_message = ChatMessage.objects.get(pk=chat_message_id)
-            last_message: ChatMessage = ChatMessage.objects.exclude(id=chat_message_id).order_by('-created_at').first()
-            chat_message_type = chat_message.display(account,
-                                                     last_message.created_at if last_message is not None else None)
-            return chat_message_type
-
+    def publish(payload, info, service_purchase):
         if info.context.is_authenticated:
-            return ChatMessageSubscription(message=get_chat_message_type(info.context.user.account, chat_message_id))
+            chat_message = ChatMessage.from_broadcast_payload(payload)
+            last_created_at = parse_datetime(payload["last_created_at"]) if payload["last_created_at"] else None
+
+            return ChatMessageSubscription(message=chat_message.display(info.context.user.account, last_created_at))
 
         return channels_graphql_ws.Subscription.SKIP
 
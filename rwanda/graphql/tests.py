@@ -0,0 +1,84 @@
+import io
+from datetime import timedelta
+
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+from promise import Promise
+from rest_framework import serializers
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from rwanda.graphql.loaders import ServicesCountLoader, OrdersCountLoader
+from rwanda.graphql.mutations import DjangoModelMutation, form_data_converter
+from rwanda.purchases.models import ServicePurchase
+from rwanda.services.models import Service
+from rwanda.testing import create_account, create_service, create_service_purchase
+
+
+class AccountAggregateLoaderTestCase(TestCase):
+    def setUp(self):
+        self.accounts = [create_account("account{}".format(i)) for i in range(5)]
+        for i, account in enumerate(self.accounts):
+            for _ in range(i):
+                create_service(account)
+
+    def test_services_count_is_loaded_in_one_query(self):
+        loader = ServicesCountLoader()
+
+        with self.assertNumQueries(1):
+            values = Promise.all([loader.load(account.id) for account in self.accounts]).get()
+
+        self.assertEqual(values, [0, 1, 2, 3, 4])
+
+    def test_orders_count_is_loaded_in_one_query(self):
+        buyer = self.accounts[0]
+        for service in Service.objects.all():
+            create_service_purchase(buyer, service)
+        loader = OrdersCountLoader()
+
+        with self.assertNumQueries(1):
+            values = Promise.all([loader.load(account.id) for account in self.accounts]).get()
+
+        self.assertEqual(values, [0, 1, 2, 3, 4])
+
+
+class FormDataConverterTestCase(TestCase):
+    def setUp(self):
+        self.service_purchase = create_service_purchase(create_account("buyer"),
+                                                        create_service(create_account("seller")),
+                                                        status=ServicePurchase.STATUS_ACCEPTED,
+                                                        accepted_at=timezone.now(),
+                                                        deadline_at=timezone.now() + timedelta(days=1),
+                                                        refused_reason="None")
+
+    def serializer_data(self, instance):
+        # The form data update mutations built before form_data_converter.
+        class Serializer(serializers.ModelSerializer):
+            class Meta:
+                model = ServicePurchase
+                fields = "__all__"
+
+        return JSONParser().parse(io.BytesIO(JSONRenderer().render(Serializer(instance).data)))
+
+    def cleaned_data(self, form_fields, data):
+        form = DjangoModelMutation.form_class(ServicePurchase, form_fields,
+                                              {"data": data, "instance": self.service_purchase})
+        self.assertTrue(form.is_valid(), form.errors)
+
+        return {name: list(value) if isinstance(value, QuerySet) else value
+                for name, value in form.cleaned_data.items()}
+
+    def test_converter_binds_forms_like_the_serializer(self):
+        form_fields = list(DjangoModelMutation.form_class(ServicePurchase, "__all__").fields)
+
+        data = form_data_converter(ServicePurchase, form_fields)(self.service_purchase)
+
+        self.assertEqual(set(data), set(form_fields))
+        self.assertEqual(self.cleaned_data(form_fields, data),
+                         self.cleaned_data(form_fields, self.serializer_data(self.service_purchase)))
+
+    def test_converter_only_reads_the_form_fields(self):
+        self.assertEqual(form_data_converter(ServicePurchase, ["refused_reason"])(self.service_purchase),
+                         {"refused_reason": "None"})
+        self.assertEqual(form_data_converter(ServicePurchase, [])(self.service_purchase), {})
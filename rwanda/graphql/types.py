@@ -15,9 +15,11 @@ from rwanda.administration.models import Parameter
 from rwanda.administration.utils import param_base_price
 from rwanda.graphql.decorators import account_required, admin_required
 from rwanda.graphql.interfaces import UserInterface
+from rwanda.graphql.loaders import load_account_aggregate
+from rwanda.graphql.pagination import keyset_arguments, keyset_paginate
 from rwanda.payments.models import Payment
 from rwanda.purchases.models import ServicePurchase, ServicePurchaseServiceOption, ChatMessage, Litigation, Deliverable, \
-    DeliverableFile, ServicePurchaseUpdateRequest
+    DeliverableFile, ServicePurchaseUpdateRequest, PurchaseEvent
 from rwanda.services.models import ServiceCategory, Service, ServiceMedia, ServiceComment, ServiceOption
 from rwanda.users.models import Admin, Account, User
 
@@ -103,6 +105,7 @@ class ServiceType(DjangoObjectType):
     created_at = graphene.String(source="created_at_display", required=True)
     base_price = graphene.Int(required=True)
     file_url = graphene.String(source="file_url")
+    thumbnail_url = graphene.String(size=graphene.Int(required=True))
 
     accepted = graphene.Boolean(source="accepted", required=True)
     rejected = graphene.Boolean(source="rejected", required=True)
@@ -150,6 +153,11 @@ class ServiceType(DjangoObjectType):
     def resolve_base_price(cls, info):
         return param_base_price()
 
+    @staticmethod
+    def resolve_thumbnail_url(cls, info, size):
+        cls: Service
+        return cls.thumbnail_url(size)
+
 
 class ServiceCategoryType(DjangoObjectType):
     services = graphene.List(ServiceType, required=True)
@@ -177,12 +185,12 @@ class UserType(DjangoObjectType):
 class AccountType(DjangoObjectType):
     balance = graphene.String(required=True, source="balance_display")
     created_at = graphene.String(required=True, source="created_at_display")
-    services_count = graphene.String(required=True, source="services_count_display")
-    purchases_count = graphene.String(required=True, source="purchases_count_display")
-    orders_count = graphene.String(required=True, source="orders_count_display")
-    deposits_sum = graphene.String(required=True, source="deposits_sum_display")
-    refunds_sum = graphene.String(required=True, source="refunds_sum_display")
-    earnings_sum = graphene.String(required=True, source="earnings_sum_display")
+    services_count = graphene.String(required=True)
+    purchases_count = graphene.String(required=True)
+    orders_count = graphene.String(required=True)
+    deposits_sum = graphene.String(required=True)
+    refunds_sum = graphene.String(required=True)
+    earnings_sum = graphene.String(required=True)
 
     class Meta:
         model = Account
@@ -191,9 +199,34 @@ class AccountType(DjangoObjectType):
             "id": ("exact",),
         }
 
+    @staticmethod
+    def resolve_services_count(cls, info):
+        return load_account_aggregate(info, "services_count", cls)
+
+    @staticmethod
+    def resolve_purchases_count(cls, info):
+        return load_account_aggregate(info, "purchases_count", cls)
+
+    @staticmethod
+    def resolve_orders_count(cls, info):
+        return load_account_aggregate(info, "orders_count", cls)
+
+    @staticmethod
+    def resolve_deposits_sum(cls, info):
+        return load_account_aggregate(info, "deposits_sum", cls)
+
+    @staticmethod
+    def resolve_refunds_sum(cls, info):
+        return load_account_aggregate(info, "refunds_sum", cls)
+
+    @staticmethod
+    def resolve_earnings_sum(cls, info):
+        return load_account_aggregate(info, "earnings_sum", cls)
+
 
 class ServiceMediaType(DjangoObjectType):
     file_url = graphene.String(source="file_url")
+    thumbnail_url = graphene.String(size=graphene.Int(required=True))
 
     class Meta:
         model = ServiceMedia
@@ -202,6 +235,11 @@ class ServiceMediaType(DjangoObjectType):
             "id": ("exact",),
         }
 
+    @staticmethod
+    def resolve_thumbnail_url(cls, info, size):
+        cls: ServiceMedia
+        return cls.thumbnail_url(size)
+
 
 class ServiceCommentTypeType(graphene.ObjectType):
     name = graphene.String(required=True)
@@ -230,6 +268,7 @@ class ServicePurchaseChatMessageType(ObjectType):
     file_name = graphene.String()
     file_url = graphene.String()
     file_size = graphene.String()
+    cursor = graphene.String(required=True)
 
 
 class ServicePurchaseUpdateRequestType(DjangoObjectType):
@@ -314,12 +353,12 @@ class ServicePurchaseType(DjangoObjectType):
     can_be_commented = graphene.Boolean(required=True)
 
     timelines = graphene.List(ServicePurchaseTimeLineType, required=True)
-    chat = graphene.List(ServicePurchaseChatMessageType, required=True)
-    chat_files = graphene.List(ServicePurchaseChatMessageType, required=True)
-    chat_marked = graphene.List(ServicePurchaseChatMessageType, required=True)
+    chat = graphene.List(ServicePurchaseChatMessageType, required=True, **keyset_arguments())
+    chat_files = graphene.List(ServicePurchaseChatMessageType, required=True, **keyset_arguments())
+    chat_marked = graphene.List(ServicePurchaseChatMessageType, required=True, **keyset_arguments())
 
-    chat_history = graphene.List(ServicePurchaseChatMessageType, required=True)
-    chat_files_history = graphene.List(ServicePurchaseChatMessageType, required=True)
+    chat_history = graphene.List(ServicePurchaseChatMessageType, required=True, **keyset_arguments())
+    chat_files_history = graphene.List(ServicePurchaseChatMessageType, required=True, **keyset_arguments())
 
     update_request = graphene.Field(ServicePurchaseUpdateRequestType)
 
@@ -446,281 +485,92 @@ class ServicePurchaseType(DjangoObjectType):
             d_filter = naturalday
             t_filter = time_filter
 
-        happen_at = str(d_filter(self.created_at)) + ' ' + str(t_filter(self.created_at))
-
-        timelines = [ServicePurchaseTimeLineType(
-            happen_at=happen_at.title(),
-            status=_('Initiated'),
-            color='dark'
-        )]
-
-        last_happen_at = self.created_at
-
-        if self.has_been_canceled and self.has_not_been_accepted:
-            happen_at = str(t_filter(self.canceled_at))
-            if last_happen_at.date() != self.canceled_at.date():
-                happen_at = str(d_filter(self.canceled_at)) + " " + happen_at
-
-            timelines.append(ServicePurchaseTimeLineType(
-                happen_at=happen_at.title(),
-                status=_('Canceled'),
-                color='danger'
-            ))
+        events = PurchaseEvent.objects \
+            .filter(Q(deliverable__isnull=True) | Q(deliverable__published=True), service_purchase=self) \
+            .select_related("deliverable") \
+            .order_by("happened_at", "created_at")
 
-            last_happen_at = self.canceled_at
+        timelines = []
+        last_happen_at = None
+        for event in events:
+            event: PurchaseEvent
 
-        if self.has_been_accepted:
-            happen_at = str(t_filter(self.accepted_at))
-            if last_happen_at.date() != self.accepted_at.date():
-                happen_at = str(d_filter(self.created_at)) + " " + happen_at
+            happen_at = str(t_filter(event.happened_at))
+            if last_happen_at is None or last_happen_at.date() != event.happened_at.date():
+                happen_at = str(d_filter(event.happened_at)) + " " + happen_at
 
             timelines.append(ServicePurchaseTimeLineType(
                 happen_at=happen_at.title(),
-                status=_('Accepted'),
-                color='primary',
-                description=_('Deadline set to <strong>{}</strong>')
-                    .format(date_filter(self.deadline_at)),
+                status=event.status_display,
+                color=event.color,
+                description=event.description,
             ))
 
-            last_happen_at = self.accepted_at
-
-        if self.has_been_refused:
-            happen_at = str(t_filter(self.refused_at))
-            if last_happen_at.date() != self.refused_at.date():
-                happen_at = str(d_filter(self.refused_at)) + " " + happen_at
-
-            timelines.append(ServicePurchaseTimeLineType(
-                happen_at=happen_at.title(),
-                status=_('Refused'),
-                color='danger'
-            ))
-
-            last_happen_at = self.accepted_at
-
-        for deliverable in self.deliverable_set.filter(published=True) \
-                .order_by("created_at") \
-                .all():
-            happen_at = str(t_filter(deliverable.created_at))
-            if last_happen_at.date() != deliverable.created_at.date():
-                happen_at = str(d_filter(deliverable.created_at)) + " " + happen_at
-
-            timelines.append(ServicePurchaseTimeLineType(
-                happen_at=happen_at.title(),
-                status=_('Deliverable Published'),
-                color='info',
-                description=_('Deliverable <strong>{}</strong> published in version <strong>{}</strong>.')
-                    .format(deliverable.title, deliverable.version_display),
-            ))
-
-            last_happen_at = deliverable.created_at
-
-        if self.has_been_delivered:
-            happen_at = str(t_filter(self.delivered_at))
-            if last_happen_at.date() != self.delivered_at.date():
-                happen_at = str(d_filter(self.delivered_at)) + " " + happen_at
-
-            timelines.append(ServicePurchaseTimeLineType(
-                happen_at=happen_at.title(),
-                status=_('Delivered'),
-                color='warning'
-            ))
-
-            last_happen_at = self.delivered_at
-
-        for update_request in self.servicepurchaseupdaterequest_set \
-                .order_by("created_at") \
-                .all():
-            happen_at = str(t_filter(update_request.created_at))
-            if last_happen_at.date() != update_request.created_at.date():
-                happen_at = str(d_filter(update_request.created_at)) + " " + happen_at
-
-            timelines.append(ServicePurchaseTimeLineType(
-                happen_at=happen_at.title(),
-                status=_('Request for update initiated'),
-                color='dark',
-                description=_('The buyer make an update request <strong>{}</strong>')
-                    .format(update_request.title),
-            ))
-
-            last_happen_at = update_request.created_at
-
-            if update_request.has_been_accepted:
-                happen_at = str(t_filter(update_request.accepted_at))
-                if last_happen_at.date() != update_request.accepted_at.date():
-                    happen_at = str(d_filter(update_request.accepted_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Request for update accepted'),
-                    color='primary',
-                    description=_(
-                        'The update request <strong>{}</strong> have been accepted. New deadline set to <strong>{}</strong>')
-                        .format(update_request.title, date_filter(update_request.deadline_at)),
-                ))
-
-                last_happen_at = update_request.accepted_at
-
-            if update_request.has_been_refused:
-                happen_at = str(t_filter(update_request.refused_at))
-                if last_happen_at.date() != update_request.refused_at.date():
-                    happen_at = str(d_filter(update_request.refused_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Request for update refused'),
-                    color='danger',
-                    description=_(
-                        'The update request <strong>{}</strong> have been refused. <strong>Reason:</strong> {}')
-                        .format(update_request.title, update_request.reason),
-                ))
-
-                last_happen_at = update_request.refused_at
-
-            if update_request.has_been_delivered:
-                happen_at = str(t_filter(update_request.delivered_at))
-                if last_happen_at.date() != update_request.delivered_at.date():
-                    happen_at = str(d_filter(update_request.delivered_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Request for update delivered'),
-                    color='warning',
-                    description=_('The update request <strong>{}</strong> have been delivered.')
-                        .format(update_request.title),
-                ))
-
-                last_happen_at = update_request.delivered_at
-
-        if self.has_been_in_dispute:
-            happen_at = str(t_filter(self.in_dispute_at))
-            if last_happen_at.date() != self.in_dispute_at.date():
-                happen_at = str(d_filter(self.in_dispute_at)) + " " + happen_at
-
-            timelines.append(ServicePurchaseTimeLineType(
-                happen_at=happen_at.title(),
-                status=_('In dispute'),
-                color='info',
-                description=_('The buyer open a litigation <strong>{}</strong>')
-                    .format(self.litigation.title),
-            ))
-
-            last_happen_at = self.in_dispute_at
-
-            if self.has_been_canceled:
-                happen_at = str(t_filter(self.canceled_at))
-                if last_happen_at.date() != self.canceled_at.date():
-                    happen_at = str(d_filter(self.canceled_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Canceled'),
-                    color='danger',
-                    description=_('Has been canceled by <strong>Administrators</strong>'),
-                ))
-
-            if self.has_been_approved:
-                happen_at = str(t_filter(self.approved_at))
-                if last_happen_at.date() != self.approved_at.date():
-                    happen_at = str(d_filter(self.approved_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Approved'),
-                    color='success',
-                    description=_('Has been approved by <strong>Administrators</strong>'),
-                ))
-
-        if self.has_not_been_in_dispute:
-            if self.has_been_canceled:
-                happen_at = str(t_filter(self.canceled_at))
-                if last_happen_at.date() != self.canceled_at.date():
-                    happen_at = str(d_filter(self.canceled_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Canceled'),
-                    color='danger',
-                ))
-
-            if self.has_been_approved:
-                happen_at = str(t_filter(self.approved_at))
-                if last_happen_at.date() != self.approved_at.date():
-                    happen_at = str(d_filter(self.approved_at)) + " " + happen_at
-
-                timelines.append(ServicePurchaseTimeLineType(
-                    happen_at=happen_at.title(),
-                    status=_('Approved'),
-                    color='success'
-                ))
+            last_happen_at = event.happened_at
 
         return timelines
 
     @account_required
-    def resolve_chat(self, info):
+    def resolve_chat(self, info, **kwargs):
         self: ServicePurchase
 
         messages = ChatMessage.objects \
             .annotate(marked=Case(When(chatmessagemarked__account=info.context.user.account, then=True),
                                   default=False,
                                   output_field=BooleanField())) \
-            .filter(service_purchase=self) \
-            .order_by('created_at')
+            .filter(service_purchase=self)
 
-        return get_chat_messages(messages, info.context.user.account)
+        return get_chat_messages(messages, info.context.user.account, **kwargs)
 
     @account_required
-    def resolve_chat_files(self, info):
+    def resolve_chat_files(self, info, **kwargs):
         self: ServicePurchase
 
         messages = ChatMessage.objects \
             .annotate(marked=Case(When(chatmessagemarked__account=info.context.user.account, then=True),
                                   default=False,
                                   output_field=BooleanField())) \
-            .filter(service_purchase=self, is_file=True) \
-            .order_by('created_at')
+            .filter(service_purchase=self, is_file=True)
 
-        return get_chat_messages(messages, info.context.user.account)
+        return get_chat_messages(messages, info.context.user.account, **kwargs)
 
     @account_required
-    def resolve_chat_marked(self, info):
+    def resolve_chat_marked(self, info, **kwargs):
         self: ServicePurchase
 
         messages = ChatMessage.objects \
             .annotate(marked=Case(When(chatmessagemarked__account=info.context.user.account, then=True),
                                   default=False,
                                   output_field=BooleanField())) \
-            .filter(service_purchase=self, chatmessagemarked__account=info.context.user.account) \
-            .order_by('created_at')
+            .filter(service_purchase=self, chatmessagemarked__account=info.context.user.account)
 
-        return get_chat_messages(messages, info.context.user.account)
+        return get_chat_messages(messages, info.context.user.account, **kwargs)
 
     @admin_required
-    def resolve_chat_history(self, info):
+    def resolve_chat_history(self, info, **kwargs):
         self: ServicePurchase
 
         messages = ChatMessage.objects \
             .filter(service_purchase=self) \
-            .prefetch_related("service_purchase") \
-            .order_by('created_at')
+            .select_related("service_purchase")
 
-        return get_chat_messages(messages)
+        return get_chat_messages(messages, **kwargs)
 
     @admin_required
-    def resolve_chat_files_history(self, info):
+    def resolve_chat_files_history(self, info, **kwargs):
         self: ServicePurchase
 
         messages = ChatMessage.objects \
             .filter(service_purchase=self, is_file=True) \
-            .prefetch_related("service_purchase") \
-            .order_by('created_at')
+            .select_related("service_purchase")
 
-        return get_chat_messages(messages)
+        return get_chat_messages(messages, **kwargs)
 
 
-def get_chat_messages(messages, account=None):
+def get_chat_messages(messages, account=None, **kwargs):
     chat_messages = []
 
-    last_created_at = None
+    messages, last_created_at = keyset_paginate(messages, **kwargs)
     for message in messages:
         message: ChatMessage
 
@@ -815,8 +665,11 @@ class AdminType(DjangoObjectType):
 
 
 class FundType(DjangoObjectType):
+    balance = graphene.Int(source="balance", required=True)
+
     class Meta:
         model = Fund
+        exclude = ('compacted_balance',)
         filter_fields = {
             "id": ("exact",),
         }
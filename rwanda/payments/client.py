@@ -0,0 +1,118 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('rwanda.payments')
+
+
+class LatencyHistogram:
+    buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self):
+        with self.lock:
+            buckets = {str(bound): count for bound, count in zip(self.buckets, self.counts)}
+            buckets["+Inf"] = self.counts[-1]
+            return {"count": self.count, "sum": self.total, "buckets": buckets}
+
+
+class CinetPayClient:
+    retry_statuses = (502, 503, 504)
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.CINETPAY_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.histograms = {}
+        self.token = None
+        self.token_password = None
+        self.token_expires_at = 0
+        self.lock = threading.Lock()
+
+    def request(self, endpoint, method, url, idempotent=True, **kwargs):
+        timeout = settings.CINETPAY_TIMEOUTS.get(endpoint, settings.CINETPAY_TIMEOUTS["default"])
+        retries = settings.CINETPAY_RETRIES if idempotent else 0
+
+        attempt = 0
+        while True:
+            started_at = time.monotonic()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.observe(endpoint, time.monotonic() - started_at)
+                if attempt >= retries:
+                    raise
+                logger.warning("CinetPay {} attempt {} failed: {}".format(endpoint, attempt + 1, e))
+            else:
+                self.observe(endpoint, time.monotonic() - started_at)
+                if response.status_code not in self.retry_statuses or attempt >= retries:
+                    return response.json()
+                logger.warning("CinetPay {} attempt {} returned {}".format(endpoint, attempt + 1,
+                                                                           response.status_code))
+
+            time.sleep(random.uniform(0, settings.CINETPAY_RETRY_BACKOFF * 2 ** attempt))
+            attempt += 1
+
+    def post(self, endpoint, url, data, idempotent=True, **kwargs):
+        return self.request(endpoint, "POST", url, idempotent=idempotent, data=data, **kwargs)
+
+    def get(self, endpoint, url, params, idempotent=True):
+        return self.request(endpoint, "GET", url, idempotent=idempotent, params=params)
+
+    def get_token(self, password):
+        with self.lock:
+            if self.has_token(password):
+                return self.token
+
+        # The auth request runs outside the lock so a slow one does not hold up callers with a valid token.
+        result = self.post("auth", settings.CINETPAY_AUTH_URL, {
+            "password": password,
+            "apikey": settings.CINETPAY_API_KEY,
+        })
+        if "code" not in result or result['code'] != 0:
+            return None
+
+        with self.lock:
+            if not self.has_token(password):
+                self.token = result['data']['token']
+                self.token_password = password
+                self.token_expires_at = time.monotonic() + settings.CINETPAY_TOKEN_TTL
+
+            return self.token
+
+    def has_token(self, password):
+        return self.token is not None and self.token_password == password and time.monotonic() < self.token_expires_at
+
+    def invalidate_token(self):
+        with self.lock:
+            self.token = None
+
+    def observe(self, endpoint, seconds):
+        histogram = self.histograms.get(endpoint)
+        if histogram is None:
+            histogram = self.histograms.setdefault(endpoint, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def metrics(self):
+        return {endpoint: histogram.snapshot() for endpoint, histogram in self.histograms.items()}
+
+
+cinetpay = CinetPayClient()
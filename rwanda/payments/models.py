@@ -1,6 +1,7 @@
 import uuid
 
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from rwanda.users.models import Account
@@ -28,6 +29,11 @@ class Payment(models.Model):
     comment = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id']),
+        ]
+
     @property
     def total_amount(self):
         return self.amount + self.fee
@@ -67,3 +73,64 @@ class Payment(models.Model):
 
     def set_as_canceled(self):
         self.status = self.STATUS_CANCELED
+
+
+class PaymentNotification(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    trans_id = models.CharField(max_length=255, unique=True)
+    TYPE_INCOMING = 'INCOMING'
+    TYPE_OUTGOING = 'OUTGOING'
+    type = models.CharField(max_length=255)
+    data = models.JSONField(default=dict)
+    STATUS_PENDING = 'PENDING'
+    STATUS_PROCESSED = 'PROCESSED'
+    STATUS_FAILED = 'FAILED'
+    status = models.CharField(max_length=255, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    @property
+    def pending(self):
+        return self.status == self.STATUS_PENDING
+
+    @property
+    def incoming(self):
+        return self.type == self.TYPE_INCOMING
+
+    @property
+    def outgoing(self):
+        return self.type == self.TYPE_OUTGOING
+
+    def set_as_processed(self):
+        self.status = self.STATUS_PROCESSED
+        self.processed_at = timezone.now()
+
+    def set_as_failed(self, error):
+        self.status = self.STATUS_FAILED
+        self.error = error
+
+
+class PaymentReconciliation(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    cutoff_at = models.DateTimeField()
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.UUIDField(null=True, blank=True)
+    checked = models.PositiveBigIntegerField(default=0)
+    applied = models.PositiveBigIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def set_as_finished(self):
+        self.finished_at = timezone.now()
@@ -0,0 +1,24 @@
+from celery import shared_task
+
+from rwanda.payments.utils import process_refunds, process_payment_notifications, reconcile_payments, \
+    release_stale_refunds
+
+
+@shared_task
+def process_refunds_task(refund_uuids):
+    return {id: str(error) if error is not None else None for id, error in process_refunds(refund_uuids).items()}
+
+
+@shared_task
+def process_payment_notifications_task():
+    return process_payment_notifications()
+
+
+@shared_task
+def reconcile_payments_task():
+    return reconcile_payments()
+
+
+@shared_task
+def release_stale_refunds_task():
+    return release_stale_refunds()
@@ -1 +1,279 @@
-# Create your tests here.
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from rwanda.payments.client import CinetPayClient
+from rwanda.payments.models import Payment, PaymentNotification
+from rwanda.account.models import Refund
+from rwanda.payments.utils import process_payment_notifications, release_stale_refunds, transfer_money_batch
+from rwanda.testing import create_account
+
+
+def response(status_code, json=None):
+    result = mock.Mock(status_code=status_code)
+    result.json.return_value = json if json is not None else {}
+    return result
+
+
+@override_settings(CINETPAY_RETRIES=2, CINETPAY_RETRY_BACKOFF=0)
+class CinetPayClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.cinetpay = CinetPayClient()
+        patcher = mock.patch.object(self.cinetpay.session, 'request')
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_request_uses_the_endpoint_timeout(self):
+        self.request.return_value = response(200, {"code": 0})
+
+        self.assertEqual(self.cinetpay.post("transfer", settings.CINETPAY_TRANSFER_MONEY_URL, {}), {"code": 0})
+        self.cinetpay.get("unknown", settings.CINETPAY_CHECK_TRANSFER_URL, {})
+
+        self.assertEqual(self.request.call_args_list[0].kwargs['timeout'], settings.CINETPAY_TIMEOUTS["transfer"])
+        self.assertEqual(self.request.call_args_list[1].kwargs['timeout'], settings.CINETPAY_TIMEOUTS["default"])
+
+    def test_gateway_errors_are_retried(self):
+        self.request.side_effect = [response(502), response(504), response(200, {"code": 0})]
+
+        self.assertEqual(self.cinetpay.post("check_status", settings.CINETPAY_CHECK_STATUS_URL, {}), {"code": 0})
+        self.assertEqual(self.request.call_count, 3)
+
+    def test_connection_errors_are_retried_up_to_the_limit(self):
+        self.request.side_effect = requests.ConnectionError
+
+        with self.assertRaises(requests.ConnectionError):
+            self.cinetpay.post("check_status", settings.CINETPAY_CHECK_STATUS_URL, {})
+
+        self.assertEqual(self.request.call_count, settings.CINETPAY_RETRIES + 1)
+
+    def test_last_gateway_error_is_returned(self):
+        self.request.return_value = response(503, {"code": 503})
+
+        self.assertEqual(self.cinetpay.post("check_status", settings.CINETPAY_CHECK_STATUS_URL, {}), {"code": 503})
+        self.assertEqual(self.request.call_count, settings.CINETPAY_RETRIES + 1)
+
+    def test_non_idempotent_requests_are_not_retried(self):
+        self.request.side_effect = requests.Timeout
+
+        with self.assertRaises(requests.Timeout):
+            self.cinetpay.post("transfer", settings.CINETPAY_TRANSFER_MONEY_URL, {}, idempotent=False)
+
+        self.assertEqual(self.request.call_count, 1)
+
+    def test_token_is_cached_per_password(self):
+        self.request.return_value = response(200, {"code": 0, "data": {"token": "token"}})
+
+        self.assertEqual(self.cinetpay.get_token("password"), "token")
+        self.assertEqual(self.cinetpay.get_token("password"), "token")
+        self.assertEqual(self.request.call_count, 1)
+
+        self.cinetpay.get_token("other")
+        self.assertEqual(self.request.call_count, 2)
+
+    def test_invalidated_token_is_fetched_again(self):
+        self.request.return_value = response(200, {"code": 0, "data": {"token": "token"}})
+
+        self.cinetpay.get_token("password")
+        self.cinetpay.invalidate_token()
+        self.cinetpay.get_token("password")
+
+        self.assertEqual(self.request.call_count, 2)
+
+    @override_settings(CINETPAY_TOKEN_TTL=0)
+    def test_expired_token_is_fetched_again(self):
+        self.request.return_value = response(200, {"code": 0, "data": {"token": "token"}})
+
+        self.cinetpay.get_token("password")
+        self.cinetpay.get_token("password")
+
+        self.assertEqual(self.request.call_count, 2)
+
+    def test_failed_authentication_is_not_cached(self):
+        self.request.side_effect = [response(200, {"code": 1}), response(200, {"code": 0, "data": {"token": "token"}})]
+
+        self.assertIsNone(self.cinetpay.get_token("password"))
+        self.assertEqual(self.cinetpay.get_token("password"), "token")
+
+
+class FakeCinetPayHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests += 1
+
+        status, delay = self.server.responses.pop(0) if self.server.responses else (200, 0)
+        time.sleep(delay)
+
+        body = json.dumps({"code": 0 if status == 200 else status}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(CINETPAY_RETRIES=2, CINETPAY_RETRY_BACKOFF=0.01,
+                   CINETPAY_TIMEOUTS={"default": (1, 0.2)})
+class CinetPayServerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCinetPayHandler)
+        self.server.daemon_threads = True
+        self.server.requests = 0
+        self.server.responses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.url = "http://127.0.0.1:{}/".format(self.server.server_port)
+        self.cinetpay = CinetPayClient()
+        self.addCleanup(self.cinetpay.session.close)
+
+    def test_gateway_errors_are_retried_over_the_socket(self):
+        self.server.responses = [(503, 0), (502, 0)]
+
+        self.assertEqual(self.cinetpay.post("check_status", self.url, {}), {"code": 0})
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.cinetpay.metrics()["check_status"]["count"], 3)
+
+    def test_slow_responses_time_out_and_are_retried(self):
+        self.server.responses = [(200, 0.5), (200, 0.5), (200, 0.5)]
+
+        with self.assertRaises(requests.Timeout):
+            self.cinetpay.post("check_status", self.url, {})
+
+        self.assertEqual(self.server.requests, settings.CINETPAY_RETRIES + 1)
+
+    def test_slow_non_idempotent_request_is_not_retried(self):
+        self.server.responses = [(200, 0.5)]
+
+        with self.assertRaises(requests.Timeout):
+            self.cinetpay.post("transfer", self.url, {}, idempotent=False)
+
+        self.assertEqual(self.server.requests, 1)
+
+    def test_latencies_are_recorded_per_endpoint(self):
+        self.server.responses = [(200, 0.06)]
+
+        self.cinetpay.post("check_status", self.url, {})
+        self.cinetpay.post("check_status", self.url, {})
+
+        metrics = self.cinetpay.metrics()["check_status"]
+        self.assertEqual(metrics["count"], 2)
+        self.assertGreaterEqual(metrics["sum"], 0.06)
+        self.assertEqual(sum(metrics["buckets"].values()), 2)
+        self.assertEqual(sum(count for bound, count in metrics["buckets"].items()
+                             if bound != "+Inf" and float(bound) > 0.05), 1)
+
+
+@override_settings(PAYMENT_NOTIFICATIONS_BATCH_SIZE=1)
+class PaymentNotificationsTestCase(TestCase):
+    def setUp(self):
+        self.payment = Payment.objects.create(amount=1000, account=create_account("account"))
+        self.pending = PaymentNotification.objects.create(trans_id=str(self.payment.id),
+                                                          type=PaymentNotification.TYPE_INCOMING)
+        patcher = mock.patch('rwanda.payments.utils.check_status',
+                             return_value={"transaction": {"cpm_result": "623"}})
+        self.check_status = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pending_notification_does_not_block_newer_ones(self):
+        process_payment_notifications()
+        newer = PaymentNotification.objects.create(trans_id=str(uuid.uuid4()), type=PaymentNotification.TYPE_INCOMING)
+
+        process_payment_notifications()
+
+        self.pending.refresh_from_db()
+        newer.refresh_from_db()
+        self.assertEqual(self.check_status.call_count, 1)
+        self.assertEqual(self.pending.status, PaymentNotification.STATUS_PENDING)
+        self.assertGreater(self.pending.next_attempt_at, timezone.now())
+        self.assertEqual(newer.status, PaymentNotification.STATUS_FAILED)
+
+    def test_notification_pending_too_long_expires(self):
+        PaymentNotification.objects.filter(pk=self.pending.pk).update(
+            created_at=timezone.now() - timedelta(seconds=settings.PAYMENT_NOTIFICATIONS_PENDING_TIMEOUT + 1))
+
+        process_payment_notifications()
+
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, PaymentNotification.STATUS_FAILED)
+        self.payment.refresh_from_db()
+        self.assertTrue(self.payment.initiated)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PaymentReconciliationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('rwanda.payments.utils.check_status')
+        self.check_status = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_overlapping_run_exits(self):
+        cache.add("payments:reconciliation", True)
+
+        self.assertEqual(reconcile_payments(), 0)
+        self.assertFalse(PaymentReconciliation.objects.exists())
+
+    def test_payments_past_the_max_age_are_given_up(self):
+        payment = Payment.objects.create(amount=1000, account=create_account("account"))
+        Payment.objects.filter(pk=payment.pk).update(
+            created_at=timezone.now() - timedelta(seconds=settings.PAYMENTS_RECONCILIATION_MAX_AGE
+                                                  + settings.PAYMENTS_RECONCILIATION_DELAY + 60))
+
+        reconcile_payments()
+
+        reconciliation = PaymentReconciliation.objects.get()
+        self.assertTrue(reconciliation.finished)
+        self.assertEqual(reconciliation.checked, 0)
+        self.check_status.assert_not_called()
+        self.assertIsNone(cache.get("payments:reconciliation"))
+
+
+class RefundsTestCase(TestCase):
+    def setUp(self):
+        self.account = create_account("account")
+
+    def create_refund(self, claimed_at, **kwargs):
+        return Refund.objects.create(amount=1000, account=self.account, status=Refund.STATUS_IN_PROGRESS,
+                                     claimed_at=claimed_at, **kwargs)
+
+    def test_stale_claims_are_released(self):
+        expired_at = timezone.now() - timedelta(seconds=settings.REFUNDS_CLAIM_TIMEOUT + 1)
+        stale = self.create_refund(expired_at)
+        recent = self.create_refund(timezone.now())
+        paid = self.create_refund(expired_at, payment=Payment.objects.create(amount=1000, account=self.account,
+                                                                             type=Payment.TYPE_OUTGOING))
+
+        self.assertEqual(release_stale_refunds(), 1)
+
+        for refund in (stale, recent, paid):
+            refund.refresh_from_db()
+        self.assertTrue(stale.initiated)
+        self.assertTrue(stale.can_be_processed)
+        self.assertTrue(recent.in_progress)
+        self.assertTrue(paid.in_progress)
+
+    def test_missing_transfer_outcome_is_unknown(self):
+        refund = mock.Mock(amount=1000, phone_number="0102030405", refund_way=mock.Mock(country_code="225"))
+        sent = Payment(amount=1000, account=self.account)
+        missing = Payment(amount=1000, account=self.account)
+        result = {"code": 1, "data": [{"client_transaction_id": str(sent.id), "code": 0}]}
+
+        with mock.patch('rwanda.payments.utils.cinetpay.post', return_value=result):
+            outcomes = transfer_money_batch("token", [(refund, sent), (refund, missing)])
+
+        self.assertEqual(outcomes, {str(sent.id): (True, None)})
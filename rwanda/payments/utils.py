@@ -1,12 +1,24 @@
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction, connection
+from django.db.models import F, Q
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-from rwanda.account.models import Refund
+from rwanda.account.models import Refund, Deposit
+from rwanda.accounting.models import Operation
 from rwanda.administration.utils import param_cinetpay_password
-from rwanda.payments.models import Payment
+from rwanda.graphql.purchase.operations import credit_account, debit_account
+from rwanda.payments.client import cinetpay
+from rwanda.payments.models import Payment, PaymentNotification, PaymentReconciliation
+
+logger = logging.getLogger('rwanda.payments')
 
 
 def get_signature(payment: Payment):
@@ -22,7 +34,7 @@ def get_signature(payment: Payment):
         "cpm_language": "fr",
         "apikey": settings.CINETPAY_API_KEY,
     }
-    return requests.post(settings.CINETPAY_SIGNATURE_URL, data).json()
+    return cinetpay.post("signature", settings.CINETPAY_SIGNATURE_URL, data)
 
 
 def check_status(payment: Payment):
@@ -31,55 +43,67 @@ def check_status(payment: Payment):
         "cpm_trans_id": str(payment.id),
         "apikey": settings.CINETPAY_API_KEY,
     }
-    return requests.post(settings.CINETPAY_CHECK_STATUS_URL, data).json()
+    return cinetpay.post("check_status", settings.CINETPAY_CHECK_STATUS_URL, data)
 
 
 def get_auth_token():
-    data = {
-        "password": param_cinetpay_password(),
-        "apikey": settings.CINETPAY_API_KEY,
+    return cinetpay.get_token(param_cinetpay_password())
+
+
+def get_available_balance(token):
+    params = {
+        "token": token,
     }
 
-    result = requests.post(settings.CINETPAY_AUTH_URL, data).json()
-    if "code" in result and result['code'] == 0:
-        return result['data']['token']
+    result = cinetpay.get("balance", settings.CINETPAY_CHECK_BALANCE_URL, params)
+
+    if 'code' in result and result['code'] == 0:
+        return int(result['data']['available'])
+
+    cinetpay.invalidate_token()
 
     return None
 
 
-def get_available_balance(token):
+def check_transfer_status(token, payment: Payment):
     params = {
         "token": token,
+        "client_transaction_id": str(payment.id),
     }
 
-    result = requests.get(settings.CINETPAY_CHECK_BALANCE_URL, params).json()
+    result = cinetpay.get("check_transfer", settings.CINETPAY_CHECK_TRANSFER_URL, params)
 
-    if 'code' in result and result['code'] == 0:
-        return int(result['data']['available'])
+    if 'code' in result and result['code'] == 0 and result.get('data'):
+        entry = result['data'][0]
+        return entry[0] if isinstance(entry, list) else entry
 
     return None
 
 
 def add_contact(token, refund: Refund):
+    return add_contacts(token, [refund])
+
+
+def add_contacts(token, refunds):
     params = {
         "token": token,
     }
 
+    contacts = {}
+    for refund in refunds:
+        contacts[(refund.refund_way.country_code, refund.phone_number)] = {
+            "prefix": refund.refund_way.country_code,
+            "phone": refund.phone_number,
+            "name": refund.account.user.first_name,
+            "surname": refund.account.user.last_name,
+            "email": refund.account.user.email,
+        }
+
     data = {
-        'data': json.dumps(
-            [
-                {
-                    "prefix": refund.refund_way.country_code,
-                    "phone": refund.phone_number,
-                    "name": refund.account.user.first_name,
-                    "surname": refund.account.user.last_name,
-                    "email": refund.account.user.email,
-                }
-            ]
-        )
+        'data': json.dumps(list(contacts.values()))
     }
 
-    result = requests.post(settings.CINETPAY_ADD_CONTACT_URL, data, params=params).json()
+    result = cinetpay.post("add_contact", settings.CINETPAY_ADD_CONTACT_URL, data, params=params)
 
     if 'code' in result and result['code'] == 0:
         return True
@@ -88,6 +112,10 @@ def add_contact(token, refund: Refund):
 
 
 def transfer_money(token, refund: Refund, payment: Payment):
+    return transfer_money_batch(token, [(refund, payment)]).get(str(payment.id))
+
+
+def transfer_money_batch(token, items):
     params = {
         "token": token,
     }
@@ -102,16 +130,398 @@ def transfer_money(token, refund: Refund, payment: Payment):
                     "notify_url": settings.BASE_URL + reverse('payments-confirmation'),
                     "client_transaction_id": str(payment.id),
                 }
+                for refund, payment in items
             ]
         )
     }
 
-    result = requests.post(settings.CINETPAY_TRANSFER_MONEY_URL, data, params=params).json()
+    result = cinetpay.post("transfer", settings.CINETPAY_TRANSFER_MONEY_URL, data, idempotent=False,
+                           params=params)
 
     if 'code' in result and result['code'] == 0:
-        return True, None
+        return {str(payment.id): (True, None) for refund, payment in items}
+
+    entries = []
+    for entry in result.get('data') or []:
+        entries += entry if isinstance(entry, list) else [entry]
+
+    message = str(result.get('message', '')) + ' ' + str(result.get('description', ''))
+
+    outcomes = {}
+    for index, (refund, payment) in enumerate(items):
+        entry = next((entry for entry in entries if entry.get('client_transaction_id') == str(payment.id)), None)
+        if entry is None and index < len(entries) and 'client_transaction_id' not in entries[index]:
+            entry = entries[index]
+
+        if entry is None and entries:
+            # The batch went through for others: this transfer's outcome is unknown, not a failure.
+            continue
+
+        if entry is not None and entry.get('code', -1) == 0:
+            outcomes[str(payment.id)] = (True, None)
+        elif entry is not None and 'message' in entry:
+            outcomes[str(payment.id)] = (False, entry['message'] + ' ' + entry.get('description', ''))
+        else:
+            outcomes[str(payment.id)] = (False, message)
+
+    return outcomes
+
+
+def process_refunds(ids):
+    errors = {str(id): _('You cannot perform this action.') for id in ids}
+
+    with transaction.atomic():
+        refunds = Refund.objects \
+            .select_for_update(skip_locked=True, of=('self',)) \
+            .select_related('account__user', 'refund_way', 'payment') \
+            .filter(pk__in=ids) \
+            .order_by('created_at')
+        refunds = [refund for refund in refunds if refund.can_be_processed]
+
+        now = timezone.now()
+        for refund in refunds:
+            refund.payment = None
+            refund.claimed_at = now
+            refund.set_as_in_progress()
+            errors[str(refund.id)] = None
+        Refund.objects.bulk_update(refunds, ['payment', 'status', 'claimed_at'])
+
+    if not refunds:
+        return errors
+
+    try:
+        transfer_refunds(errors, refunds)
+    except Exception:
+        logger.exception("Refunds processing failed")
+        unpaid = Refund.objects.filter(pk__in=[refund.pk for refund in refunds],
+                                       status=Refund.STATUS_IN_PROGRESS, payment__isnull=True)
+        fail_refunds(errors, list(unpaid), _('Internal error. Please try again later.'))
+
+    return errors
+
+
+def transfer_refunds(errors, refunds):
+    token = get_auth_token()
+    if token is None:
+        return fail_refunds(errors, refunds, _('Authentication error. Please check CINETPAY password parameter.'))
+
+    balance = get_available_balance(token)
+    if balance is None:
+        return fail_refunds(errors, refunds, _('Internal error. Please try again later.'))
+
+    affordable = []
+    unaffordable = []
+    for refund in refunds:
+        if refund.amount > balance:
+            unaffordable.append(refund)
+            continue
+
+        balance -= refund.amount
+        affordable.append(refund)
+
+    fail_refunds(errors, unaffordable, _('Insufficient balance to process the refund.'))
+
+    if not affordable:
+        return errors
+
+    if not add_contacts(token, affordable):
+        return fail_refunds(errors, affordable, _('Internal error. Please try again later.'))
+
+    size = settings.CINETPAY_TRANSFER_BATCH_SIZE
+    for chunk in [affordable[i:i + size] for i in range(0, len(affordable), size)]:
+        # Link the payments before calling the gateway: if anything fails afterwards the refunds
+        # stay in progress with an initiated payment, which the reconciliation settles. Refunds
+        # released by release_stale_refunds meanwhile are no longer ours to transfer.
+        with transaction.atomic():
+            claimed = set(Refund.objects
+                          .select_for_update()
+                          .filter(pk__in=[refund.pk for refund in chunk],
+                                  status=Refund.STATUS_IN_PROGRESS, payment__isnull=True)
+                          .values_list('pk', flat=True))
+            for refund in chunk:
+                if refund.pk not in claimed:
+                    errors[str(refund.id)] = _('Internal error. Please try again later.')
+            chunk = [refund for refund in chunk if refund.pk in claimed]
+            payments = [Payment(amount=refund.amount, account=refund.account, type=Payment.TYPE_OUTGOING)
+                        for refund in chunk]
+            Payment.objects.bulk_create(payments)
+            for refund, payment in zip(chunk, payments):
+                refund.payment = payment
+            Refund.objects.bulk_update(chunk, ['payment'])
+
+        if not chunk:
+            continue
+
+        try:
+            outcomes = transfer_money_batch(token, list(zip(chunk, payments)))
+        except Exception:
+            logger.exception("Transfer batch failed, left to the reconciliation")
+            continue
+
+        canceled = []
+        for refund, payment in zip(chunk, payments):
+            outcome = outcomes.get(str(payment.id))
+            if outcome is None:
+                logger.warning("No transfer outcome for payment Id: {}, left to the reconciliation".format(payment.id))
+                continue
+
+            succeed, message = outcome
+            if not succeed:
+                refund.status = Refund.STATUS_INITIATED
+                payment.set_as_canceled()
+                canceled.append(payment)
+                errors[str(refund.id)] = message
+
+        with transaction.atomic():
+            Refund.objects.bulk_update(chunk, ['status'])
+            Payment.objects.bulk_update(canceled, ['status'])
+
+    return errors
+
+
+def release_stale_refunds():
+    # Refunds claimed by a worker that died before linking their payment would stay in progress forever.
+    claimed_before = timezone.now() - timedelta(seconds=settings.REFUNDS_CLAIM_TIMEOUT)
+
+    with transaction.atomic():
+        refunds = list(Refund.objects
+                       .select_for_update(skip_locked=True)
+                       .filter(status=Refund.STATUS_IN_PROGRESS, payment__isnull=True,
+                               claimed_at__lt=claimed_before))
+        for refund in refunds:
+            logger.warning("Refund {} released after its claim expired".format(refund.id))
+            refund.status = Refund.STATUS_INITIATED
+        Refund.objects.bulk_update(refunds, ['status'])
+
+    return len(refunds)
+
+
+def fail_refunds(errors, refunds, message):
+    for refund in refunds:
+        refund.status = Refund.STATUS_INITIATED
+        errors[str(refund.id)] = message
+    Refund.objects.bulk_update(refunds, ['status'])
+
+    return errors
+
+
+def apply_incoming_status(payment: Payment, data):
+    if int(data['cpm_amount']) != payment.amount or data['signature'] != payment.signature:
+        return False
+
+    if data['cpm_result'] == '00':
+        payment.set_as_confirmed()
+
+        deposit = Deposit(account=payment.account, amount=payment.amount, payment=payment)
+        deposit.save()
+
+        credit_account(payment.account, payment.amount, Operation.DESC_CREDIT_FOR_DEPOSIT)
+    else:
+        payment.set_as_canceled()
+
+    payment.cpm_payid = data['cpm_result']
+    payment.payment_method = data['payment_method']
+    payment.cpm_phone_prefixe = data['cpm_phone_prefixe']
+    payment.cel_phone_num = data['cel_phone_num']
+    payment.cpm_result = data['cpm_result']
+    payment.cpm_trans_status = data['cpm_trans_status']
+    payment.save()
+
+    return True
+
+
+def apply_outgoing_status(payment: Payment, data):
+    if int(data['amount']) != payment.amount:
+        return False
+
+    if data['treatment_status'] == 'VAL':
+        payment.set_as_confirmed()
+
+        debit_account(payment.account, payment.amount, Operation.DESC_DEBIT_FOR_REFUND)
+
+        refund = payment.refund
+        refund.set_as_processed()
+        refund.save()
+    else:
+        payment.set_as_canceled()
+
+    payment.cpm_payid = data['transaction_id']
+    payment.cpm_result = data['treatment_status']
+    payment.payment_method = data['operator'] if 'operator' in data else None
+    payment.comment = data['comment'] if 'comment' in data else None
+    payment.save()
+
+    return True
+
+
+def check_incoming_status(payment: Payment):
+    result = check_status(payment)
+    if 'transaction' not in result or 'cpm_result' not in result['transaction']:
+        raise Exception("Unexpected check status response for payment Id: " + str(payment.id))
+
+    return result
+
+
+def incoming_pending(result):
+    return result['transaction']['cpm_result'] in settings.CINETPAY_PENDING_RESULTS
+
+
+def process_payment_notification(notification: PaymentNotification, result=None):
+    if notification.incoming and result is None:
+        payment = Payment.objects.filter(pk=notification.trans_id).first()
+        if payment is not None and payment.initiated:
+            result = check_incoming_status(payment)
+            logger.info("#{} Check Status: ".format(notification.id) + json.dumps(result))
+
+    # The customer has not validated yet: check again later, until the notification expires.
+    if result is not None and incoming_pending(result):
+        return postpone_payment_notification(notification)
+
+    with transaction.atomic():
+        notification = PaymentNotification.objects \
+            .select_for_update(skip_locked=True) \
+            .filter(pk=notification.pk, status=PaymentNotification.STATUS_PENDING) \
+            .first()
+        if notification is None:
+            return
+
+        payment = Payment.objects.select_for_update().filter(pk=notification.trans_id).first()
+        if payment is None:
+            notification.set_as_failed("Unknown payment Id: " + notification.trans_id)
+            notification.save()
+            return
+
+        applied = True
+        if payment.initiated:
+            if notification.incoming:
+                applied = result is not None and apply_incoming_status(payment, result['transaction'])
+            else:
+                applied = apply_outgoing_status(payment, notification.data)
+
+        if applied:
+            notification.set_as_processed()
+        else:
+            logger.warning("#{} Mismatches with payment Id: ".format(notification.id) + str(payment.id))
+            notification.set_as_failed("Mismatches with payment Id: " + str(payment.id))
+        notification.save()
+
+
+def postpone_payment_notification(notification: PaymentNotification):
+    now = timezone.now()
+    notifications = PaymentNotification.objects.filter(pk=notification.pk, status=PaymentNotification.STATUS_PENDING)
+
+    if notification.created_at < now - timedelta(seconds=settings.PAYMENT_NOTIFICATIONS_PENDING_TIMEOUT):
+        logger.warning("#{} Expired while waiting on the customer".format(notification.id))
+        notifications.update(status=PaymentNotification.STATUS_FAILED, error="Expired while waiting on the customer")
+    else:
+        notifications.update(next_attempt_at=now + timedelta(seconds=settings.PAYMENT_NOTIFICATIONS_RETRY_DELAY))
+
+
+def process_payment_notifications():
+    notifications = PaymentNotification.objects \
+        .filter(status=PaymentNotification.STATUS_PENDING, next_attempt_at__lte=timezone.now()) \
+        .order_by('next_attempt_at')[:settings.PAYMENT_NOTIFICATIONS_BATCH_SIZE]
+
+    count = 0
+    for notification in list(notifications):
+        try:
+            process_payment_notification(notification)
+            count += 1
+        except Exception as e:
+            logger.exception("#{} Notification failed".format(notification.id))
+
+            PaymentNotification.objects \
+                .filter(pk=notification.pk, status=PaymentNotification.STATUS_PENDING) \
+                .update(attempts=F('attempts') + 1, error=str(e),
+                        next_attempt_at=timezone.now() + timedelta(seconds=settings.PAYMENT_NOTIFICATIONS_RETRY_DELAY))
+            PaymentNotification.objects \
+                .filter(pk=notification.pk,
+                        status=PaymentNotification.STATUS_PENDING,
+                        attempts__gte=settings.PAYMENT_NOTIFICATIONS_MAX_ATTEMPTS) \
+                .update(status=PaymentNotification.STATUS_FAILED)
+
+    return count
+
+
+def reconcile_payment(payment: Payment, token=None):
+    try:
+        data = {}
+        result = None
+        if payment.outgoing:
+            data = check_transfer_status(token, payment) if token is not None else None
+            if data is None or data.get('treatment_status') not in ('VAL', 'REJ'):
+                return False
+        else:
+            result = check_incoming_status(payment)
+            if incoming_pending(result):
+                return False
+
+        notification, created = PaymentNotification.objects.get_or_create(
+            trans_id=str(payment.id),
+            defaults={"type": payment.type, "data": data})
+        if not notification.pending:
+            return False
+
+        process_payment_notification(notification, result)
+
+        return True
+    except Exception:
+        logger.exception("Reconciliation failed for payment Id: " + str(payment.id))
+        return False
+    finally:
+        connection.close()
+
+
+def reconcile_payments():
+    # Beat may start a run while the previous scan is still going: only one run owns the checkpoint.
+    lock = "payments:reconciliation"
+    if not cache.add(lock, True, settings.PAYMENTS_RECONCILIATION_LOCK_TIMEOUT):
+        return 0
+
+    try:
+        return reconcile_payments_locked(lock)
+    finally:
+        cache.delete(lock)
+
+
+def reconcile_payments_locked(lock):
+    reconciliation = PaymentReconciliation.objects.filter(finished_at__isnull=True).order_by('created_at').first()
+    if reconciliation is None:
+        reconciliation = PaymentReconciliation.objects.create(
+            cutoff_at=timezone.now() - timedelta(seconds=settings.PAYMENTS_RECONCILIATION_DELAY))
+
+    # Payments still initiated past PAYMENTS_RECONCILIATION_MAX_AGE are given up on.
+    payments = Payment.objects \
+        .filter(status=Payment.STATUS_INITIATED,
+                created_at__lt=reconciliation.cutoff_at,
+                created_at__gte=reconciliation.cutoff_at - timedelta(seconds=settings.PAYMENTS_RECONCILIATION_MAX_AGE)) \
+        .order_by('created_at', 'id')
+
+    token = None
+    with ThreadPoolExecutor(max_workers=settings.PAYMENTS_RECONCILIATION_WORKERS) as executor:
+        while True:
+            batch = payments
+            if reconciliation.last_id is not None:
+                batch = batch.filter(Q(created_at__gt=reconciliation.last_created_at) |
+                                     Q(created_at=reconciliation.last_created_at, id__gt=reconciliation.last_id))
+            batch = list(batch[:settings.PAYMENTS_RECONCILIATION_BATCH_SIZE])
+            if not batch:
+                break
+
+            if token is None and any(payment.outgoing for payment in batch):
+                token = get_auth_token()
+
+            results = list(executor.map(lambda payment: reconcile_payment(payment, token), batch))
+
+            reconciliation.last_created_at = batch[-1].created_at
+            reconciliation.last_id = batch[-1].id
+            reconciliation.checked += len(batch)
+            reconciliation.applied += sum(results)
+            reconciliation.save()
+
+            cache.touch(lock, settings.PAYMENTS_RECONCILIATION_LOCK_TIMEOUT)
 
-    if 'data' in result and len(result['data']):
-        return False, result['data'][0]['message'] + ' ' + result['data'][0]['description']
+    reconciliation.set_as_finished()
+    reconciliation.save()
 
-    return False, result['message'] + ' ' + result['description']
+    return reconciliation.applied
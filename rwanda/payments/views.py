@@ -1,82 +1,40 @@
 import json
 import logging
+import uuid
 
-from django.db import transaction
 from django.http import JsonResponse
 from django.utils.crypto import get_random_string
 from django.views import View
 
-from rwanda.account.models import Deposit
-from rwanda.accounting.models import Operation
-from rwanda.graphql.purchase.operations import credit_account, debit_account
-from rwanda.payments.models import Payment
-from rwanda.payments.utils import check_status
+from rwanda.payments.models import PaymentNotification
+from rwanda.payments.tasks import process_payment_notifications_task
 
 
 class PaymentView(View):
     def get(self, request, *args, **kwargs):
         return JsonResponse({"message": "Ok"}, safe=False)
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
         prefix = get_random_string(5)
 
         logger = logging.getLogger('rwanda.payments')
         logger.info("#{} Request: ".format(prefix) + json.dumps(request.POST))
 
-        if 'cpm_trans_id' in request.POST:
-            payment = Payment.objects.get(pk=request.POST['cpm_trans_id'])
-            if payment.initiated:
-                result = check_status(payment)
-
-                logger.info("#{} Check Status: ".format(prefix) + json.dumps(result))
-
-                if result.__contains__('transaction') and result['transaction'].__contains__('cpm_result'):
-                    if int(result['transaction']['cpm_amount']) != payment.amount or \
-                            result['transaction']['signature'] != payment.signature:
-                        logger.warning("#{} Mismatches with payment Id: ".format(prefix) + str(payment.id))
-                        return
-
-                    if result['transaction']['cpm_result'] == '00':
-                        payment.set_as_confirmed()
-
-                        deposit = Deposit(account=payment.account, amount=payment.amount, payment=payment)
-                        deposit.save()
-
-                        credit_account(payment.account, payment.amount, Operation.DESC_CREDIT_FOR_DEPOSIT)
-                    else:
-                        payment.set_as_canceled()
-
-                    payment.cpm_payid = result['transaction']['cpm_result']
-                    payment.payment_method = result['transaction']['payment_method']
-                    payment.cpm_phone_prefixe = result['transaction']['cpm_phone_prefixe']
-                    payment.cel_phone_num = result['transaction']['cel_phone_num']
-                    payment.cpm_result = result['transaction']['cpm_result']
-                    payment.cpm_trans_status = result['transaction']['cpm_trans_status']
-                    payment.save()
-
-        if 'client_transaction_id' in request.POST:
-            payment = Payment.objects.get(pk=request.POST['client_transaction_id'])
-            if payment.initiated:
-                if int(request.POST['amount']) != payment.amount:
-                    logger.warning("#{} Mismatches with payment Id: ".format(prefix) + str(payment.id))
-                    return
-
-                if request.POST['treatment_status'] == 'VAL':
-                    payment.set_as_confirmed()
-
-                    debit_account(payment.account, payment.amount, Operation.DESC_DEBIT_FOR_REFUND)
-
-                    refund = payment.refund
-                    refund.set_as_processed()
-                    refund.save()
-                else:
-                    payment.set_as_canceled()
-
-                payment.cpm_payid = request.POST['transaction_id']
-                payment.cpm_result = request.POST['treatment_status']
-                payment.payment_method = request.POST['operator'] if 'operator' in request.POST else None
-                payment.comment = request.POST['comment'] if 'comment' in request.POST else None
-                payment.save()
+        for field, type in (('cpm_trans_id', PaymentNotification.TYPE_INCOMING),
+                            ('client_transaction_id', PaymentNotification.TYPE_OUTGOING)):
+            if field not in request.POST:
+                continue
+
+            try:
+                trans_id = str(uuid.UUID(request.POST[field]))
+            except ValueError:
+                logger.warning("#{} Invalid transaction Id: ".format(prefix) + request.POST[field])
+                return JsonResponse({"message": "Invalid transaction"}, status=400)
+
+            notification, created = PaymentNotification.objects.get_or_create(
+                trans_id=trans_id,
+                defaults={"type": type, "data": request.POST.dict()})
+            if created:
+                process_payment_notifications_task.delay()
 
         return JsonResponse({"message": "Ok"}, safe=False)
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from rwanda.account.uploads import media_path, file_extension
+from rwanda.purchases.models import Deliverable, DeliverableFile
+
+BUNDLE_CHUNK_SIZE = 1024 * 1024
+
+STORED_EXTENSIONS = {
+    '.7z', '.aac', '.avi', '.bz2', '.docx', '.flac', '.gif', '.gz', '.jpeg', '.jpg', '.m4a', '.mkv', '.mov',
+    '.mp3', '.mp4', '.ogg', '.pdf', '.png', '.pptx', '.rar', '.webm', '.webp', '.xlsx', '.xz', '.zip',
+}
+
+
+class BundleStream(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def deliverable_bundle_files(deliverable: Deliverable):
+    return list(DeliverableFile.objects.filter(deliverable=deliverable).order_by('created_at', 'id'))
+
+
+def bundle_fingerprint(files):
+    sha1 = hashlib.sha1()
+    for f in files:
+        sha1.update("{}:{}:{}:{}\n".format(f.id, f.name, f.size, f.file.name).encode())
+
+    return sha1.hexdigest()
+
+
+def bundle_directory(deliverable_id):
+    return "bundles/{}".format(deliverable_id)
+
+
+def bundle_name(deliverable: Deliverable, files):
+    return "{}/{}.zip".format(bundle_directory(deliverable.id), bundle_fingerprint(files))
+
+
+def bundle_entry_names(files):
+    names = []
+    used = set()
+    for f in files:
+        base, extension = os.path.splitext(os.path.basename(f.name) or 'file')
+        name = base + extension
+        index = 1
+        while name in used:
+            name = "{} ({}){}".format(base, index, extension)
+            index += 1
+        used.add(name)
+        names.append(name)
+
+    return names
+
+
+def stream_bundle(files):
+    stream = BundleStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as bundle:
+        for f, name in zip(files, bundle_entry_names(files)):
+            info = zipfile.ZipInfo(name, date_time=f.created_at.timetuple()[:6])
+            info.external_attr = 0o644 << 16
+            info.file_size = f.size
+            info.compress_type = zipfile.ZIP_STORED \
+                if file_extension(f.name) in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+            with default_storage.open(f.file.name, 'rb') as source, bundle.open(info, 'w', force_zip64=True) as entry:
+                for chunk in iter(lambda: source.read(BUNDLE_CHUNK_SIZE), b''):
+                    entry.write(chunk)
+                    yield stream.pop()
+
+    yield stream.pop()
+
+
+def build_bundle(deliverable_id):
+    deliverable = Deliverable.objects.filter(pk=deliverable_id).first()
+    if deliverable is None:
+        return None
+
+    files = deliverable_bundle_files(deliverable)
+    name = bundle_name(deliverable, files)
+    path = media_path(name)
+    if os.path.exists(path):
+        return name
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as destination:
+            for chunk in stream_bundle(files):
+                destination.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    for entry in os.listdir(directory):
+        if entry.endswith('.zip') and entry != os.path.basename(path):
+            os.remove(os.path.join(directory, entry))
+
+    return name
+
+
+def queue_bundle(deliverable: Deliverable, files):
+    from rwanda.purchases.tasks import build_deliverable_bundle_task
+
+    if cache.add("bundles:" + bundle_name(deliverable, files), True, settings.BUNDLE_BUILD_TIMEOUT):
+        build_deliverable_bundle_task.delay(str(deliverable.id))
+
+
+def remove_bundles(deliverable_id):
+    shutil.rmtree(media_path(bundle_directory(deliverable_id)), ignore_errors=True)
@@ -1,21 +1,146 @@
 import uuid
+from base64 import urlsafe_b64encode
 from datetime import timedelta
 
-from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.contrib.humanize.templatetags.humanize import naturalday
 from django.db import models
 from django.template.defaultfilters import date as date_filter, time as time_filter
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 
 from rwanda.account.utils import natural_size
 from rwanda.administration.models import Parameter
+from rwanda.downloads import download_url
 from rwanda.services.models import ServiceOption, Service
 from rwanda.users.models import Account, Admin
 
 
-class ServicePurchase(models.Model):
+class PurchaseEventsMixin:
+    pending_events = None
+    created_event = None
+
+    def add_event(self, kind):
+        if self.pending_events is None:
+            self.pending_events = []
+
+        self.pending_events.append(kind)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+
+        super().save(*args, **kwargs)
+
+        if adding and self.created_event is not None:
+            self.add_event(self.created_event)
+
+        if self.pending_events:
+            PurchaseEvent.objects.bulk_create([self.build_event(kind) for kind in self.pending_events])
+            self.pending_events = None
+
+    def build_event(self, kind):
+        """Return the unsaved PurchaseEvent of the given kind for this object, saved along with it."""
+        raise NotImplementedError("{} must implement build_event".format(type(self).__name__))
+
+
+class PurchaseEvent(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    KIND_INITIATED = 'INITIATED'
+    KIND_ACCEPTED = 'ACCEPTED'
+    KIND_REFUSED = 'REFUSED'
+    KIND_DELIVERED = 'DELIVERED'
+    KIND_APPROVED = 'APPROVED'
+    KIND_CANCELED = 'CANCELED'
+    KIND_IN_DISPUTE = 'IN_DISPUTE'
+    KIND_DELIVERABLE_PUBLISHED = 'DELIVERABLE_PUBLISHED'
+    KIND_UPDATE_INITIATED = 'UPDATE_INITIATED'
+    KIND_UPDATE_ACCEPTED = 'UPDATE_ACCEPTED'
+    KIND_UPDATE_REFUSED = 'UPDATE_REFUSED'
+    KIND_UPDATE_DELIVERED = 'UPDATE_DELIVERED'
+    kind = models.CharField(max_length=255)
+    data = models.JSONField(default=dict)
+    service_purchase = models.ForeignKey('ServicePurchase', on_delete=models.CASCADE)
+    deliverable = models.ForeignKey('Deliverable', on_delete=models.CASCADE, null=True, blank=True)
+    happened_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['service_purchase', 'happened_at']),
+        ]
+
+    @property
+    def status_display(self):
+        return {
+            self.KIND_INITIATED: _('Initiated'),
+            self.KIND_ACCEPTED: _('Accepted'),
+            self.KIND_REFUSED: _('Refused'),
+            self.KIND_DELIVERED: _('Delivered'),
+            self.KIND_APPROVED: _('Approved'),
+            self.KIND_CANCELED: _('Canceled'),
+            self.KIND_IN_DISPUTE: _('In dispute'),
+            self.KIND_DELIVERABLE_PUBLISHED: _('Deliverable Published'),
+            self.KIND_UPDATE_INITIATED: _('Request for update initiated'),
+            self.KIND_UPDATE_ACCEPTED: _('Request for update accepted'),
+            self.KIND_UPDATE_REFUSED: _('Request for update refused'),
+            self.KIND_UPDATE_DELIVERED: _('Request for update delivered'),
+        }[self.kind]
+
+    @property
+    def color(self):
+        return {
+            self.KIND_INITIATED: 'dark',
+            self.KIND_ACCEPTED: 'primary',
+            self.KIND_REFUSED: 'danger',
+            self.KIND_DELIVERED: 'warning',
+            self.KIND_APPROVED: 'success',
+            self.KIND_CANCELED: 'danger',
+            self.KIND_IN_DISPUTE: 'info',
+            self.KIND_DELIVERABLE_PUBLISHED: 'info',
+            self.KIND_UPDATE_INITIATED: 'dark',
+            self.KIND_UPDATE_ACCEPTED: 'primary',
+            self.KIND_UPDATE_REFUSED: 'danger',
+            self.KIND_UPDATE_DELIVERED: 'warning',
+        }[self.kind]
+
+    @property
+    def description(self):
+        if self.kind == self.KIND_ACCEPTED:
+            return _('Deadline set to <strong>{}</strong>') \
+                .format(date_filter(parse_datetime(self.data["deadline_at"])))
+
+        if self.kind in (self.KIND_APPROVED, self.KIND_CANCELED) and self.data.get("by_administrators"):
+            if self.kind == self.KIND_APPROVED:
+                return _('Has been approved by <strong>Administrators</strong>')
+
+            return _('Has been canceled by <strong>Administrators</strong>')
+
+        if self.kind == self.KIND_IN_DISPUTE and "title" in self.data:
+            return _('The buyer open a litigation <strong>{}</strong>').format(self.data["title"])
+
+        if self.kind == self.KIND_DELIVERABLE_PUBLISHED:
+            return _('Deliverable <strong>{}</strong> published in version <strong>{}</strong>.') \
+                .format(self.deliverable.title, self.deliverable.version_display)
+
+        if self.kind == self.KIND_UPDATE_INITIATED:
+            return _('The buyer make an update request <strong>{}</strong>').format(self.data["title"])
+
+        if self.kind == self.KIND_UPDATE_ACCEPTED:
+            return _('The update request <strong>{}</strong> have been accepted. New deadline set to <strong>{}</strong>') \
+                .format(self.data["title"], date_filter(parse_datetime(self.data["deadline_at"])))
+
+        if self.kind == self.KIND_UPDATE_REFUSED:
+            return _('The update request <strong>{}</strong> have been refused. <strong>Reason:</strong> {}') \
+                .format(self.data["title"], self.data["reason"])
+
+        if self.kind == self.KIND_UPDATE_DELIVERED:
+            return _('The update request <strong>{}</strong> have been delivered.').format(self.data["title"])
+
+        return None
+
+
+class ServicePurchase(PurchaseEventsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     delay = models.PositiveBigIntegerField()
     price = models.PositiveBigIntegerField()
@@ -46,8 +171,16 @@ class ServicePurchase(models.Model):
     deadline_at = models.DateTimeField(null=True, blank=True)
     has_final_deliverable = models.BooleanField(default=False)
     refused_reason = models.TextField(null=True, blank=True)
+    last_reminded_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    created_event = PurchaseEvent.KIND_INITIATED
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'deadline_at']),
+        ]
+
     @property
     def number(self):
         return "#" + str(self.id)[24:].upper()
@@ -274,7 +407,7 @@ class ServicePurchase(models.Model):
 
     @property
     def canceled_for_delay(self):
-        return self.accepted and self.canceled and self.canceled_at > self.deadline_at
+        return self.has_been_accepted and self.canceled and self.canceled_at > self.deadline_at
 
     @property
     def can_be_commented(self):
@@ -293,26 +426,32 @@ class ServicePurchase(models.Model):
         today = timezone.now()
         self.accepted_at = today
         self.deadline_at = today + timedelta(days=self.delay)
+        self.add_event(PurchaseEvent.KIND_ACCEPTED)
 
     def set_as_refused(self):
         self.status = self.STATUS_REFUSED
         self.refused_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_REFUSED)
 
     def set_as_delivered(self):
         self.status = self.STATUS_DELIVERED
         self.delivered_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_DELIVERED)
 
     def set_as_approved(self):
         self.status = self.STATUS_APPROVED
         self.approved_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_APPROVED)
 
     def set_as_canceled(self):
         self.status = self.STATUS_CANCELED
         self.canceled_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_CANCELED)
 
     def set_in_dispute(self):
         self.status = self.STATUS_IN_DISPUTE
         self.in_dispute_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_IN_DISPUTE)
 
     def set_as_update_initiated(self):
         self.status = self.STATUS_UPDATE_INITIATED
@@ -339,8 +478,39 @@ class ServicePurchase(models.Model):
     def is_not_seller(self, account: Account):
         return not self.is_seller(account)
 
+    def build_event(self, kind):
+        event = PurchaseEvent(service_purchase=self, kind=kind)
+
+        if kind == PurchaseEvent.KIND_INITIATED:
+            event.happened_at = self.created_at
+
+        if kind == PurchaseEvent.KIND_ACCEPTED:
+            event.happened_at = self.accepted_at
+            event.data = {"deadline_at": self.deadline_at.isoformat()}
+
+        if kind == PurchaseEvent.KIND_REFUSED:
+            event.happened_at = self.refused_at
+
+        if kind == PurchaseEvent.KIND_DELIVERED:
+            event.happened_at = self.delivered_at
+
+        if kind == PurchaseEvent.KIND_APPROVED:
+            event.happened_at = self.approved_at
+            event.data = {"by_administrators": self.has_been_in_dispute}
+
+        if kind == PurchaseEvent.KIND_CANCELED:
+            event.happened_at = self.canceled_at
+            event.data = {"by_administrators": self.has_been_in_dispute}
+
+        if kind == PurchaseEvent.KIND_IN_DISPUTE:
+            event.happened_at = self.in_dispute_at
+            if hasattr(self, 'litigation'):
+                event.data = {"title": self.litigation.title}
 
-class ServicePurchaseUpdateRequest(models.Model):
+        return event
+
+
+class ServicePurchaseUpdateRequest(PurchaseEventsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     content = models.TextField()
@@ -357,6 +527,8 @@ class ServicePurchaseUpdateRequest(models.Model):
     service_purchase = models.ForeignKey(ServicePurchase, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    created_event = PurchaseEvent.KIND_UPDATE_INITIATED
+
     @property
     def deadline_at_display(self):
         if not self.has_been_accepted:
@@ -432,14 +604,36 @@ class ServicePurchaseUpdateRequest(models.Model):
     def set_as_accepted(self):
         self.status = self.STATUS_ACCEPTED
         self.accepted_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_UPDATE_ACCEPTED)
 
     def set_as_refused(self):
         self.status = self.STATUS_REFUSED
         self.refused_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_UPDATE_REFUSED)
 
     def set_as_delivered(self):
         self.status = self.STATUS_DELIVERED
         self.delivered_at = timezone.now()
+        self.add_event(PurchaseEvent.KIND_UPDATE_DELIVERED)
+
+    def build_event(self, kind):
+        event = PurchaseEvent(service_purchase_id=self.service_purchase_id, kind=kind, data={"title": self.title})
+
+        if kind == PurchaseEvent.KIND_UPDATE_INITIATED:
+            event.happened_at = self.created_at
+
+        if kind == PurchaseEvent.KIND_UPDATE_ACCEPTED:
+            event.happened_at = self.accepted_at
+            event.data["deadline_at"] = self.deadline_at.isoformat()
+
+        if kind == PurchaseEvent.KIND_UPDATE_REFUSED:
+            event.happened_at = self.refused_at
+            event.data["reason"] = self.reason
+
+        if kind == PurchaseEvent.KIND_UPDATE_DELIVERED:
+            event.happened_at = self.delivered_at
+
+        return event
 
 
 class ServicePurchaseServiceOption(models.Model):
@@ -454,20 +648,58 @@ class ChatMessage(models.Model):
     content = models.TextField(null=True, blank=True)
     is_file = models.BooleanField(default=False)
     file = models.FileField(upload_to="chat_files/", null=True, blank=True)
+    blob = models.ForeignKey('account.Blob', on_delete=models.PROTECT, null=True, blank=True)
     file_name = models.TextField(null=True, blank=True)
     file_size = models.BigIntegerField(default=0)
     service_purchase = models.ForeignKey(ServicePurchase, on_delete=models.CASCADE)
     account = models.ForeignKey(Account, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['service_purchase', 'created_at', 'id']),
+        ]
+
     @property
     def file_size_display(self):
         if self.is_file:
             return natural_size(self.file_size)
 
+    @property
+    def file_url(self):
+        if self.is_file:
+            return download_url('chat-messages', self.id)
+
+    @property
+    def download_file(self):
+        return self.file if self.is_file else None
+
+    @property
+    def download_name(self):
+        return self.file_name
+
+    def can_be_downloaded_by(self, user):
+        if user is None:
+            return False
+
+        if user.is_admin:
+            return True
+
+        if user.is_not_account:
+            return False
+
+        return self.service_purchase.is_buyer(user.account) or self.service_purchase.is_seller(user.account)
+
+    @property
+    def cursor(self):
+        return urlsafe_b64encode(f"{self.created_at.isoformat()}|{self.id}".encode()).decode()
+
     def display(self, account, last_created_at=None):
         from rwanda.graphql.types import ServicePurchaseChatMessageType
 
+        return ServicePurchaseChatMessageType(**self.display_data(account, last_created_at))
+
+    def display_data(self, account, last_created_at=None):
         today = timezone.now()
         yesterday = timezone.now() - timedelta(1)
 
@@ -476,33 +708,70 @@ class ChatMessage(models.Model):
         if self.created_at.date() == today.date() or self.created_at.date() == yesterday.date():
             d_filter = naturalday
 
-        chat_message = ServicePurchaseChatMessageType()
-        chat_message.id = self.id
-        chat_message.content = self.content
-        chat_message.marked = getattr(self, "marked", False)
-        chat_message.time = t_filter(self.created_at).title()
-        chat_message.date = int(self.created_at.strftime("%Y%m%d"))
-        chat_message.date_display = d_filter(self.created_at).title()
-        chat_message.created_at = self.created_at.timestamp()
+        data = {
+            "id": self.id,
+            "content": self.content,
+            "marked": getattr(self, "marked", False),
+            "time": t_filter(self.created_at).title(),
+            "date": int(self.created_at.strftime("%Y%m%d")),
+            "date_display": d_filter(self.created_at).title(),
+            "created_at": self.created_at.timestamp(),
+            "is_file": self.is_file,
+            "cursor": self.cursor,
+        }
 
-        chat_message.is_file = self.is_file
         if self.is_file:
-            chat_message.file_name = self.file_name
-            chat_message.file_size = self.file_size_display
-            chat_message.file_url = settings.BASE_URL + self.file.url
+            data["file_name"] = self.file_name
+            data["file_size"] = self.file_size_display
+            data["file_url"] = self.file_url
 
-        chat_message.from_current_account = False
-        chat_message.from_buyer = False
+        data["from_current_account"] = False
+        data["from_buyer"] = False
         if account is not None:
             if self.account_id == account.id:
-                chat_message.from_current_account = True
+                data["from_current_account"] = True
         else:
-            if self.service_purchase.is_buyer(self.account):
-                chat_message.from_buyer = True
+            if self.account_id == self.service_purchase.account_id:
+                data["from_buyer"] = True
 
-        chat_message.show_date = False
+        data["show_date"] = False
         if last_created_at is None or last_created_at is not None and last_created_at.date() != self.created_at.date():
-            chat_message.show_date = True
+            data["show_date"] = True
+
+        return data
+
+    def broadcast_payload(self):
+        last_created_at = ChatMessage.objects \
+            .filter(service_purchase_id=self.service_purchase_id, created_at__lte=self.created_at) \
+            .exclude(id=self.id) \
+            .order_by('-created_at', '-id') \
+            .values_list('created_at', flat=True) \
+            .first()
+
+        return {
+            "id": str(self.id),
+            "content": self.content,
+            "is_file": self.is_file,
+            "file_name": self.file_name,
+            "file_size": self.file_size,
+            "account_id": str(self.account_id),
+            "service_purchase_id": str(self.service_purchase_id),
+            "buyer_id": str(self.service_purchase.account_id),
+            "created_at": self.created_at.isoformat(),
+            "last_created_at": last_created_at.isoformat() if last_created_at is not None else None,
+        }
+
+    @classmethod
+    def from_broadcast_payload(cls, payload):
+        chat_message = cls(id=uuid.UUID(payload["id"]),
+                           content=payload["content"],
+                           is_file=payload["is_file"],
+                           file_name=payload["file_name"],
+                           file_size=payload["file_size"],
+                           account_id=uuid.UUID(payload["account_id"]),
+                           created_at=parse_datetime(payload["created_at"]))
+        chat_message.service_purchase = ServicePurchase(id=uuid.UUID(payload["service_purchase_id"]),
+                                                        account_id=uuid.UUID(payload["buyer_id"]))
 
         return chat_message
 
@@ -531,6 +800,11 @@ class Litigation(models.Model):
     handled_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -633,11 +907,19 @@ class Deliverable(models.Model):
 
         return _('No')
 
+    def add_published_event(self):
+        if self.published:
+            PurchaseEvent.objects.get_or_create(
+                deliverable=self,
+                kind=PurchaseEvent.KIND_DELIVERABLE_PUBLISHED,
+                defaults={"service_purchase_id": self.service_purchase_id, "happened_at": timezone.now()})
+
 
 class DeliverableFile(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     file = models.FileField(upload_to='deliverables/')
+    blob = models.ForeignKey('account.Blob', on_delete=models.PROTECT, null=True, blank=True)
     size = models.BigIntegerField(default=0)
     deliverable = models.ForeignKey(Deliverable, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -648,3 +930,29 @@ class DeliverableFile(models.Model):
     @property
     def size_display(self):
         return natural_size(self.size)
+
+    @property
+    def file_url(self):
+        return download_url('deliverable-files', self.id)
+
+    @property
+    def download_file(self):
+        return self.file
+
+    @property
+    def download_name(self):
+        return self.name
+
+    def can_be_downloaded_by(self, user):
+        if user is None:
+            return False
+
+        if user.is_admin:
+            return True
+
+        if user.is_not_account:
+            return False
+
+        service_purchase = self.deliverable.service_purchase
+        return service_purchase.is_seller(user.account) \
+               or (self.deliverable.published and service_purchase.is_buyer(user.account))
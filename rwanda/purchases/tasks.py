@@ -0,0 +1,72 @@
+import logging
+import time
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from rwanda.account.tasks import on_service_purchase_canceled_task
+from rwanda.graphql.purchase.operations import cancel_service_purchases
+from rwanda.purchases.bundles import build_bundle
+from rwanda.graphql.purchase.subscriptions import ServicePurchaseSubscription
+from rwanda.purchases.models import ServicePurchase, PurchaseEvent
+
+logger = logging.getLogger('rwanda.purchases')
+
+
+def cancel_overdue_service_purchases():
+    started_at = time.monotonic()
+    now = timezone.now()
+
+    canceled = 0
+    batches = 0
+    while True:
+        with transaction.atomic():
+            service_purchases = list(ServicePurchase.objects
+                                     .select_for_update(skip_locked=True, of=('self',))
+                                     .filter(status__in=[ServicePurchase.STATUS_ACCEPTED,
+                                                         ServicePurchase.STATUS_UPDATE_ACCEPTED],
+                                             deadline_at__lt=now)
+                                     .select_related('account')
+                                     .order_by('deadline_at')[:settings.OVERDUE_SWEEP_BATCH_SIZE])
+            if not service_purchases:
+                break
+
+            cancel_service_purchases(service_purchases)
+
+            events = []
+            for service_purchase in service_purchases:
+                service_purchase.set_as_canceled()
+                events += [service_purchase.build_event(kind) for kind in service_purchase.pending_events]
+                service_purchase.pending_events = None
+
+            ServicePurchase.objects.bulk_update(service_purchases, ['status', 'canceled_at'])
+            PurchaseEvent.objects.bulk_create(events)
+
+            ids = [str(service_purchase.id) for service_purchase in service_purchases]
+            transaction.on_commit(lambda ids=ids: notify_canceled_service_purchases(ids))
+
+        canceled += len(service_purchases)
+        batches += 1
+
+    seconds = time.monotonic() - started_at
+    logger.info("Overdue sweep: {} canceled in {} batches, {:.3f}s".format(canceled, batches, seconds))
+
+    return {"canceled": canceled, "batches": batches, "seconds": seconds}
+
+
+def notify_canceled_service_purchases(ids):
+    for id in ids:
+        ServicePurchaseSubscription.broadcast(group=ServicePurchaseSubscription.name.format(id))
+        on_service_purchase_canceled_task.delay(id)
+
+
+@shared_task
+def cancel_overdue_service_purchases_task():
+    return cancel_overdue_service_purchases()
+
+
+@shared_task
+def build_deliverable_bundle_task(deliverable_id):
+    return build_bundle(deliverable_id)
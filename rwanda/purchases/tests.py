@@ -0,0 +1,140 @@
+import io
+import zipfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+
+from rwanda.accounting.models import Fund
+from rwanda.graphql.purchase.mutations import DeliverServicePurchase
+from rwanda.graphql.purchase.operations import init_service_purchase, cancel_service_purchases
+from rwanda.purchases.bundles import bundle_entry_names, stream_bundle
+from rwanda.purchases.models import ServicePurchase, PurchaseEvent, Deliverable
+from rwanda.purchases.tasks import cancel_overdue_service_purchases
+from rwanda.testing import create_account, create_service, create_service_purchase, create_funds
+
+
+class BackfillPurchaseEventsTestCase(TestCase):
+    def setUp(self):
+        self.service_purchase = create_service_purchase(create_account("buyer"), create_service(create_account("seller")))
+        PurchaseEvent.objects.all().delete()
+
+    def backfill(self):
+        call_command('backfill_purchase_events', stdout=io.StringIO())
+
+    def test_only_published_deliverables_get_an_event(self):
+        published = Deliverable.objects.create(title="Logo", version=Deliverable.VERSION_FINAL, description="Logo",
+                                               published=True, service_purchase=self.service_purchase)
+        Deliverable.objects.create(title="Draft", version=Deliverable.VERSION_ALPHA, description="Draft",
+                                   service_purchase=self.service_purchase)
+
+        self.backfill()
+        self.backfill()
+
+        events = PurchaseEvent.objects.filter(kind=PurchaseEvent.KIND_DELIVERABLE_PUBLISHED)
+        self.assertEqual([event.deliverable_id for event in events], [published.id])
+
+    def test_dispute_without_litigation_is_backfilled(self):
+        ServicePurchase.objects.filter(id=self.service_purchase.id) \
+            .update(status=ServicePurchase.STATUS_IN_DISPUTE, in_dispute_at=timezone.now())
+
+        self.backfill()
+
+        event = PurchaseEvent.objects.get(kind=PurchaseEvent.KIND_IN_DISPUTE)
+        self.assertEqual(event.data, {})
+        self.assertIsNone(event.description)
+
+
+class OverdueServicePurchasesTestCase(TestCase):
+    def setUp(self):
+        create_funds()
+        self.buyer = create_account("buyer", balance=10000)
+        self.seller = create_account("seller")
+        self.service = create_service(self.seller)
+
+    def tearDown(self):
+        Fund.ids = {}
+
+    def create_accepted_service_purchase(self, deadline_at):
+        service_purchase = create_service_purchase(self.buyer, self.service, status=ServicePurchase.STATUS_ACCEPTED,
+                                                   accepted_at=deadline_at - timedelta(days=1),
+                                                   deadline_at=deadline_at)
+        init_service_purchase(service_purchase)
+        return service_purchase
+
+    def test_cancellations_are_posted_in_one_ledger_transaction(self):
+        service_purchases = [self.create_accepted_service_purchase(timezone.now()) for _ in range(5)]
+
+        # SAVEPOINT, operations insert, balances update, RELEASE SAVEPOINT.
+        with self.assertNumQueries(4):
+            cancel_service_purchases(service_purchases)
+
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.balance, 10000)
+
+    def test_overdue_service_purchases_are_canceled(self):
+        overdue = self.create_accepted_service_purchase(timezone.now() - timedelta(hours=1))
+        running = self.create_accepted_service_purchase(timezone.now() + timedelta(days=1))
+
+        result = cancel_overdue_service_purchases()
+
+        self.assertEqual(result["canceled"], 1)
+        overdue.refresh_from_db()
+        running.refresh_from_db()
+        self.assertTrue(overdue.canceled)
+        self.assertTrue(overdue.canceled_for_delay)
+        self.assertTrue(running.accepted)
+
+    def test_seller_transition_loaded_before_the_sweep_does_not_overwrite_it(self):
+        overdue = self.create_accepted_service_purchase(timezone.now() - timedelta(hours=1))
+        stale = ServicePurchase.objects.get(pk=overdue.pk)
+
+        cancel_overdue_service_purchases()
+
+        form = DeliverServicePurchase.form_class(ServicePurchase, DeliverServicePurchase._meta.form_fields,
+                                                 {"data": {}, "instance": stale})
+        self.assertTrue(form.is_valid())
+        info = mock.Mock()
+        info.context.user.account = self.seller
+
+        result = DeliverServicePurchase.perform_mutate(info, form, None, {})
+
+        self.assertTrue(result.errors)
+        overdue.refresh_from_db()
+        self.assertTrue(overdue.canceled)
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.balance, 10000)
+
+
+class BundleTestCase(SimpleTestCase):
+    contents = {
+        "deliverables/1/logo.png": b"\x89PNG" + b"0" * 64,
+        "deliverables/2/logo.png": b"\x89PNG" + b"1" * 64,
+        "deliverables/3/logo.svg": b"<svg>" + b" " * 64 + b"</svg>",
+    }
+
+    def bundle_files(self):
+        return [SimpleNamespace(name=path.rsplit("/", 1)[-1], size=len(data), created_at=timezone.now(),
+                                file=SimpleNamespace(name=path))
+                for path, data in self.contents.items()]
+
+    def test_duplicate_entry_names_are_numbered(self):
+        self.assertEqual(bundle_entry_names(self.bundle_files()), ["logo.png", "logo (1).png", "logo.svg"])
+
+    def test_bundle_stores_compressed_formats_and_deflates_others(self):
+        storage = mock.Mock()
+        storage.open.side_effect = lambda name, mode: io.BytesIO(self.contents[name])
+
+        with mock.patch('rwanda.purchases.bundles.default_storage', storage):
+            data = b"".join(stream_bundle(self.bundle_files()))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as bundle:
+            entries = {info.filename: info for info in bundle.infolist()}
+            self.assertEqual(list(entries), ["logo.png", "logo (1).png", "logo.svg"])
+            self.assertEqual(entries["logo.png"].compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(entries["logo.svg"].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(bundle.read("logo (1).png"), self.contents["deliverables/2/logo.png"])
+            self.assertEqual(bundle.read("logo.svg"), self.contents["deliverables/3/logo.svg"])
@@ -1,12 +1,12 @@
 import uuid
 from datetime import datetime
 
-from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.db import models
 from django.template.defaultfilters import date as date_filter, time as time_filter
 from django.utils.translation import gettext_lazy as _
 
+from rwanda.downloads import download_url
 from rwanda.users.models import Account
 
 
@@ -42,6 +42,7 @@ class Service(models.Model):
     stars = models.IntegerField(default=0)
     delay = models.PositiveBigIntegerField(default=0)
     file = models.FileField(blank=True, null=True, upload_to="services/")
+    blob = models.ForeignKey('account.Blob', on_delete=models.PROTECT, null=True, blank=True)
     published = models.BooleanField(default=False)
     published_by_admin = models.BooleanField(default=True)
     service_category = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE)
@@ -50,6 +51,7 @@ class Service(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     service_options_count = None
+    has_thumbnails = True
 
     def __str__(self):
         return self.title
@@ -112,10 +114,33 @@ class Service(models.Model):
 
     @property
     def file_url(self):
-        try:
-            return settings.BASE_URL + self.file.url
-        except Exception:
-            return None
+        if self.file:
+            return download_url('services', self.id, signed=not self.public)
+
+    def thumbnail_url(self, size):
+        if self.file:
+            return download_url('services', self.id, signed=not self.public, size=size)
+
+    @property
+    def public(self):
+        return self.published and self.published_by_admin and self.accepted
+
+    @property
+    def download_file(self):
+        return self.file
+
+    @property
+    def download_name(self):
+        return None
+
+    def can_be_downloaded_by(self, user):
+        if self.public:
+            return True
+
+        if user is None:
+            return False
+
+        return user.is_admin or (user.is_account and self.is_owner(user.account))
 
     @property
     def options_count(self):
@@ -160,13 +185,32 @@ class ServiceMedia(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     url = models.URLField(blank=True, null=True)
     file = models.FileField(blank=True, null=True, upload_to="service-medias/")
+    blob = models.ForeignKey('account.Blob', on_delete=models.PROTECT, null=True, blank=True)
     is_main = models.BooleanField(default=False)
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    has_thumbnails = True
+
     @property
     def file_url(self):
-        return settings.BASE_URL + self.file.url if self.file else None
+        if self.file:
+            return download_url('service-medias', self.id, signed=not self.service.public)
+
+    def thumbnail_url(self, size):
+        if self.file:
+            return download_url('service-medias', self.id, signed=not self.service.public, size=size)
+
+    @property
+    def download_file(self):
+        return self.file
+
+    @property
+    def download_name(self):
+        return None
+
+    def can_be_downloaded_by(self, user):
+        return self.service.can_be_downloaded_by(user)
 
 
 class ServiceComment(models.Model):
@@ -203,6 +203,22 @@ else:
 MEDIA_URL = '/media/'
 MEDIA_ROOT = 'media'
 
+DOWNLOADS_ACCEL_REDIRECT = not DEBUG
+DOWNLOADS_URL_MAX_AGE = 24 * 60 * 60
+
+DATATABLES_COUNT_CACHE_TIMEOUT = 30
+DATATABLES_CURSOR_CACHE_TIMEOUT = 10 * 60
+DATATABLES_APPROXIMATE_COUNT_THRESHOLD = 100000
+DATATABLES_EXPORT_CHUNK_SIZE = 2000
+
+THUMBNAIL_SIZES = [40, 80, 160, 320, 640]
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_QUEUE_TIMEOUT = 5 * 60
+
+BUNDLE_BUILD_TIMEOUT = 10 * 60
+FILE_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'media', 'blobs', 'tmp')
+
 if not os.path.exists(os.path.join(BASE_DIR, "logs")):
     os.makedirs(os.path.join(BASE_DIR, "logs"))
 
@@ -261,14 +277,50 @@ CINETPAY_AUTH_URL = "https://client.cinetpay.com/v1/auth/login"
 CINETPAY_CHECK_BALANCE_URL = "https://client.cinetpay.com/v1/transfer/check/balance"
 CINETPAY_TRANSFER_MONEY_URL = "https://client.cinetpay.com/v1/transfer/money/send/contact"
 CINETPAY_ADD_CONTACT_URL = "https://client.cinetpay.com/v1/transfer/contact"
+CINETPAY_CHECK_TRANSFER_URL = "https://client.cinetpay.com/v1/transfer/check/money"
 CINETPAY_API_KEY = os.environ.get('CINETPAY_API_KEY')
 CINETPAY_SITE_ID = os.environ.get('CINETPAY_SITE_ID')
 CINETPAY_CURRENCY = "CFA"
+CINETPAY_POOL_SIZE = 10
+CINETPAY_TIMEOUTS = {
+    "default": (3.05, 15),
+    "signature": (3.05, 10),
+    "check_status": (3.05, 10),
+    "auth": (3.05, 10),
+    "balance": (3.05, 10),
+    "add_contact": (3.05, 20),
+    "transfer": (3.05, 30),
+    "check_transfer": (3.05, 10),
+}
+CINETPAY_RETRIES = 2
+CINETPAY_RETRY_BACKOFF = 0.5
+CINETPAY_TOKEN_TTL = 4 * 60
+CINETPAY_TRANSFER_BATCH_SIZE = 50
+REFUNDS_CLAIM_TIMEOUT = 15 * 60
+# Check status results still waiting on the customer: 623 WAITING_CUSTOMER_TO_VALIDATE, 662 WAITING_CUSTOMER_PAYMENT
+CINETPAY_PENDING_RESULTS = ('623', '662')
+
+PAYMENT_NOTIFICATIONS_BATCH_SIZE = 100
+PAYMENT_NOTIFICATIONS_MAX_ATTEMPTS = 5
+PAYMENT_NOTIFICATIONS_RETRY_DELAY = 60
+PAYMENT_NOTIFICATIONS_PENDING_TIMEOUT = 24 * 60 * 60
+
+PAYMENTS_RECONCILIATION_DELAY = 60 * 60
+PAYMENTS_RECONCILIATION_BATCH_SIZE = 200
+PAYMENTS_RECONCILIATION_WORKERS = 8
+PAYMENTS_RECONCILIATION_LOCK_TIMEOUT = 10 * 60
+PAYMENTS_RECONCILIATION_MAX_AGE = 7 * 24 * 60 * 60
 
 # EMAIL CONFIGS
 MAILJET_KEY = os.environ.get('MAILJET_KEY')
 MAILJET_SECRET = os.environ.get('MAILJET_SECRET')
 DEFAULT_FROM_EMAIL = 'blandedaniel@gmail.com'
+MAILJET_SEND_URL = os.environ.get('MAILJET_SEND_URL', 'https://api.mailjet.com/v3.1/send')
+MAILS_BATCH_SIZE = 50
+MAILS_POOL_SIZE = 4
+MAILS_TIMEOUT = (3.05, 30)
+MAILS_MAX_ATTEMPTS = 5
+MAILS_CLAIM_TIMEOUT = 10 * 60
 
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_CACHE_BACKEND = 'django-cache'
@@ -277,6 +329,33 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/1')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://redis:6379/2'),
+        'KEY_PREFIX': 'rwanda',
+    }
+}
+
+PARAMETERS_LOCAL_TTL = 5
+
+FUND_SHARDS = 8
+
+REMINDERS_INTERVAL = 20 * 60 * 60
+REMINDERS_CHUNK_SIZE = 2000
+REMINDERS_BATCH_SIZE = 200
+
+OVERDUE_SWEEP_BATCH_SIZE = 100
+
+UPLOADS_EXPIRATION = 24 * 60 * 60
+UPLOADS_MAX_LENGTH = 2 * 1024 * 1024 * 1024
+UPLOADS_CHUNK_SIZE = 1024 * 1024
+UPLOADS_PATCH_MAX_SIZE = 8 * 1024 * 1024
+
+BLOBS_HOLD_TIMEOUT = 24 * 60 * 60
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rwanda.accounting.models import Fund
+from rwanda.administration.models import Parameter
+from rwanda.administration.parameters import parameters
+from rwanda.purchases.models import ServicePurchase
+from rwanda.services.models import ServiceCategory, Service
+from rwanda.users.models import User, Account, Admin
+
+
+def create_user(username):
+    return User.objects.create_user(username=username, email=username + "@rwanda.app", password="password")
+
+
+def create_account(username, balance=0):
+    return Account.objects.create(user=create_user(username), balance=balance)
+
+
+def create_admin(username):
+    return Admin.objects.create(user=create_user(username))
+
+
+def create_service(account, **kwargs):
+    service_category, created = ServiceCategory.objects.get_or_create(label="Design")
+    return Service.objects.create(title="Logo", content="Logo", account=account, service_category=service_category,
+                                  **kwargs)
+
+
+def create_service_purchase(account, service, **kwargs):
+    return ServicePurchase.objects.create(delay=1, price=1000, commission=100, account=account, service=service,
+                                          **kwargs)
+
+
+def create_funds():
+    Fund.ids = {}
+    for label in (Fund.MAIN, Fund.ACCOUNTS, Fund.COMMISSIONS):
+        Fund.objects.create(label=label)
+
+
+class DatatableQueriesMixin:
+    """Checks a datatable page costs the same queries for few and many rows. Needs a locmem default cache."""
+
+    def setUp(self):
+        super().setUp()
+        Parameter.objects.create(label=Parameter.CURRENCY, value="FCFA")
+        parameters.invalidate()
+        cache.clear()
+
+    def tearDown(self):
+        parameters.invalidate()
+        super().tearDown()
+
+    def count_queries(self, url, rows):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'draw': 1, 'start': 0, 'length': 10})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), rows)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, create_row, budget):
+        for _ in range(2):
+            create_row()
+        self.client.get(url)
+
+        few = self.count_queries(url, 2)
+        for _ in range(8):
+            create_row()
+        many = self.count_queries(url, 10)
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, budget)
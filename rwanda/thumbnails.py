@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+IMAGE_EXTENSIONS = {'.bmp', '.gif', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp'}
+
+
+def is_image(file_name):
+    return os.path.splitext(file_name or '')[1].lower() in IMAGE_EXTENSIONS
+
+
+def thumbnail_size(size):
+    for available in settings.THUMBNAIL_SIZES:
+        if available >= size:
+            return available
+
+    return settings.THUMBNAIL_SIZES[-1]
+
+
+def thumbnail_name(file_name, size):
+    extension = 'webp' if settings.THUMBNAIL_FORMAT == 'WEBP' else 'jpg'
+    return "{}.{}.{}".format(os.path.splitext(file_name)[0], size, extension)
+
+
+def missing_thumbnail_sizes(file_name):
+    return [size for size in settings.THUMBNAIL_SIZES
+            if not default_storage.exists(thumbnail_name(file_name, size))]
+
+
+def generate_thumbnails(file_name, sizes=None):
+    if not is_image(file_name) or not default_storage.exists(file_name):
+        return []
+
+    sizes = sorted(sizes or missing_thumbnail_sizes(file_name), reverse=True)
+    if not sizes:
+        return []
+
+    with Image.open(default_storage.path(file_name)) as original:
+        original.draft('RGB', (sizes[0], sizes[0]))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if settings.THUMBNAIL_FORMAT == 'WEBP' and 'A' in image.getbands() else 'RGB')
+
+        generated = []
+        for size in sizes:
+            image.thumbnail((size, size), Image.LANCZOS)
+            path = default_storage.path(thumbnail_name(file_name, size))
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as destination:
+                    image.save(destination, settings.THUMBNAIL_FORMAT, quality=settings.THUMBNAIL_QUALITY)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            generated.append(size)
+
+    return generated
+
+
+def queue_thumbnails(file_name):
+    from rwanda.account.tasks import generate_thumbnails_task
+
+    if is_image(file_name):
+        generate_thumbnails_task.delay(file_name)
+
+
+def thumbnail(file_name, size):
+    name = thumbnail_name(file_name, thumbnail_size(size))
+    if default_storage.exists(name):
+        return name
+
+    if cache.add("thumbnails:" + name, True, settings.THUMBNAIL_QUEUE_TIMEOUT):
+        queue_thumbnails(file_name)
+    return None
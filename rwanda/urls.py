@@ -1,18 +1,20 @@
 from decorator_include import decorator_include
-from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import path, include
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 
 from rwanda.administration.views_mails import VerifyAccountMailPreviewView, PurchaseInitiatedMailPreviewView, \
     PurchaseAcceptedOrRejectedMailPreviewView, OrderInitiatedMailPreviewView, UpdateInitiatedMailPreviewView, \
     LitigationInitiatedMailPreviewView, LitigationHandledMailPreviewView, PurchaseReminderMailPreviewView, \
     ServiceAcceptedMailPreviewView, ServiceRejectedMailPreviewView
 from rwanda.decorators import account_required, admin_required
+from rwanda.downloads import DownloadView
 from rwanda.graphql.schemas.account import schema
 from rwanda.graphql.schemas.admin import admin_schema
+from rwanda.graphql.views import GraphQLView
+from rwanda.purchases.models import DeliverableFile, ChatMessage
+from rwanda.services.models import Service, ServiceMedia
+from rwanda.users.models import User
 
 urlpatterns = [
     # path("__reload__/", include("django_browser_reload.urls")),
@@ -24,6 +26,14 @@ urlpatterns = [
     path('administration/', decorator_include(admin_required, include("rwanda.administration.urls"))),
     path('payments/', include("rwanda.payments.urls")),
 
+    path('downloads/deliverable-files/<uuid:pk>',
+         DownloadView.as_view(kind='deliverable-files', model=DeliverableFile, attachment=True)),
+    path('downloads/chat-messages/<uuid:pk>',
+         DownloadView.as_view(kind='chat-messages', model=ChatMessage, attachment=True)),
+    path('downloads/services/<uuid:pk>', DownloadView.as_view(kind='services', model=Service)),
+    path('downloads/service-medias/<uuid:pk>', DownloadView.as_view(kind='service-medias', model=ServiceMedia)),
+    path('downloads/avatars/<uuid:pk>', DownloadView.as_view(kind='avatars', model=User)),
+
     path('mails/verify-account', VerifyAccountMailPreviewView.as_view()),
     path('mails/purchases/initiated', PurchaseInitiatedMailPreviewView.as_view()),
     path('mails/purchases/deadline-reminder', PurchaseReminderMailPreviewView.as_view()),
@@ -37,4 +47,3 @@ urlpatterns = [
 ]
 
 urlpatterns += staticfiles_urlpatterns()
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,7 +1,6 @@
 import uuid
 from datetime import timedelta
 
-from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.contrib.humanize.templatetags.humanize import naturalday
@@ -11,6 +10,8 @@ from django.template.defaultfilters import date as date_filter, time as time_fil
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from rwanda.downloads import download_url
+
 
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -19,9 +20,13 @@ class User(AbstractUser):
     email_verification_expire_at = models.DateTimeField(blank=True, null=True)
     phone_number = models.CharField(max_length=255, null=True, blank=True)
     image = models.FileField(blank=True, null=True, upload_to="accounts/")
+    image_blob = models.ForeignKey('account.Blob', on_delete=models.PROTECT, null=True, blank=True,
+                                   related_name='+')
     longbowou = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    has_thumbnails = True
+
     def disconnect(self):
         self.refresh_from_db()
         self.is_online = False
@@ -81,10 +86,23 @@ class User(AbstractUser):
 
     @property
     def image_url(self):
-        try:
-            return settings.BASE_URL + self.image.url
-        except Exception:
-            return None
+        if self.image:
+            return download_url('avatars', self.id, signed=False)
+
+    def thumbnail_url(self, size):
+        if self.image:
+            return download_url('avatars', self.id, signed=False, size=size)
+
+    @property
+    def download_file(self):
+        return self.image
+
+    @property
+    def download_name(self):
+        return None
+
+    def can_be_downloaded_by(self, user):
+        return True
 
     @property
     def is_active_display(self):